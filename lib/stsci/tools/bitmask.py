@@ -3,16 +3,20 @@
 
 """
 import sys
+import threading
 import warnings
+from collections import namedtuple, OrderedDict
 import six
 import numpy as np
 from astropy.utils import deprecated
 
-__version__ = '1.1.1'
-__vdate__ = '30-January-2018'
+__version__ = '1.3.0'
+__vdate__ = '18-October-2026'
 __author__ = 'Mihai Cara'
 
-__all__ = ['interpret_bit_flags', 'bitfield_to_boolean_mask', 'is_bit_flag']
+__all__ = ['interpret_bit_flags', 'compile_bit_flags', 'BitFlagMask',
+           'bitfield_to_boolean_mask', 'combine_bitfields_to_boolean_mask',
+           'is_bit_flag']
 
 # Revision history:
 # 0.1.0 (29-March-2015) - initial release based on code from stsci.skypac
@@ -42,6 +46,20 @@ __all__ = ['interpret_bit_flags', 'bitfield_to_boolean_mask', 'is_bit_flag']
 #          `ignore_flags` argument contains bit flags beyond what the type of
 #          the argument `bitfield` can hold.
 # 1.1.1 (30-January-2018) - Improved filtering of high bits in flags.
+# 1.2.0 (18-October-2026) - Multiple enhancements:
+#       1. `bitfield_to_boolean_mask()` now takes `out` argument to write the
+#          mask into an existing array and `block_size` argument to process
+#          the input in blocks of rows (e.g., memory-mapped DQ arrays).
+#       2. Added `combine_bitfields_to_boolean_mask()` that builds a single
+#          mask from several bit field arrays in one pass.
+# 1.3.0 (18-October-2026) - Multiple enhancements:
+#       1. Added `compile_bit_flags()` that interprets bit flags once and
+#          returns an immutable `BitFlagMask` (results are kept in an LRU
+#          cache). `BitFlagMask` objects can be passed as `ignore_flags` to
+#          `bitfield_to_boolean_mask()` and as `ignore_bits` to
+#          `bitmask2mask()`.
+#       2. `interpret_bit_flags()` takes `flag_name_map` argument to allow
+#          bit flags to be specified by name (e.g., 'SATURATED,HOT').
 #
 INT_TYPE = (int, long,) if sys.version_info < (3,) else (int,)
 MAX_UINT_TYPE = np.maximum_sctype(np.uint)
@@ -49,6 +67,11 @@ SUPPORTED_FLAGS = int(np.bitwise_not(
     0, dtype=MAX_UINT_TYPE, casting='unsafe'
 ))
 
+# maximum number of compiled bit flag expressions kept by compile_bit_flags()
+COMPILED_FLAGS_CACHE_SIZE = 256
+_compiled_flags_cache = OrderedDict()
+_compiled_flags_lock = threading.Lock()
+
 
 def is_bit_flag(n):
     """
@@ -80,7 +103,37 @@ def _is_int(n):
     )
 
 
-def interpret_bit_flags(bit_flags, flip_bits=None):
+class BitFlagMask(namedtuple('BitFlagMask', ['bitmask', 'bit_flags'])):
+    """
+    An immutable, already interpreted set of bit flags as returned by
+    `compile_bit_flags`.
+
+    Attributes
+    ----------
+    bitmask : int or None
+        The integer bitmask (with bits already flipped, if requested) or `None`
+        (see `interpret_bit_flags`).
+
+    bit_flags : object
+        The bit flags from which ``bitmask`` was obtained (informational).
+
+    """
+    __slots__ = ()
+
+
+def _normalize_flag_name_map(flag_name_map):
+    if flag_name_map is None:
+        return None
+    names = {}
+    for name, value in dict(flag_name_map).items():
+        if not _is_int(value) or value < 0:
+            raise ValueError("Values of 'flag_name_map' must be non-negative "
+                             "integers.")
+        names[str(name).strip().upper()] = int(value)
+    return names
+
+
+def interpret_bit_flags(bit_flags, flip_bits=None, flag_name_map=None):
     """
     Converts input bit flags to a single integer value (bitmask) or `None`.
 
@@ -112,6 +165,12 @@ def interpret_bit_flags(bit_flags, flip_bits=None):
         obtained from input bit flags. This parameter must be set to `None`
         when input `bit_flags` is either `None` or a Python list of flags.
 
+    flag_name_map : dict, None
+        A mapping of (case-insensitive) flag names to integer bit flags, e.g.,
+        ``{'HOT': 16, 'SATURATED': 256}``. When provided, flags in a string
+        or Python list of bit flags can also be given by name. Named values
+        may combine several bits.
+
     Returns
     -------
     bitmask : int or None
@@ -136,13 +195,25 @@ def interpret_bit_flags(bit_flags, flip_bits=None):
     '0000000000011100'
     >>> "{0:016b}".format(0xFFFF & interpret_bit_flags([4, 8, 16], flip_bits=True))
     '1111111111100011'
+    >>> "{0:016b}".format(0xFFFF & interpret_bit_flags('~(HOT,8)', flag_name_map={'HOT': 16}))
+    '1111111111100111'
 
     """
     has_flip_bits = flip_bits is not None
     flip_bits = bool(flip_bits)
     allow_non_flags = False
+    names = _normalize_flag_name_map(flag_name_map)
+    named_values = set()
 
-    if _is_int(bit_flags):
+    if isinstance(bit_flags, BitFlagMask):
+        if has_flip_bits:
+            raise TypeError(
+                "Keyword argument 'flip_bits' must be set to 'None' when "
+                "input 'bit_flags' is a 'BitFlagMask'."
+            )
+        return bit_flags.bitmask
+
+    elif _is_int(bit_flags):
         return (~int(bit_flags) if flip_bits else int(bit_flags))
 
     elif bit_flags is None:
@@ -212,7 +283,34 @@ def interpret_bit_flags(bit_flags, flip_bits=None):
 
         allow_non_flags = len(bit_flags) == 1
 
+        if names is not None:
+            flags = []
+            for flag in bit_flags:
+                flag = flag.strip()
+                if flag.upper() in names:
+                    flag = names[flag.upper()]
+                    named_values.add(flag)
+                else:
+                    try:
+                        int(flag)
+                    except ValueError:
+                        raise ValueError("Unknown bit flag name '{:s}'."
+                                         .format(flag))
+                flags.append(flag)
+            bit_flags = flags
+
     elif hasattr(bit_flags, '__iter__'):
+        if names is not None:
+            flags = []
+            for flag in bit_flags:
+                if isinstance(flag, six.string_types):
+                    if flag.strip().upper() not in names:
+                        raise ValueError("Unknown bit flag name '{:s}'."
+                                         .format(flag))
+                    flag = names[flag.strip().upper()]
+                    named_values.add(flag)
+                flags.append(flag)
+            bit_flags = flags
         if not all([_is_int(flag) for flag in bit_flags]):
             raise TypeError("Each bit flag in a list must be an integer.")
 
@@ -225,10 +323,11 @@ def interpret_bit_flags(bit_flags, flip_bits=None):
 
     bitmask = 0
     for v in bitset:
-        if not is_bit_flag(v) and not allow_non_flags:
+        if not is_bit_flag(v) and not allow_non_flags and v not in named_values:
             raise ValueError("Input list contains invalid (not powers of two) "
                              "bit flags")
-        bitmask += v
+        # named flags may share bits
+        bitmask |= v
 
     if flip_bits:
         bitmask = ~bitmask
@@ -236,8 +335,158 @@ def interpret_bit_flags(bit_flags, flip_bits=None):
     return bitmask
 
 
+def _cache_key(value):
+    # Include types so that, e.g., 1, 1.0 and True (which compare equal but
+    # are interpreted differently) do not share a cache entry.
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_cache_key(v) for v in value))
+    if isinstance(value, dict):
+        return (dict, frozenset((k, _cache_key(v)) for k, v in value.items()))
+    return (type(value), value)
+
+
+def compile_bit_flags(bit_flags, flip_bits=None, flag_name_map=None):
+    """
+    Interprets bit flags (see `interpret_bit_flags`) and returns the result
+    as an immutable `BitFlagMask` object that can be passed directly as
+    ``ignore_flags`` to `bitfield_to_boolean_mask` and
+    `combine_bitfields_to_boolean_mask` (or as ``ignore_bits`` to
+    `bitmask2mask`) without being interpreted again.
+
+    Results are kept in a least-recently-used cache (of
+    ``COMPILED_FLAGS_CACHE_SIZE`` entries) so that repeatedly compiling the
+    same expression (e.g., ``'~(2+4)'``) only parses and validates it once.
+
+    Parameters
+    ----------
+    bit_flags : int, str, list, None, BitFlagMask
+        Bit flags. See `interpret_bit_flags` for details. `BitFlagMask`
+        input is returned unchanged.
+
+    flip_bits : bool, None
+        See `interpret_bit_flags`.
+
+    flag_name_map : dict, None
+        See `interpret_bit_flags`. Names are resolved at compile time.
+
+    Returns
+    -------
+    mask : BitFlagMask
+        Compiled bit flags.
+
+    Examples
+    --------
+    >>> from stsci.tools.bitmask import compile_bit_flags
+    >>> compile_bit_flags('~(2+4)').bitmask
+    -7
+    >>> compile_bit_flags('SATURATED,4', flag_name_map={'saturated': 256}).bitmask
+    260
+
+    """
+    if isinstance(bit_flags, BitFlagMask):
+        if flip_bits is not None:
+            raise TypeError(
+                "Keyword argument 'flip_bits' must be set to 'None' when "
+                "input 'bit_flags' is a 'BitFlagMask'."
+            )
+        return bit_flags
+
+    try:
+        key = (_cache_key(bit_flags), _cache_key(flip_bits),
+               _cache_key(flag_name_map))
+        hash(key)
+    except TypeError:
+        key = None
+
+    if key is not None:
+        with _compiled_flags_lock:
+            mask = _compiled_flags_cache.pop(key, None)
+            if mask is not None:
+                _compiled_flags_cache[key] = mask
+                return mask
+
+    mask = BitFlagMask(
+        interpret_bit_flags(bit_flags, flip_bits=flip_bits,
+                            flag_name_map=flag_name_map),
+        bit_flags if key is None or not isinstance(bit_flags, list)
+        else tuple(bit_flags)
+    )
+
+    if key is not None:
+        with _compiled_flags_lock:
+            _compiled_flags_cache[key] = mask
+            while len(_compiled_flags_cache) > COMPILED_FLAGS_CACHE_SIZE:
+                _compiled_flags_cache.popitem(last=False)
+
+    return mask
+
+
+def _check_block_size(block_size):
+    if block_size is not None and (not _is_int(block_size) or
+                                   block_size < 1):
+        raise ValueError("'block_size' must be None or a positive integer.")
+
+
+def _fill_mask(bitfields, ignore_mask, good_mask_value, out, block_size):
+    """
+    Fill ``out`` with the combined mask of ``bitfields`` processing at most
+    ``block_size`` rows at a time. ``ignore_mask`` must be an integer
+    bitmask or `None`.
+    """
+    if ignore_mask is None:
+        out.fill(1 if good_mask_value else 0)
+        return
+
+    # filter out bits beyond the maximum supported by the data type and
+    # invert the "ignore" mask for each input data type:
+    ignore_mask = ignore_mask & SUPPORTED_FLAGS
+    keep_masks = [
+        np.bitwise_not(ignore_mask, dtype=b.dtype, casting='unsafe')
+        for b in bitfields
+    ]
+
+    if out.ndim == 0:
+        blocks = [Ellipsis]
+    else:
+        nrows = out.shape[0]
+        if block_size is None:
+            block_size = max(nrows, 1)
+        blocks = [slice(k, k + block_size) for k in range(0, nrows, block_size)]
+
+    tmp = None
+    for blk in blocks:
+        mask = out[blk]
+        if mask.dtype != np.bool_:
+            mask = np.empty(mask.shape, dtype=np.bool_)
+
+        np.bitwise_and(bitfields[0][blk], keep_masks[0], out=mask,
+                       casting='unsafe')
+        for bitfield, keep_mask in zip(bitfields[1:], keep_masks[1:]):
+            if tmp is None or tmp.shape != mask.shape:
+                tmp = np.empty_like(mask)
+            np.bitwise_and(bitfield[blk], keep_mask, out=tmp,
+                           casting='unsafe')
+            np.logical_or(mask, tmp, out=mask)
+
+        if good_mask_value:
+            np.logical_not(mask, out=mask)
+
+        if mask.dtype != out.dtype:
+            out[blk] = mask
+
+
+def _mask_output(shape, dtype, out):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != shape:
+        raise ValueError("Output array must have the same shape as the "
+                         "input bit field array.")
+    return out
+
+
 def bitfield_to_boolean_mask(bitfield, ignore_flags=0, flip_bits=None,
-                             good_mask_value=True, dtype=np.bool_):
+                             good_mask_value=True, dtype=np.bool_, out=None,
+                             block_size=None):
     """
     Converts an array of bit fields to a boolean (or integer) mask array
     according to a bitmask constructed from the supplied bit flags (see
@@ -254,11 +503,13 @@ def bitfield_to_boolean_mask(bitfield, ignore_flags=0, flip_bits=None,
         as "good" values. However, see ``ignore_flags`` parameter on how to
         selectively ignore some bits in the ``bitfield`` array data.
 
-    ignore_flags : int, str, list, None (Default = 0)
+    ignore_flags : int, str, list, None, BitFlagMask (Default = 0)
         An integer bitmask, a Python list of bit flags, a comma- or
         '+'-separated string list of integer bit flags that indicate what
-        bits in the input ``bitfield`` should be *ignored* (i.e., zeroed), or
-        `None`.
+        bits in the input ``bitfield`` should be *ignored* (i.e., zeroed),
+        `None`, or bit flags already compiled with `compile_bit_flags`.
+        Bit flags that are not already compiled are compiled (and cached)
+        with `compile_bit_flags`.
 
         Setting ``ignore_flags`` to `None` effectively will make
         `bitfield_to_boolean_mask` interpret all ``bitfield`` elements
@@ -362,7 +613,20 @@ def bitfield_to_boolean_mask(bitfield, ignore_flags=0, flip_bits=None,
         to "bad" flags will be `True` (or 1).
 
     dtype : data-type
-        The desired data-type for the output binary mask array.
+        The desired data-type for the output binary mask array. Ignored when
+        ``out`` is provided.
+
+    out : numpy.ndarray, None (Default = None)
+        An array of the same shape as ``bitfield`` into which the mask is
+        written (with ``out``'s data type). When `None`, a new array
+        is allocated.
+
+    block_size : int, None (Default = None)
+        Maximum number of rows (along the first axis) of ``bitfield`` to
+        process at a time. Temporary arrays are then limited to the size of
+        one block, and a memory-mapped ``bitfield`` (and ``out``) is only
+        read (written) one block at a time. When `None`, the whole array is
+        processed at once.
 
     Returns
     -------
@@ -371,7 +635,8 @@ def bitfield_to_boolean_mask(bitfield, ignore_flags=0, flip_bits=None,
         array whose elements can have two possible values,
         e.g., `True` or `False` (or 1 or 0 for integer ``dtype``) according to
         values of to the input ``bitfield`` elements, ``ignore_flags``
-        parameter, and the ``good_mask_value`` parameter.
+        parameter, and the ``good_mask_value`` parameter. When ``out`` is
+        provided, ``out`` is returned.
 
     Examples
     --------
@@ -405,29 +670,88 @@ def bitfield_to_boolean_mask(bitfield, ignore_flags=0, flip_bits=None,
     if not np.issubdtype(bitfield.dtype, np.integer):
         raise TypeError("Input bitfield array must be of integer type.")
 
-    ignore_mask = interpret_bit_flags(ignore_flags, flip_bits=flip_bits)
+    _check_block_size(block_size)
+    ignore_mask = compile_bit_flags(ignore_flags, flip_bits=flip_bits).bitmask
 
-    if ignore_mask is None:
-        if good_mask_value:
-            mask = np.ones_like(bitfield, dtype=dtype)
-        else:
-            mask = np.zeros_like(bitfield, dtype=dtype)
-        return mask
+    mask = _mask_output(bitfield.shape, dtype, out)
+    _fill_mask([bitfield], ignore_mask, good_mask_value, mask, block_size)
 
-    # filter out bits beyond the maximum supported by the data type:
-    ignore_mask = ignore_mask & SUPPORTED_FLAGS
+    return mask
 
-    # invert the "ignore" mask:
-    ignore_mask = np.bitwise_not(ignore_mask, dtype=bitfield.dtype,
-                                 casting='unsafe')
 
-    mask = np.empty_like(bitfield, dtype=np.bool_)
-    np.bitwise_and(bitfield, ignore_mask, out=mask, casting='unsafe')
+def combine_bitfields_to_boolean_mask(bitfields, ignore_flags=0,
+                                      flip_bits=None, good_mask_value=True,
+                                      dtype=np.bool_, out=None,
+                                      block_size=None):
+    """
+    Converts several arrays of bit fields (e.g., the DQ arrays of several
+    images of the same shape) to a single boolean (or integer) mask array in
+    one pass over the data.
 
-    if good_mask_value:
-        np.logical_not(mask, out=mask)
+    An element of the output mask is "good" only when the corresponding
+    elements of *all* input ``bitfields`` are "good", i.e., the result is
+    the same as combining the masks computed by `bitfield_to_boolean_mask`
+    for each input array, but without creating an intermediate mask for
+    each of the inputs.
 
-    return mask.astype(dtype=dtype, subok=False, copy=False)
+    Parameters
+    ----------
+    bitfields : list of numpy.ndarray
+        A list of integer arrays of bit flags. All arrays must have the same
+        shape but may have different data types.
+
+    ignore_flags : int, str, list, None (Default = 0)
+        Bit flags to ignore in all ``bitfields``.
+        See `bitfield_to_boolean_mask` for details.
+
+    flip_bits : bool, None (Default = None)
+        See `bitfield_to_boolean_mask`.
+
+    good_mask_value : int, bool (Default = True)
+        See `bitfield_to_boolean_mask`.
+
+    dtype : data-type
+        The desired data-type for the output binary mask array. Ignored when
+        ``out`` is provided.
+
+    out : numpy.ndarray, None (Default = None)
+        See `bitfield_to_boolean_mask`.
+
+    block_size : int, None (Default = None)
+        See `bitfield_to_boolean_mask`.
+
+    Returns
+    -------
+    mask : numpy.ndarray
+        The combined mask of the same shape as the input ``bitfields``.
+
+    Examples
+    --------
+    >>> from stsci.tools import bitmask
+    >>> import numpy as np
+    >>> dq1 = np.asarray([[0, 0, 1, 2], [8, 4, 0, 0]])
+    >>> dq2 = np.asarray([[0, 4, 0, 0], [0, 0, 16, 0]])
+    >>> bitmask.combine_bitfields_to_boolean_mask([dq1, dq2], ignore_flags=4, dtype=int)
+    array([[1, 1, 0, 0],
+           [0, 1, 0, 1]])
+
+    """
+    bitfields = [np.asarray(b) for b in bitfields]
+    if not bitfields:
+        raise ValueError("At least one bit field array must be provided.")
+    for bitfield in bitfields:
+        if not np.issubdtype(bitfield.dtype, np.integer):
+            raise TypeError("Input bitfield arrays must be of integer type.")
+        if bitfield.shape != bitfields[0].shape:
+            raise ValueError("Input bitfield arrays must have the same shape.")
+
+    _check_block_size(block_size)
+    ignore_mask = compile_bit_flags(ignore_flags, flip_bits=flip_bits).bitmask
+
+    mask = _mask_output(bitfields[0].shape, dtype, out)
+    _fill_mask(bitfields, ignore_mask, good_mask_value, mask, block_size)
+
+    return mask
 
 
 @deprecated(since='3.4.6', message='', name='interpret_bits_value',
@@ -459,6 +783,9 @@ def interpret_bits_value(val):
         value will have its bits flipped (inverse mask).
 
     """
+    if isinstance(val, BitFlagMask):
+        return val.bitmask
+
     if isinstance(val, int) or val is None:
         return val
 
@@ -518,10 +845,11 @@ def bitmask2mask(bitmask, ignore_bits, good_mask_value=1, dtype=np.bool_):
         However, see `ignore_bits` parameter on how to ignore some bits
         in the `bitmask` array.
 
-    ignore_bits : int, str, None
-        An integer bit mask, `None`, or a comma- or '+'-separated
+    ignore_bits : int, str, None, BitFlagMask
+        An integer bit mask, `None`, a comma- or '+'-separated
         string list of integer bit values that indicate what bits in the
-        input `bitmask` should be *ignored* (i.e., zeroed). If `ignore_bits`
+        input `bitmask` should be *ignored* (i.e., zeroed), or bits
+        compiled with `compile_bit_flags`. If `ignore_bits`
         is a `str` and if it is prepended with '~', then the meaning
         of `ignore_bits` parameters will be reversed: now it will be
         interpreted as a list of bits to be *used* (or *not ignored*) when
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""
+        convertbatch: Convert many GEIS and waivered-FITS files to
+        multi-extension FITS files in parallel.
+
+        Usage:
+
+                convertbatch.py [OPTIONS] FILE ...
+
+                FILE may be anything understood by `irafglob`: a file name,
+                a wild-card pattern (in quotes), a comma-separated list or
+                an @-file.  GEIS inputs are the ``*.??h`` header files;
+                every other input is taken to be a waivered-FITS file.
+
+                GEIS file abc.xyh is written to abc_xyh.fits, and waivered
+                FITS file abc_xyf.fits is written to abc_xyh.fits.  Inputs
+                whose output is newer than the input are skipped.
+
+        :Options:
+
+        -h
+        --help     print the help (this text)
+
+        -j
+        --jobs     Number of worker processes [Default: number of CPUs]
+
+        -o
+        --outdir   Directory to write the output files to
+                   [Default: the directory of each input file]
+
+        -f
+        --force    Convert inputs even when their output is up to date
+
+        -q
+        --quiet    Only print the summary
+
+        :Example:
+
+        If used in Pythons script, a user can, e. g.::
+
+            >>> from stsci.tools import convertbatch
+            >>> results = convertbatch.convert_batch('u*.c0h', num_cores=8)  # doctest: +SKIP
+
+        The same from the command line::
+
+            convertbatch -j 8 "u*.c0h" "@waivered.lst"
+
+"""
+# Developed by Science Software Branch, STScI, USA.
+
+from __future__ import division, print_function
+
+__version__ = "1.0 (18 Oct, 2026), \xa9 AURA"
+
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+import astropy
+from distutils.version import LooseVersion
+
+from . import convertwaiveredfits, fileutil, readgeis
+from .irafglob import irafglob
+
+ASTROPY_VER_GE13 = LooseVersion(astropy.__version__) >= LooseVersion('1.3')
+
+ConversionResult = namedtuple('ConversionResult',
+                              ['input', 'output', 'status', 'seconds', 'nbytes'])
+ConversionResult.__doc__ = """Outcome of converting one input file.
+
+``status`` is one of 'converted', 'skipped' or 'failed: <reason>',
+``seconds`` is the wall time spent on the file and ``nbytes`` the size
+of its input (header and data files for GEIS).
+"""
+
+
+def _isgeis(filename):
+    return filename[-1] == 'h' and filename[-4] == '.'
+
+
+def _input_files(filename):
+    """Return the list of files on disk making up the input image."""
+    if _isgeis(filename):
+        return [filename, filename[:-1] + 'd']
+    return [filename]
+
+
+def output_name(filename, outdir=None):
+    """Return the name of the multi-extension FITS file for an input."""
+    if _isgeis(filename):
+        output = fileutil.buildFITSName(filename)
+    else:
+        base, ext = os.path.splitext(filename)
+        output = base[:-1] + 'h' + ext
+
+    if outdir is not None:
+        output = os.path.join(outdir, os.path.basename(output))
+    return output
+
+
+def is_up_to_date(filename, output):
+    """Return True if ``output`` exists and is newer than every file of
+    the input ``filename``."""
+    if not os.path.exists(output):
+        return False
+    out_mtime = os.path.getmtime(output)
+    return all(os.path.getmtime(f) <= out_mtime
+               for f in _input_files(filename))
+
+
+def convert_file(filename, output=None, force=False):
+    """Convert one GEIS or waivered-FITS file to multi-extension FITS.
+
+    Returns a `ConversionResult`; errors are reported through its
+    ``status`` rather than raised, so that one bad file does not stop a
+    batch.
+    """
+    if output is None:
+        output = output_name(filename)
+
+    start = time.time()
+    try:
+        nbytes = sum(os.path.getsize(f) for f in _input_files(filename))
+        if not force and is_up_to_date(filename, output):
+            status = 'skipped'
+        elif _isgeis(filename):
+            hdulist = readgeis.readgeis(filename)
+            readgeis.stsci2(hdulist, output)
+            if ASTROPY_VER_GE13:
+                hdulist.writeto(output, overwrite=True)
+            else:
+                hdulist.writeto(output, clobber=True)
+            hdulist.close()
+            status = 'converted'
+        else:
+            hdulist = convertwaiveredfits.toMultiExtensionFits(filename, output)
+            hdulist.close()
+            status = 'converted'
+    except Exception as e:
+        nbytes = 0
+        status = 'failed: ' + str(e)
+
+    return ConversionResult(filename, output, status, time.time() - start,
+                            nbytes)
+
+
+def _convert_task(args):
+    index, filename, output, force = args
+    return index, convert_file(filename, output, force)
+
+
+def convert_batch(inlist, outdir=None, num_cores=None, force=False,
+                  verbose=True):
+    """Convert a list of GEIS and/or waivered-FITS files in parallel.
+
+    Parameters
+    ----------
+    inlist : str or list
+        Input files, in any form understood by `irafglob`.
+
+    outdir : str or None
+        Directory for the output files; by default each output is written
+        next to its input.
+
+    num_cores : int or None
+        Maximum number of worker processes; defaults to the number of CPUs.
+        With 1 the files are converted in this process.
+
+    force : bool
+        Convert inputs even when their output is already up to date.
+
+    verbose : bool
+        Print a line with the timing of each file as it finishes, in
+        addition to the summary.
+
+    Returns
+    -------
+    results : list of `ConversionResult`
+        One result per input file, in input order.
+    """
+    files = irafglob(inlist)
+    tasks = [(i, f, output_name(f, outdir), force)
+             for i, f in enumerate(files)]
+    if num_cores is None:
+        num_cores = multiprocessing.cpu_count()
+    num_cores = max(1, min(num_cores, len(tasks)))
+
+    results = [None] * len(tasks)
+    start = time.time()
+
+    if num_cores == 1:
+        pool = None
+        done = map(_convert_task, tasks)
+    else:
+        pool = multiprocessing.Pool(processes=num_cores)
+        done = pool.imap_unordered(_convert_task, tasks)
+
+    try:
+        for index, result in done:
+            results[index] = result
+            if verbose:
+                print("%s -> %s: %s (%.2f s)" % (result.input, result.output,
+                                                 result.status, result.seconds))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.time() - start
+    converted = [r for r in results if r.status == 'converted']
+    nskipped = len([r for r in results if r.status == 'skipped'])
+    nbytes = sum(r.nbytes for r in converted)
+    rate = elapsed if elapsed > 0 else 1.
+    print("convertbatch: %d converted, %d skipped, %d failed in %.2f s "
+          "with %d process(es) (%.2f files/s, %.2f MB/s)" %
+          (len(converted), nskipped, len(results) - len(converted) - nskipped,
+           elapsed, num_cores, len(converted) / rate,
+           nbytes / rate / 2.**20))
+
+    return results
+
+
+def usage():
+    print(__doc__)
+
+
+def main():
+    import getopt
+
+    try:
+        optlist, args = getopt.getopt(sys.argv[1:], 'hj:o:fq',
+                                      ['help', 'jobs=', 'outdir=', 'force',
+                                       'quiet'])
+    except getopt.error as e:
+        print(str(e))
+        print(__doc__)
+        print("\t", __version__)
+        sys.exit(2)
+
+    num_cores = None
+    outdir = None
+    force = False
+    verbose = True
+
+    for o, a in optlist:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif o in ("-j", "--jobs"):
+            num_cores = int(a)
+        elif o in ("-o", "--outdir"):
+            outdir = a
+        elif o in ("-f", "--force"):
+            force = True
+        elif o in ("-q", "--quiet"):
+            verbose = False
+        else:
+            raise ValueError("unhandled option")
+
+    if not args:
+        print("convertbatch: nothing to convert")
+        usage()
+        sys.exit(1)
+
+    results = convert_batch(args, outdir=outdir, num_cores=num_cores,
+                            force=force, verbose=verbose)
+    if any(r.status.startswith('failed') for r in results):
+        sys.exit(1)
+
+#-------------------------------------------------------------------------------
+# special initialization when this is the main program
+
+if __name__ == "__main__":
+    main()
+
+"""
+
+Copyright (C) 2026 Association of Universities for Research in Astronomy (AURA)
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+
+    2. Redistributions in binary form must reproduce the above
+      copyright notice, this list of conditions and the following
+      disclaimer in the documentation and/or other materials provided
+      with the distribution.
+
+    3. The name of AURA and its representatives may not be used to
+      endorse or promote products derived from this software without
+      specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY AURA ``AS IS'' AND ANY EXPRESS OR IMPLIED
+WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL AURA BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS
+OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR
+TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+DAMAGE.
+"""
@@ -75,6 +75,8 @@ from astropy.io import fits
 import numpy
 import array
 
+from .readgeis import read_groups, parameter_headers, byteorder_suspect
+
 if sys.version_info[0] > 2:
     from functools import reduce
 
@@ -97,13 +99,17 @@ def stsci2(hdulist, filename):
     if instrument in ("WFPC2", "FOC"):
         hdulist[0].header['FILENAME'] = filename
 
-def convert(input):
+def convert(input, check='full'):
 
     """Input GEIS files "input" will be read and a HDUList object will
        be returned that matches the waiver-FITS format written out by 'stwfits' in IRAF.
 
        The user can use the writeto method to write the HDUList object to
        a FITS file.
+
+       ``check`` selects the byte-order sanity check done on the data of
+       each group: 'full', 'sampled' or 'none' (see
+       `~stsci.tools.readgeis.byteorder_suspect`).
     """
 
     global dat
@@ -165,7 +171,6 @@ def convert(input):
     bools = []
     floats = []
     cols = [] # column definitions used for extension table
-    cols_dict = {} # provides name access to Column defs
     _range = range(1, pcount+1)
     key = [phdr['PTYPE'+str(j)] for j in _range]
     comm = [phdr.cards['PTYPE'+str(j)].comment for j in _range]
@@ -210,10 +215,7 @@ def convert(input):
         if 'LOGICAL' in _type:
             afmt = cols_fmt[_type]
         cfmt = cols_pfmt[_type]+nrpt
-
-        #print 'Column format for ',ptype,': ',cfmt,' with dtype of ',afmt
-        cols_dict[ptype] = fits.Column(name=ptype,format=cfmt,array=numpy.zeros(gcount,dtype=afmt))
-        cols.append(cols_dict[ptype]) # This keeps the columns in order
+        cols.append((ptype, cfmt, afmt)) # This keeps the columns in order
 
     _shape = _naxis[1:]
     _shape.reverse()
@@ -246,93 +248,61 @@ def convert(input):
     dat = f1.read()
     errormsg = ""
 
+    data, params = read_groups(dat, _code, _shape, formats, gcount,
+                               data_size, group_size)
+
     # Define data array for all groups
-    arr_shape = _naxis[:]
-    arr_shape[0] = gcount
-    arr_stack = numpy.zeros(arr_shape,dtype=_code)
+    arr_stack = data.copy()
 
-    loc = 0
     for k in range(gcount):
-        ext_dat = numpy.fromstring(dat[loc:loc+data_size], dtype=_code)
-        ext_dat = ext_dat.reshape(_shape)
+        ext_dat = arr_stack[k]
         if _uint16:
             ext_dat += _bzero
         # Check to see whether there are any NaN's or infs which might indicate
         # a byte-swapping problem, such as being written out on little-endian
         #   and being read in on big-endian or vice-versa.
-        if _code.find('float') >= 0 and \
-            (numpy.any(numpy.isnan(ext_dat)) or numpy.any(numpy.isinf(ext_dat))):
+        if byteorder_suspect(ext_dat, check):
             errormsg += "===================================\n"
             errormsg += "= WARNING:                        =\n"
             errormsg += "=  Input image:                   =\n"
             errormsg += input+"[%d]\n"%(k+1)
-            errormsg += "=  had floating point data values =\n"
-            errormsg += "=  of NaN and/or Inf.             =\n"
-            errormsg += "===================================\n"
-        elif _code.find('int') >= 0:
-            # Check INT data for max values
-            ext_dat_frac,ext_dat_exp = numpy.frexp(ext_dat)
-            if ext_dat_exp.max() == int(_bitpix) - 1:
+            if _code.find('float') >= 0:
+                errormsg += "=  had floating point data values =\n"
+                errormsg += "=  of NaN and/or Inf.             =\n"
+            else:
                 # Potential problems with byteswapping
-                errormsg += "===================================\n"
-                errormsg += "= WARNING:                        =\n"
-                errormsg += "=  Input image:                   =\n"
-                errormsg += input+"[%d]\n"%(k+1)
                 errormsg += "=  had integer data values        =\n"
                 errormsg += "=  with maximum bitvalues.        =\n"
-                errormsg += "===================================\n"
-
-        arr_stack[k] = ext_dat
-        #ext_hdu = fits.hdu.ImageHDU(data=ext_dat)
-
-        rec = numpy.fromstring(dat[loc+data_size:loc+group_size], dtype=formats)
-
-        loc += group_size
-
-        # Add data from this GPB to table
-        for i in range(1, pcount+1):
-            val = rec[0][i-1]
-            if i in bools:
-                if val:
-                    val = 'T'
-                else:
-                    val = 'F'
-            cols[i-1].array[k] = val
-
-        # Based on the first group, add GPB keywords to PRIMARY header
-        if k == 0:
-            # Create separate PyFITS Card objects for each entry in 'rec'
-            # and update Primary HDU with these keywords after PSIZE
-            for i in range(1, pcount+1):
-                #val = rec.field(i-1)[0]
-                val = rec[0][i-1]
-                if val.dtype.kind == 'S':
-                    val = val.decode('ascii')
-
-                if i in bools:
-                    if val:
-                        val = True
-                    else:
-                        val = False
-
-                elif i in floats:
-                    # use fromstring, format in Card is deprecated in pyfits 0.9
-                    _str = '%-8s= %20.13G / %s' % (key[i-1], val, comm[i-1])
-                    _card = fits.Card.fromstring(_str)
-
-                else:
-                    _card = fits.Card(key=key[i-1], value=val, comment=comm[i-1])
-
-                phdr.insert(phdr_indx+i, _card)
+            errormsg += "===================================\n"
 
-            # deal with bscale/bzero
-            if (_bscale != 1 or _bzero != 0):
-                phdr['BSCALE'] = _bscale
-                phdr['BZERO'] = _bzero
+    # Decode the group parameters of all groups at once, one column per PTYPE
+    columns = [params[name] for name in params.dtype.names]
+    fmts = []
+    for i in range(1, pcount+1):
+        if i in bools:
+            columns[i-1] = columns[i-1] != 0
+        fmts.append('%20.13G' if i in floats else None)
+
+    # Add the GPB keywords of the first group to the PRIMARY header after PSIZE
+    gpb_hdr = parameter_headers(key, [c[:1] for c in columns], comm, fmts)[0]
+    for i, _card in enumerate(gpb_hdr.cards, 1):
+        phdr.insert(phdr_indx+i, _card)
+
+    # deal with bscale/bzero
+    if (_bscale != 1 or _bzero != 0):
+        phdr['BSCALE'] = _bscale
+        phdr['BZERO'] = _bzero
+
+    # Create the group-parameter block table columns from all groups
+    table_cols = []
+    for (ptype, cfmt, afmt), values in zip(cols, columns):
+        if values.dtype.kind == 'b':
+            values = numpy.where(values, 'T', 'F')
+        table_cols.append(fits.Column(name=ptype, format=cfmt,
+                                      array=values.astype(afmt)))
 
-        #hdulist.append(ext_hdu)
     # Define new table based on Column definitions
-    ext_table = fits.TableHDU.from_columns(cols)
+    ext_table = fits.TableHDU.from_columns(table_cols)
     ext_table.header.set('EXTNAME', value=input+'.tab', after='TFIELDS')
     # Add column descriptions to header of table extension to match stwfits output
     for i in range(len(key)):
@@ -120,10 +120,13 @@ from __future__ import division, print_function  # confidence high
 #
 import os
 import sys
+import numpy
 import astropy
 from astropy.io import fits
 from distutils.version import LooseVersion
 
+from .readgeis import parameter_headers
+
 if sys.version_info[0] < 3:
     string_types = basestring
 else:
@@ -287,6 +290,70 @@ def _verify(waiveredHdul):
     raise ValueError("Input object does not represent a valid waivered" + \
                       " FITS file")
 
+
+def multiExtensionPrimaryHDU(waiveredHeader, columnNames, nrows):
+    """
+        Create the multi-extension FITS primary HDU out of the primary
+        header of a waivered FITS file.
+
+        Parameters:
+
+          waiveredHeader  primary header of the waivered FITS file; the
+                          cards which do not belong in the multi-extension
+                          primary header are removed from it in place
+
+          columnNames     names of the columns of the waivered FITS table
+
+          nrows           number of rows in the waivered FITS table, one
+                          per extension
+
+        Returns:
+
+          mPHdu           the primary HDU, without data
+    """
+
+    undesiredPrimaryHeaderKeywords = ['ORIGIN','FITSDATE','FILENAME',
+                                      'ALLG-MAX','ALLG-MIN','ODATTYPE',
+                                      'SDASMGNU','OPSIZE','CTYPE2',
+                                      'CD2_2','CD2_1','CD1_2','CTYPE3',
+                                      'CD3_3','CD3_1','CD1_3','CD2_3',
+                                      'CD3_2']
+    mPHeader = waiveredHeader
+    #
+    # Remove primary header cards with keywords matching the
+    # list of undesired primary header keywords
+    #
+    for keyword in undesiredPrimaryHeaderKeywords:
+        #
+        # Be careful only to delete the first card that matches
+        # the keyword, not all of the cards
+        #
+        if keyword in mPHeader:
+            del mPHeader[mPHeader.index(keyword)]
+    #
+    # Remove primary header cards with keywords matching the
+    # column names in the secondary HDU table
+    #
+    for keyword in columnNames:
+        if keyword in mPHeader:
+            del mPHeader[keyword]
+    #
+    # Create the PrimaryHDU
+    #
+    mPHdu = fits.PrimaryHDU(header=mPHeader)
+    #
+    # Add the EXTEND card
+    #
+    mPHdu.header.set('EXTEND', value=True, after='NAXIS')
+    #
+    # Add the NEXTEND card.  There will be one extension
+    # for each row in the wavered Fits file table HDU.
+    #
+    mPHdu.header['NEXTEND'] = (nrows, 'Number of standard extensions')
+
+    return mPHdu
+
+
 def toMultiExtensionFits(waiveredObject,
                          multiExtensionFileName=None,
                          forceFileOutput=False,
@@ -341,12 +408,6 @@ def toMultiExtensionFits(waiveredObject,
 
     _verify(whdul)
 
-    undesiredPrimaryHeaderKeywords = ['ORIGIN','FITSDATE','FILENAME',
-                                      'ALLG-MAX','ALLG-MIN','ODATTYPE',
-                                      'SDASMGNU','OPSIZE','CTYPE2',
-                                      'CD2_2','CD2_1','CD1_2','CTYPE3',
-                                      'CD3_3','CD3_1','CD1_3','CD2_3',
-                                      'CD3_2']
     #
     # Create the multi-extension primary header as a copy of the
     # wavered file primary header
@@ -354,41 +415,11 @@ def toMultiExtensionFits(waiveredObject,
     mPHeader = whdul[0].header
     originalDataType =  whdul[0].header.get('ODATTYPE','')
     #
-    # Remove primary header cards with keywords matching the
-    # list of undesired primary header keywords
-    #
-    for keyword in undesiredPrimaryHeaderKeywords:
-        #
-        # Be careful only to delete the first card that matches
-        # the keyword, not all of the cards
-        #
-        if keyword in mPHeader:
-            del mPHeader[mPHeader.index(keyword)]
-    #
     # Get the columns from the secondary HDU table
     #
     wcols = whdul[1].columns
-    #
-    # Remove primary header cards with keywords matching the
-    # column names in the secondary HDU table
-    #
-    for keyword in wcols.names:
-        if keyword in mPHeader:
-            del mPHeader[keyword]
-    #
-    # Create the PrimaryHDU
-    #
-    mPHdu = fits.PrimaryHDU(header=mPHeader)
-    #
-    # Add the EXTEND card
-    #
-    mPHdu.header.set('EXTEND', value=True, after='NAXIS')
-    #
-    # Add the NEXTEND card.  There will be one extension
-    # for each row in the wavered Fits file table HDU.
-    #
-    mPHdu.header['NEXTEND'] = (whdul[1].data.shape[0],
-                               'Number of standard extensions')
+    mPHdu = multiExtensionPrimaryHDU(mPHeader, wcols.names,
+                                     whdul[1].data.shape[0])
     #
     # Create the multi-extension file HDUList from the primary header
     #
@@ -399,6 +430,33 @@ def toMultiExtensionFits(waiveredObject,
     #
     instrument = mPHeader.get('INSTRUME', '')
     nrows = whdul[1].data.shape[0]
+    #
+    # Decode each column of the secondary HDU table for all rows at
+    # once, then build the extension headers for all rows in bulk
+    #
+    columns = []
+    descriptions = []
+    for keyword,format,unit in zip(wcols.names,wcols.formats,wcols.units):
+        values = whdul[1].data.field(keyword)
+        if unit == 'LOGICAL-':
+            #
+            # Handle logical values
+            #
+            values = numpy.char.strip(values) == 'T'
+        elif format[0] == 'E':
+            #
+            # Handle floating point values
+            #
+            fmt = '%'+format[1:]+'G'
+            values = numpy.char.mod(fmt, values.astype(float)).astype(float)
+        columns.append(values)
+
+        kw_descr = ""
+        if keyword in whdul[1].header:
+            kw_descr = whdul[1].header[keyword]
+        descriptions.append(kw_descr)
+
+    headers = parameter_headers(wcols.names, columns, descriptions)
 
     for i in range(0,nrows):
         #
@@ -412,33 +470,7 @@ def toMultiExtensionFits(waiveredObject,
         else:
             data = whdul[0].data[i]
 
-        mhdul.append(fits.ImageHDU(data))
-        #
-        # Add cards to the header for each keyword in the column
-        # names of the secondary HDU table from the wavered file
-        #
-        for keyword,format,unit in zip(wcols.names,wcols.formats,wcols.units):
-            if unit == 'LOGICAL-':
-                #
-                # Handle logical values
-                #
-                if whdul[1].data.field(keyword)[i].strip() == 'T':
-                    d = True
-                else:
-                    d = False
-            elif format[0] == 'E':
-                #
-                # Handle floating point values
-                #
-                fmt = '%'+format[1:]+'G'
-                d = eval(fmt % float(whdul[1].data.field(keyword)[i]))  # nosec
-            else:
-                d = whdul[1].data.field(keyword)[i]
-
-            kw_descr = ""
-            if keyword in whdul[1].header:
-                kw_descr = whdul[1].header[keyword]
-            mhdul[i+1].header[keyword] = (d, kw_descr)
+        mhdul.append(fits.ImageHDU(data, header=headers[i]))
         #
         # If original data is unsigned short then scale the data.
         #
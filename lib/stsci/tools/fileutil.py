@@ -29,6 +29,10 @@ General functions included are::
          Return a copy of the PRIMARY header, along with any group/extension
          header, for this filename specification.
 
+    enableHeaderCache(dbname=None), disableHeaderCache(), clearHeaderCache()
+        Keep the headers read by getKeyword and getHeader in an on-disk
+        database for as long as the files do not change.
+
     getExtn(fimg,extn=None)
         Returns a copy of the specified extension with data from PyFITS object
         'fimg' for desired file.
@@ -41,6 +45,9 @@ General functions included are::
 
     findFile(input)
 
+    listDirectory(path), clearDirectoryCache(path=None)
+        Names in a directory, listed again only when it changes.
+
     checkFileExists(filename,directory=None)
 
     removeFile(inlist):
@@ -62,6 +69,9 @@ IRAF compatibility functions (abbreviated list)::
     osfn(filename)
         Convert IRAF virtual path name to OS pathname
 
+    osfn_many(filenames)
+        Convert a list of IRAF virtual path names to OS pathnames
+
     show(*args, **kw)
         Print value of IRAF or OS environment variables
 
@@ -81,13 +91,17 @@ from . import convertwaiveredfits
 
 import datetime
 import copy
+import json
 import os
 import re
 import shutil
+import sqlite3
 import sys
+import threading
 
 import time as _time
 import numpy as np
+from astropy.io.fits.card import UNDEFINED
 from distutils.version import LooseVersion
 
 PY3K = sys.version_info[0] > 2
@@ -274,8 +288,7 @@ def isFits(input):
                 if f is not None:
                     f.close()
                 raise
-        data0 = f[0].data
-        if data0 is not None:
+        if _hasData(f[0].header):
             try:
                 if isinstance(f[1], fits.TableHDU):
                     fitstype = 'waiver'
@@ -464,19 +477,16 @@ def buildRootname(filename, ext=None):
     if fpath in ['', ' ', None]:
         fpath = os.curdir
     # Get complete list of filenames from current directory
-    flist = os.listdir(fpath)
+    flist = listDirectory(fpath)
 
     #First, assume given filename is complete and verify
     # it exists...
     rootname = None
 
-    for name in flist:
-        if name == froot:
-            rootname = froot
-            break
-        elif name == froot + '.fits':
-            rootname = froot + '.fits'
-            break
+    if froot in flist:
+        rootname = froot
+    elif froot + '.fits' in flist:
+        rootname = froot + '.fits'
 
     # If we have an incomplete filename, try building a default
     # name and seeing if it exists...
@@ -496,19 +506,15 @@ def buildRootname(filename, ext=None):
             # Start by looking for filename with exactly
             # the same case a provided in ASN table...
             rname = froot + extn
-            for name in flist:
-                if rname == name:
-                    rootname = name
-                    break
-            if rootname is None:
+            if rname in flist:
+                rootname = rname
+            else:
                 # Try looking for all lower-case filename
                 # instead of a mixed-case filename as required
                 # by the pipeline.
                 rname = froot.lower() + extn
-                for name in flist:
-                    if rname == name:
-                        rootname = name
-                        break
+                if rname in flist:
+                    rootname = rname
 
             if rootname is not None:
                 break
@@ -535,6 +541,11 @@ def getKeyword(filename, keyword, default=None, handle=None):
     General, write-safe method for returning a keyword value from the header of
     a IRAF recognized image.
 
+    Unless a ``handle`` is given, only the headers are read, up to the one
+    holding the keyword; GEIS and waivered FITS images are not converted
+    unless the keyword is only found in the converted extensions of a
+    waivered FITS image.
+
     Returns the value as a string.
     """
     # Insure that there is at least 1 extension specified...
@@ -543,9 +554,14 @@ def getKeyword(filename, keyword, default=None, handle=None):
 
     _fname, _extn = parseFilename(filename)
 
+    _fimg = None
     if not handle:
-        # Open image whether it is FITS or GEIS
-        _fimg = openImage(_fname)
+        try:
+            # Read just the headers, and only as many as needed
+            value = _readKeyword(_fname, _extn, keyword)
+        except _NoFastPath:
+            # Open image whether it is FITS or GEIS
+            _fimg = openImage(_fname)
     else:
         # Use what the user provides, after insuring
         # that it is a proper PyFITS object.
@@ -554,21 +570,22 @@ def getKeyword(filename, keyword, default=None, handle=None):
         else:
             raise ValueError('Handle must be %r object!' % fits.HDUList)
 
-    # Address the correct header
-    _hdr = getExtn(_fimg, _extn).header
+    if _fimg is not None:
+        # Address the correct header
+        _hdr = getExtn(_fimg, _extn).header
 
-    try:
-        value =  _hdr[keyword]
-    except KeyError:
-        _nextn = findKeywordExtn(_fimg, keyword)
         try:
-            value = _fimg[_nextn].header[keyword]
+            value =  _hdr[keyword]
         except KeyError:
-            value = ''
+            _nextn = findKeywordExtn(_fimg, keyword)
+            try:
+                value = _fimg[_nextn].header[keyword]
+            except KeyError:
+                value = ''
 
-    if not handle:
-        _fimg.close()
-        del _fimg
+        if not handle:
+            _fimg.close()
+            del _fimg
 
     if value == '':
         if default is None:
@@ -602,6 +619,8 @@ def getHeader(filename, handle=None):
     """
     Return a copy of the PRIMARY header, along with any group/extension header
     for this filename specification.
+
+    Unless a ``handle`` is given, only the headers are read from the file.
     """
 
     _fname, _extn = parseFilename(filename)
@@ -609,8 +628,12 @@ def getHeader(filename, handle=None):
     # to derive the header from...
     #
     if not handle:
-        # Open image whether it is FITS or GEIS
-        _fimg = openImage(_fname, mode='readonly')
+        try:
+            # Read just the headers, and only as many as needed
+            return _readHeader(_fname, _extn)
+        except _NoFastPath:
+            # Open image whether it is FITS or GEIS
+            _fimg = openImage(_fname, mode='readonly')
     else:
         # Use what the user provides, after insuring
         # that it is a proper PyFITS object.
@@ -619,27 +642,499 @@ def getHeader(filename, handle=None):
         else:
             raise ValueError('Handle must be a %r object!' % fits.HDUList)
 
-    _hdr = _fimg['PRIMARY'].header.copy()
+    if _isPrimaryExtn(_extn):
+        _hdr = _joinHeaders(_fimg['PRIMARY'].header)
+    else:
+        # Append correct extension/chip/group header to PRIMARY...
+        _hdr = _joinHeaders(_fimg['PRIMARY'].header,
+                            getExtn(_fimg, _extn).header)
+    if not handle:
+        # Close file handle now...
+        _fimg.close()
+        del _fimg
+
+    return _hdr
+
+
+def _isPrimaryExtn(extn):
+    return extn is None or (extn.isdigit() and int(extn) == 0)
+
+
+def _joinHeaders(phdr, ehdr=None):
+    """Return a copy of the PRIMARY header with the cards of the
+    extension header ``ehdr``, if any, appended."""
+
+    _hdr = phdr.copy()
 
     # if the data is not in the primary array delete NAXIS
     # so that the correct value is read from the extension header
     if _hdr['NAXIS'] == 0:
         del _hdr['NAXIS']
 
-    if not (_extn is None or (_extn.isdigit() and int(_extn) == 0)):
-        # Append correct extension/chip/group header to PRIMARY...
-        #for _card in getExtn(_fimg,_extn).header.ascard:
-            #_hdr.ascard.append(_card)
-        for _card in getExtn(_fimg, _extn).header.cards:
+    if ehdr is not None:
+        for _card in ehdr.cards:
             _hdr.append(_card)
-    if not handle:
-        # Close file handle now...
-        _fimg.close()
-        del _fimg
 
     return _hdr
 
 
+# Size of the logical records a FITS file is made of
+FITS_BLOCK = 2880
+
+
+class _NoFastPath(Exception):
+    """The header cannot be read without opening the whole image."""
+
+
+def _fitsHeaders(fobj):
+    """
+    Generator returning the header of each HDU of the FITS file object
+    ``fobj`` in turn, exactly as found in the file.  Only the header
+    blocks are read, the data following each header is skipped over.
+    """
+
+    while True:
+        blocks = []
+        while True:
+            block = fobj.read(FITS_BLOCK)
+            if len(block) < FITS_BLOCK:
+                if blocks or block.strip(b'\0 '):
+                    raise _NoFastPath('Truncated header in %s' % fobj.name)
+                return
+            blocks.append(block)
+            # END can only start a card
+            if b'END     ' in [block[i:i + 8]
+                              for i in range(0, FITS_BLOCK, fits.Card.length)]:
+                break
+
+        _hdr = fits.Header.fromstring(b''.join(blocks).decode('ascii'))
+        yield _hdr
+        fobj.seek(_dataSize(_hdr), 1)
+
+
+def _dataSize(hdr):
+    """Size in bytes, padding included, of the data following a header."""
+
+    naxis = hdr.get('NAXIS', 0)
+    if naxis == 0:
+        return 0
+    dims = [hdr.get('NAXIS%d' % i, 0) for i in range(1, naxis + 1)]
+    if hdr.get('GROUPS', False) and dims[0] == 0:
+        # random groups
+        dims = dims[1:]
+    size = (abs(hdr['BITPIX']) // 8 * hdr.get('GCOUNT', 1) *
+            (hdr.get('PCOUNT', 0) + int(np.prod(dims))))
+    return -(-size // FITS_BLOCK) * FITS_BLOCK
+
+
+def _hasData(hdr):
+    """
+    True if the HDU with (stpyfits) header ``hdr`` has a data array, that is
+    if astropy gives it data that are not None: any table, even without
+    rows, and any image with at least one axis, even of zero length.  The
+    header of a constant value array opened with stpyfits has the NAXISn
+    keywords of the array.
+    """
+
+    if hdr.get('XTENSION', '').strip() in ('TABLE', 'BINTABLE', 'A3DTABLE'):
+        return True
+    return hdr.get('NAXIS', 0) > 0
+
+
+class _HeaderList(object):
+    """
+    The headers of the HDUs of an image, as `openImage` would return them,
+    read only when asked for and without ever reading pixel data.
+
+    FITS headers are read one at a time from the file until the one asked
+    for is found.  GEIS headers come from the ``.??h`` file and the group
+    parameter blocks.  Of a waivered FITS file only the primary header is
+    known, as the extension headers are built out of the table data.
+    Asking for anything else raises `_NoFastPath`.
+
+    Headers kept by the header cache are given as ``strings`` instead,
+    along with their keyword ``indexes``.
+    """
+
+    def __init__(self, filename, strings=None, indexes=None, waivered=False):
+        self._headers = []
+        self._fobj = None
+        self._iter = iter(())
+        self._waivered = waivered
+        if strings is not None:
+            # Headers kept by the header cache
+            self._iter = (_IndexedHeader(string, index)
+                          for string, index in zip(strings, indexes))
+            return
+        names = ['fits', 'fit', 'FITS', 'FIT']
+        if True in [filename.endswith(l) for l in names]:
+            self._fobj = open(filename, 'rb')
+            if self._fobj.read(6) != b'SIMPLE':
+                # e.g. compressed files
+                self.close()
+                raise _NoFastPath('Not a plain FITS file: %s' % filename)
+            self._fobj.seek(0)
+            self._iter = _fitsHeaders(self._fobj)
+            if (self._next() and _hasData(self._headers[0]) and self._next()
+                    and self._headers[1].get('XTENSION') == 'TABLE'):
+                # waivered FITS
+                phdr, table = self._headers
+                colnames = [table['TTYPE%d' % i]
+                            for i in range(1, table['TFIELDS'] + 1)]
+                self._headers = [convertwaiveredfits.multiExtensionPrimaryHDU(
+                    phdr, colnames, table['NAXIS2']).header]
+                self._waivered = True
+                self.close()
+        elif filename[-1] == 'h' and filename[-4] == '.':
+            self._headers = readgeis.readgeis_headers(filename)
+        else:
+            raise _NoFastPath('Unknown image format: %s' % filename)
+
+    def _next(self):
+        """Read the next header; return False at the end of the file."""
+
+        try:
+            _hdr = next(self._iter)
+        except StopIteration:
+            self.close()
+            return False
+
+        if (_hdr.get('NAXIS', 0) == 0 and 'PIXVALUE' in _hdr and
+                (not self._headers or _hdr.get('XTENSION') == 'IMAGE')):
+            # constant value array
+            _hdr = fits.constant_value_header(_hdr)
+        self._headers.append(_hdr)
+        return True
+
+    def __getitem__(self, index):
+        while len(self._headers) <= index:
+            if not self._next():
+                raise _NoFastPath('No header %d' % index)
+        return self._headers[index]
+
+    def __iter__(self):
+        i = 0
+        while i < len(self._headers) or self._next():
+            yield self._headers[i]
+            i += 1
+        if self._waivered:
+            raise _NoFastPath('Extension headers of waivered FITS')
+
+    def strings(self):
+        """Read all headers and return them as strings."""
+
+        while self._next():
+            pass
+        return [_hdr.tostring() for _hdr in self._headers]
+
+    def close(self):
+        if self._fobj is not None:
+            self._fobj.close()
+            self._fobj = None
+            self._iter = iter(())
+
+
+def _headerIndex(headers, extn):
+    """
+    Return the index of the header in the `_HeaderList` ``headers`` of the
+    extension specified as for `getExtn`.
+    """
+
+    if extn is None:
+        # First extension with data, else the PRIMARY one
+        for i, hdr in enumerate(headers):
+            if _hasData(hdr):
+                return i
+        return 0
+
+    if repr(extn).find(',') > 1:
+        # Two values given for extension: for example, 'sci,1' or 'dq,1'
+        _extns = extn.split(',')
+        _extname = _extns[0].strip().lower()
+        _extver = int(_extns[1])
+        for i, hdr in enumerate(headers):
+            if ('extname' in hdr and
+                    hdr['extname'].strip().lower() == _extname and
+                    hdr.get('extver', 1) == _extver):
+                return i
+    elif repr(extn).find('/') > 1:
+        # We are working with GEIS group syntax
+        return int(extn[:extn.find('/')])
+    elif extn.isdigit():
+        return int(extn)
+    elif extn.lower() == 'primary':
+        return 0
+    elif extn.strip() != '':
+        # We only have EXTNAME specified...
+        for i, hdr in enumerate(headers):
+            if 'extname' in hdr and extn.lower() == hdr['extname'].lower():
+                return i
+
+    # Let getExtn raise the error
+    raise _NoFastPath('Extension %s not found' % extn)
+
+
+def _withHeaders(filename, func):
+    """
+    Return ``func`` called with the `_HeaderList` of the image.  Any error
+    is turned into `_NoFastPath`, leaving it to the full reading of the
+    image to sort it out.
+    """
+
+    headers = None
+    try:
+        if _headerCache is None:
+            headers = _HeaderList(osfn(filename))
+        else:
+            headers = _headerCache.headers(osfn(filename))
+        return func(headers)
+    except _NoFastPath:
+        raise
+    except Exception as e:
+        raise _NoFastPath(str(e))
+    finally:
+        if headers is not None:
+            headers.close()
+
+
+def _readKeyword(filename, extn, keyword):
+    """
+    Header-only version of the search done by `getKeyword`: return the
+    value of ``keyword`` in extension ``extn`` of the image, else in the
+    first header which has it, else ''.
+    """
+
+    def find(headers):
+        _hdr = headers[_headerIndex(headers, extn)]
+        if keyword in _hdr:
+            return _hdr[keyword]
+        for _hdr in headers:
+            if keyword in _hdr:
+                return _hdr[keyword]
+        return ''
+
+    return _withHeaders(filename, find)
+
+
+def _readHeader(filename, extn):
+    """Header-only version of `getHeader`."""
+
+    def join(headers):
+        if _isPrimaryExtn(extn):
+            return _joinHeaders(headers[0])
+        return _joinHeaders(headers[0], headers[_headerIndex(headers, extn)])
+
+    return _withHeaders(filename, join)
+
+
+# Keywords of cards which do not hold a single value
+_COMMENTARY = ('', 'COMMENT', 'HISTORY')
+
+_re_plain_keyword = re.compile(r'^[A-Z0-9_-]{1,8}$')
+
+
+class _IndexedHeader(object):
+    """
+    A header kept by the header cache.  The values of its keywords are
+    looked up in an index and the header itself is only parsed from its
+    string when anything else is needed.
+    """
+
+    def __init__(self, string, index):
+        self._string = string
+        self._index = index
+        self._header = None
+
+    @staticmethod
+    def makeIndex(hdr):
+        """
+        Return the index of the values of the keywords of ``hdr``, or None
+        if it has cards (HIERARCH, record-valued) whose keywords could not
+        be looked up in it.
+        """
+
+        values = {}
+        deferred = []
+        for card in hdr.cards:
+            key = card.keyword
+            if not _re_plain_keyword.match(key):
+                if key in _COMMENTARY:
+                    deferred.append(key)
+                    continue
+                return None
+            if key in values or key in deferred:
+                continue
+            value = card.value
+            if value is UNDEFINED:
+                values[key] = None
+            elif isinstance(value, (bool, int, float, string_types)):
+                values[key] = value
+            else:
+                deferred.append(key)
+        return {'values': values, 'deferred': deferred}
+
+    @property
+    def header(self):
+        if self._header is None:
+            self._header = fits.Header.fromstring(self._string)
+        return self._header
+
+    def _key(self, keyword):
+        """The keyword as found in the index, or None if it cannot be."""
+
+        if self._index is None or not isinstance(keyword, string_types):
+            return None
+        key = keyword.strip().upper()
+        if not _re_plain_keyword.match(key) or key in self._index['deferred']:
+            return None
+        return key
+
+    def __contains__(self, keyword):
+        key = self._key(keyword)
+        if key is None:
+            return keyword in self.header
+        return key in self._index['values']
+
+    def __getitem__(self, keyword):
+        key = self._key(keyword)
+        if key is None:
+            return self.header[keyword]
+        value = self._index['values'][key]
+        return UNDEFINED if value is None else value
+
+    def get(self, keyword, default=None):
+        return self[keyword] if keyword in self else default
+
+    def copy(self):
+        return self.header.copy()
+
+    @property
+    def cards(self):
+        return self.header.cards
+
+    def tostring(self):
+        return self._string
+
+
+class _HeaderCache(object):
+    """
+    The headers of image files kept in an SQLite database, along with the
+    size and modification time of the files when they were read.
+    """
+
+    def __init__(self, dbname):
+        dirname = os.path.dirname(dbname)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.dbname = dbname
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS headers '
+                             '(path TEXT PRIMARY KEY, stamp TEXT, '
+                             'waivered INTEGER, headers TEXT, indexes TEXT)')
+
+    def _connect(self):
+        # A connection can not be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.dbname, timeout=60,
+                                         check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _stamp(filename):
+        """Size and modification time of the file(s) of an image."""
+
+        files = [filename]
+        if filename[-1] == 'h' and filename[-4] == '.':
+            # GEIS data file holding the group parameters
+            files.append(filename[:-1] + 'd')
+        stats = [os.stat(f) for f in files]
+        return ','.join('%d:%r' % (st.st_size, st.st_mtime) for st in stats)
+
+    def headers(self, filename):
+        """
+        Return the `_HeaderList` of the image, read from the database if
+        the image has not changed since it was last read.
+        """
+
+        path = os.path.abspath(filename)
+        stamp = self._stamp(path)
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT stamp, waivered, headers, indexes FROM headers '
+                'WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[0] == stamp:
+            return _HeaderList(path, row[2].split('\n'), json.loads(row[3]),
+                               bool(row[1]))
+
+        headers = _HeaderList(path)
+        strings = headers.strings()
+        indexes = [_IndexedHeader.makeIndex(_hdr) for _hdr in headers._headers]
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO headers '
+                             'VALUES (?, ?, ?, ?, ?)',
+                             (path, stamp, int(headers._waivered),
+                              '\n'.join(strings), json.dumps(indexes)))
+        return _HeaderList(path, strings, indexes, headers._waivered)
+
+    def clear(self):
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM headers')
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+# The header cache in use, if any (see enableHeaderCache)
+_headerCache = None
+
+# Default header cache database
+HEADER_CACHE = os.path.join(os.path.expanduser('~'), '.stsci_tools',
+                            'headers.db')
+
+
+def enableHeaderCache(dbname=None):
+    """
+    Keep the headers read by `getKeyword` and `getHeader` in the SQLite
+    database ``dbname`` (`HEADER_CACHE` by default), so that they are not
+    read again from files which have kept the same size and modification
+    time, in this session or any later one.
+
+    The cache can also be turned on by setting the environment variable
+    ``STSCI_HEADER_CACHE`` to the name of the database (or to an empty
+    string for the default one) before importing this module.
+    """
+
+    global _headerCache
+    disableHeaderCache()
+    _headerCache = _HeaderCache(dbname or HEADER_CACHE)
+
+
+def disableHeaderCache():
+    """Stop using the header cache; its database is left as it is."""
+
+    global _headerCache
+    if _headerCache is not None:
+        _headerCache.close()
+        _headerCache = None
+
+
+def clearHeaderCache():
+    """Forget all headers kept in the header cache in use, if any."""
+
+    if _headerCache is not None:
+        _headerCache.clear()
+
+
 def updateKeyword(filename, key, value,show=yes):
     """Add/update keyword to header with given value."""
 
@@ -910,8 +1405,9 @@ def getExtn(fimg, extn=None):
     filename.
 
     Defaults to returning the first extension with data or the primary
-    extension, if none have data.  If a non-existent extension has been
-    specified, it raises a `KeyError` exception.
+    extension, if none have data; this is found out from the headers alone.
+    If a non-existent extension has been specified, it raises a `KeyError`
+    exception.
     """
 
     # If no extension is provided, search for first extension
@@ -919,9 +1415,10 @@ def getExtn(fimg, extn=None):
     if extn is None:
         # Set up default to point to PRIMARY extension.
         _extn = fimg[0]
-        # then look for first extension with data.
+        # then look for first extension with data, going by the header
+        # so that no data gets read in.
         for _e in fimg:
-            if _e.data is not None:
+            if _hasData(_e.header):
                 _extn = _e
                 break
     else:
@@ -1013,7 +1510,7 @@ def findFile(input):
         _fdir = os.curdir
 
     try:
-        flist = os.listdir(_fdir)
+        flist = listDirectory(_fdir)
     except OSError:
         # handle when requested file in on a disconnect network store
         return no
@@ -1021,43 +1518,77 @@ def findFile(input):
     _root, _extn = parseFilename(_fname)
 
     found = no
-    for name in flist:
-        if name == _root:
-            # Check to see if given extension, if any, exists
-            if _extn is None:
-                found = yes
-                continue
+    if _root in flist:
+        # Check to see if given extension, if any, exists
+        if _extn is None:
+            found = yes
+        else:
+            _split = _extn.split(',')
+            _extnum = None
+            _extver = None
+            if  _split[0].isdigit():
+                _extname = None
+                _extnum = int(_split[0])
             else:
-                _split = _extn.split(',')
-                _extnum = None
-                _extver = None
-                if  _split[0].isdigit():
-                    _extname = None
-                    _extnum = int(_split[0])
-                else:
-                    _extname = _split[0]
-                    if len(_split) > 1:
-                        _extver = int(_split[1])
-                    else:
-                        _extver = 1
-                f = openImage(_root)
-                f.close()
-                if _extnum is not None:
-                    if _extnum < len(f):
-                        found = yes
-                        del f
-                        continue
-                    else:
-                        del f
+                _extname = _split[0]
+                if len(_split) > 1:
+                    _extver = int(_split[1])
                 else:
-                    _fext = findExtname(f, _extname, extver=_extver)
-                    if _fext is not None:
-                        found = yes
-                        del f
-                        continue
+                    _extver = 1
+            f = openImage(_root)
+            f.close()
+            if _extnum is not None:
+                if _extnum < len(f):
+                    found = yes
+            else:
+                _fext = findExtname(f, _extname, extver=_extver)
+                if _fext is not None:
+                    found = yes
+            del f
     return found
 
 
+# Directory listings kept by listDirectory, by absolute path
+_dirListings = {}
+
+# A listing is only kept once the directory has not been modified for
+# this many seconds, since files added within the resolution of the
+# modification time would go unnoticed
+_DIR_SETTLE_TIME = 2.0
+
+
+def listDirectory(path):
+    """
+    Return the set of the names of the entries in directory ``path``.
+
+    The listing is kept and only made again once the modification time
+    of the directory changes (see `clearDirectoryCache`).
+    """
+
+    key = os.path.abspath(path)
+    mtime = os.stat(key).st_mtime
+    listing = _dirListings.get(key)
+    if listing is not None and listing[0] == mtime:
+        return listing[1]
+
+    names = frozenset(os.listdir(key))
+    if _time.time() - mtime > _DIR_SETTLE_TIME:
+        _dirListings[key] = (mtime, names)
+    return names
+
+
+def clearDirectoryCache(path=None):
+    """
+    Forget the listing of directory ``path`` kept by `listDirectory`, or
+    of all directories if no path is given.
+    """
+
+    if path is None:
+        _dirListings.clear()
+    else:
+        _dirListings.pop(os.path.abspath(path), None)
+
+
 def checkFileExists(filename, directory=None):
     """
     Checks to see if file specified exists in current or specified directory.
@@ -1341,19 +1872,52 @@ def osfn(filename):
     if filename is None:
         return filename
 
-    ename = Expand(filename)
-    dlist = [part.strip() for part in ename.split(os.sep)]
-    if len(dlist) == 1 and dlist[0] not in [os.curdir, os.pardir]:
-        return dlist[0]
+    return _osfn(Expand(filename), os.getcwd())
+
+
+def osfn_many(filenames):
+    """
+    Convert a list of IRAF virtual path names to OS pathnames, as `osfn`
+    does for each of them.
+    """
 
-    # I use str.join instead of os.path.join here because
-    # os.path.join("","") returns "" instead of "/"
+    cwd = os.getcwd()
+    return [None if f is None else _osfn(Expand(f), cwd) for f in filenames]
 
-    epath = os.sep.join(dlist)
-    fname = os.path.abspath(epath)
-    # append '/' if relative directory was at end or filename ends with '/'
-    if fname[-1] != os.sep and dlist[-1] in ['', os.curdir, os.pardir]:
-        fname = fname + os.sep
+
+# OS pathnames made by _osfn, by expanded name and current directory
+_osfnCache = {}
+
+
+def _osfn(ename, cwd):
+    """
+    The part of `osfn` done after the expansion of IRAF variables, with
+    ``cwd`` as the current directory.
+    """
+
+    key = (ename, cwd)
+    fname = _osfnCache.get(key)
+    if fname is not None:
+        return fname
+
+    dlist = [part.strip() for part in ename.split(os.sep)]
+    if len(dlist) == 1 and dlist[0] not in [os.curdir, os.pardir]:
+        fname = dlist[0]
+    else:
+        # I use str.join instead of os.path.join here because
+        # os.path.join("","") returns "" instead of "/"
+
+        epath = os.sep.join(dlist)
+        # same as os.path.abspath(epath)
+        fname = os.path.normpath(os.path.join(cwd, epath))
+        # append '/' if relative directory was at end or filename ends
+        # with '/'
+        if fname[-1] != os.sep and dlist[-1] in ['', os.curdir, os.pardir]:
+            fname = fname + os.sep
+
+    if len(_osfnCache) >= _EXPAND_CACHE_SIZE:
+        _osfnCache.clear()
+    _osfnCache[key] = fname
     return fname
 
 
@@ -1467,6 +2031,15 @@ __re_var_match2 = re.compile(r'\$(?P<varname>\w*)')
 __re_var_paren = re.compile(r'\((?P<varname>[^()]*)\)')
 
 
+# Strings expanded by Expand, with the values of the variables that
+# went into each expansion at the time
+_expandCache = {}
+_EXPAND_CACHE_SIZE = 10000
+
+# Variables os.path.expanduser may look at
+_HOME_VARS = ['HOME', 'USERPROFILE', 'HOMEDRIVE', 'HOMEPATH']
+
+
 def Expand(instring, noerror=0):
     """
     Expand a string with embedded IRAF variables (IRAF virtual filename).
@@ -1478,18 +2051,54 @@ def Expand(instring, noerror=0):
     variable name or null (so Expand('abc$def') = 'abcdef' and
     Expand('(abc)def') = 'def').  This is the IRAF behavior, though it is
     confusing and hides errors.
+
+    Expansions are remembered, and used again for as long as none of the
+    IRAF or OS environment variables they depend on changes.
     """
 
+    # Nothing to expand in plain file names
+    if '$' not in instring and '(' not in instring and '~' not in instring:
+        return instring
+
+    key = (instring, noerror)
+    entry = _expandCache.get(key)
+    if entry is not None and _unchanged(entry[1]):
+        return entry[0]
+
     # call _expand1 for each entry in comma-separated list
+    used = []
     wordlist = instring.split(",")
     outlist = []
     for word in wordlist:
-        outlist.append(os.path.expanduser(_expand1(word, noerror=noerror)))
-    return ",".join(outlist)
+        word = _expand1(word, noerror=noerror, used=used)
+        if word[:1] == '~':
+            used += _HOME_VARS
+        outlist.append(os.path.expanduser(word))
+    result = ",".join(outlist)
+
+    if len(_expandCache) >= _EXPAND_CACHE_SIZE:
+        _expandCache.clear()
+    depends = [(var, _varDict.get(var), os.environ.get(var))
+               for var in dict.fromkeys(used)]
+    _expandCache[key] = (result, depends)
+    return result
+
 
+def _unchanged(depends):
+    """True if the variables an expansion depends on kept their values."""
 
-def _expand1(instring, noerror):
-    """Expand a string with embedded IRAF variables (IRAF virtual filename)."""
+    for var, value, envvalue in depends:
+        if _varDict.get(var) != value or os.environ.get(var) != envvalue:
+            return False
+    return True
+
+
+def _expand1(instring, noerror, used=None):
+    """
+    Expand a string with embedded IRAF variables (IRAF virtual filename).
+
+    The names of the variables looked up are appended to ``used``.
+    """
 
     # first expand names in parentheses
     # note this works on nested names too, expanding from the
@@ -1498,6 +2107,8 @@ def _expand1(instring, noerror):
     while mm is not None:
         # remove embedded dollar signs from name
         varname = mm.group('varname').replace('$','')
+        if used is not None:
+            used.append(varname)
         if defvar(varname):
             varname = envget(varname)
         elif noerror:
@@ -1517,11 +2128,13 @@ def _expand1(instring, noerror):
         mm = __re_var_match2.match(instring)
         varname = mm.group('varname')
 
+    if used is not None:
+        used.append(varname)
     if defvar(varname):
         # recursively expand string after substitution
-        return _expand1(envget(varname) + instring[mm.end():], noerror)
+        return _expand1(envget(varname) + instring[mm.end():], noerror, used)
     elif noerror:
-        return _expand1(varname + instring[mm.end():], noerror)
+        return _expand1(varname + instring[mm.end():], noerror, used)
     else:
         raise ValueError("Undefined variable `%s' in string `%s'" %
                          (varname, instring))
@@ -1531,3 +2144,7 @@ def access(filename):
     """Returns true if file exists."""
 
     return os.path.exists(Expand(filename))
+
+
+if 'STSCI_HEADER_CACHE' in os.environ:
+    enableHeaderCache(os.environ['STSCI_HEADER_CACHE'])
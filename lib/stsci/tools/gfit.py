@@ -11,6 +11,9 @@ the history of this module (fortran -> idl -> python).
 """
 from __future__ import absolute_import, division, print_function
 
+import multiprocessing
+from collections import namedtuple
+
 import numpy as np
 
 from . import nmpfit
@@ -20,8 +23,18 @@ import warnings
 warnings.warn("GFIT is deprecated - stsci.tools v 3.4.12 is the last version to contain it."
               "Use astropy.modeling instead.")
 
-__version__ = '2.0'          # Release version number only
-__vdate__ = '2018-04-20'     # Date of this version
+__version__ = '2.1'          # Release version number only
+__vdate__ = '2026-10-18'     # Date of this version
+
+GFitResult = namedtuple('GFitResult',
+                        ['params', 'perror', 'status', 'niter', 'fnorm'])
+GFitResult.__doc__ = """Results of `gfit_many`, one row per fitted profile.
+
+``params`` and ``perror`` are (nfits, 3) arrays of the amplitude, center
+and sigma of each gaussian and their errors (NaN where not available);
+``status``, ``niter`` and ``fnorm`` are the nmpfit status, number of
+iterations and final chi-squared of each fit.
+"""
 
 
 def _gauss_funct(p, fjac=None, x=None, y=None, err=None,
@@ -30,10 +43,15 @@ def _gauss_funct(p, fjac=None, x=None, y=None, err=None,
     """
     Defines the gaussian function to be used as the model.
 
+    When ``fjac`` is not None (nmpfit called with ``autoderivative=0``)
+    the analytic partial derivatives of the (weighted) model are returned
+    as well.
+
     """
     if p[2] != 0.0:
         Z = (x - p[1]) / p[2]
-        model = p[0] * np.e ** (-Z ** 2 / 2.0)
+        g = np.exp(-Z ** 2 / 2.0)
+        model = p[0] * g
     else:
         model = np.zeros(np.size(x))
 
@@ -41,18 +59,60 @@ def _gauss_funct(p, fjac=None, x=None, y=None, err=None,
     if weights is not None:
         if err is not None:
             print("Warning: Ignoring errors and using weights.\n")
+        scale = weights
+    elif err is not None:
+        scale = 1.0 / err
+    else:
+        scale = None
 
-        return [status, (y - model) * weights]
+    deviates = y - model
+    if scale is not None:
+        deviates = deviates * scale
 
-    elif err is not None:
-        return [status, (y - model) / err]
+    if fjac is None:
+        return [status, deviates]
+
+    pderiv = np.zeros((np.size(x), 3))
+    if p[2] != 0.0:
+        pderiv[:, 0] = g
+        pderiv[:, 1] = model * Z / p[2]
+        pderiv[:, 2] = model * Z ** 2 / p[2]
+        if scale is not None:
+            pderiv *= np.reshape(scale, (-1, 1))
+    return [status, deviates, pderiv]
 
-    else:
-        return [status, y - model]
+
+def _initial_guess(y, x):
+    """
+    Starting values of the amplitude, center and sigma for each row of
+    a 2D array ``y`` (``x`` has the same shape as ``y``).
+
+    """
+    nfits, npts = y.shape
+    rows = np.arange(nfits)
+    ysigma = y.std(axis=1)
+    above = y > ysigma[:, np.newaxis]
+    nabove = above.sum(axis=1)
+    has_peak = nabove > 0
+
+    # rows with points above one sigma: mid index of those points
+    xind = (np.sum(above * np.arange(npts), axis=1) /
+            np.maximum(nabove, 1)).astype(int)
+
+    # otherwise: the extreme value farthest from the mean
+    ymax = y.max(axis=1)
+    ymin = y.min(axis=1)
+    ymean = y.mean(axis=1)
+    extreme = np.where((ymax - ymean) > np.abs(ymin - ymean), ymax, ymin)
+
+    p = np.ones((nfits, 3))
+    p[:, 0] = np.where(has_peak, y[rows, xind], extreme)
+    p[:, 1] = np.where(has_peak, x[rows, xind], x.mean(axis=1))
+    return p
 
 
 def gfit1d(y, x=None, err=None, weights=None, par=None, parinfo=None,
-           maxiter=200, quiet=0):
+           maxiter=200, quiet=0, autoderivative=1):
     """
     Return the gaussian fit as an object.
 
@@ -82,6 +142,10 @@ def gfit1d(y, x=None, err=None, weights=None, par=None, parinfo=None,
     quiet: number
         if set to 1, nmpfit does not print to the screen
         Default: 0
+    autoderivative: number
+        if set to 0, the analytic derivatives of the gaussian are used
+        instead of finite differences
+        Default: 1
 
     Examples
     --------
@@ -91,13 +155,13 @@ def gfit1d(y, x=None, err=None, weights=None, par=None, parinfo=None,
     [10.         15.          1.41421356]
 
     """
-    y = y.astype(np.float)
+    y = y.astype(np.float64)
     if weights is not None:
-        weights = weights.astype(np.float)
+        weights = weights.astype(np.float64)
     if err is not None:
-        err = err.astype(np.float)
+        err = err.astype(np.float64)
     if x is None and len(y.shape) == 1:
-        x = np.arange(len(y)).astype(np.float)
+        x = np.arange(len(y)).astype(np.float64)
     if x.shape != y.shape:
         print("input arrays X and Y must be of equal shape.\n")
         return
@@ -107,32 +171,161 @@ def gfit1d(y, x=None, err=None, weights=None, par=None, parinfo=None,
     if par is not None:
         p = par
     else:
-        ysigma = y.std()
-        ind = np.nonzero(y > ysigma)[0]
-        if len(ind) != 0:
-            xind = int(ind.mean())
-            p2 = x[xind]
-            p1 = y[xind]
-            p3 = 1.0
-        else:
-            ymax = y.max()
-            ymin = y.min()
-            ymean= y.mean()
-            if (ymax - ymean) > (abs(ymin - ymean)):
-                p1 = ymax
-            else: p1 = ymin
-            ind = (np.nonzero(y == p1))[0]
-            p2 = x.mean()
-            p3 = 1.
-
-
-        p = [p1, p2, p3]
+        p = list(_initial_guess(y[np.newaxis], x[np.newaxis])[0])
     m = nmpfit.mpfit(_gauss_funct, p,parinfo = parinfo, functkw=fa,
-    maxiter=maxiter, quiet=quiet)
+    maxiter=maxiter, quiet=quiet, autoderivative=autoderivative)
     if (m.status <= 0): print('error message = ', m.errmsg)
     return m
 
 
+def _fit_rows(args):
+    """
+    Fit a block of rows with nmpfit; runs in the worker processes of
+    `gfit_many`.
+
+    """
+    y, x, err, weights, par, parinfo, maxiter, autoderivative = args
+    nfits = len(y)
+    params = np.full((nfits, 3), np.nan)
+    perror = np.full((nfits, 3), np.nan)
+    status = np.zeros(nfits, dtype=int)
+    niter = np.zeros(nfits, dtype=int)
+    fnorm = np.full(nfits, np.nan)
+
+    for i in range(nfits):
+        fa = {'x': x[i], 'y': y[i],
+              'err': None if err is None else err[i],
+              'weights': None if weights is None else weights[i]}
+        m = nmpfit.mpfit(_gauss_funct, list(par[i]), parinfo=parinfo,
+                         functkw=fa, maxiter=maxiter, quiet=1,
+                         autoderivative=autoderivative)
+        status[i] = m.status
+        niter[i] = m.niter
+        if m.params is not None:
+            params[i] = m.params
+        if m.perror is not None:
+            perror[i] = m.perror
+        if m.fnorm is not None:
+            fnorm[i] = m.fnorm
+
+    return GFitResult(params, perror, status, niter, fnorm)
+
+
+def gfit_many(y, x=None, err=None, weights=None, par=None, parinfo=None,
+              maxiter=200, autoderivative=0, num_cores=1):
+    """
+    Fit a gaussian to each row of a 2D array.
+
+    Initial guesses for all rows are computed at once and, by default,
+    the analytic derivatives of the gaussian are used.
+
+    Parameters
+    ----------
+    y:   2D Numpy array
+        The data to be fitted, one profile per row.
+    x:   1D or 2D Numpy array
+        (optional) The x values, either shared by all rows (1D, one value
+        per column of y) or one row per profile (same shape as y).
+    err: 1D or 2D Numpy array
+        (optional) Measurement errors, shared by all rows or one row per
+        profile.
+    weights: 1D or 2D Numpy array
+        (optional) Weights, shared by all rows or one row per profile.
+    par:  sequence or 2D Numpy array
+        (optional) Starting values of the parameters, either one set
+        (amplitude, center, sigma) for all rows or a (nrows, 3) array.
+    parinfo: Dictionary of lists
+        (optional) Additional information on the parameters, used for
+        every fit. See nmpfit.py.
+    maxiter: number
+        Maximum number of iterations of each fit
+        Default: 200
+    autoderivative: number
+        If set to 1, nmpfit computes derivatives by finite differences
+        instead of using the analytic derivatives of the gaussian.
+        Default: 0
+    num_cores: int or None
+        Number of worker processes to spread the fits over. With 1 (the
+        default) all fits run in this process; None uses all CPUs.
+
+    Returns
+    -------
+    result: `GFitResult`
+        Arrays of the parameters, errors, status, number of iterations and
+        chi-squared of each fit, in row order.
+
+    Examples
+    --------
+    >>> x = np.arange(10,20, 0.1)
+    >>> y = np.array([a*np.e**(-(x-c)**2/4) for a, c in [(10, 15), (3, 12)]])
+    >>> print(np.round(gfit_many(y, x=x).params, 5))
+    [[10.      15.       1.41421]
+     [ 3.      12.       1.41421]]
+
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim != 2:
+        raise ValueError("Input array Y must be 2D.")
+    nfits, npts = y.shape
+
+    def per_row(a, name):
+        if a is None:
+            return None
+        a = np.asarray(a, dtype=np.float64)
+        if a.shape == (npts,):
+            return np.broadcast_to(a, y.shape)
+        if a.shape != y.shape:
+            raise ValueError("Input array %s must be 1D with one value per "
+                             "column of Y, or have the same shape as Y."
+                             % name)
+        return a
+
+    if x is None:
+        x = np.arange(npts, dtype=np.float64)
+    x = per_row(x, 'X')
+    err = per_row(err, 'ERR')
+    weights = per_row(weights, 'WEIGHTS')
+
+    if par is None:
+        par = _initial_guess(y, x)
+    else:
+        par = np.array(np.broadcast_to(np.asarray(par, dtype=np.float64),
+                                       (nfits, 3)))
+
+    if num_cores is None:
+        num_cores = multiprocessing.cpu_count()
+    num_cores = max(1, min(num_cores, nfits))
+
+    def block(a, sl):
+        return None if a is None else np.ascontiguousarray(a[sl])
+
+    nblocks = num_cores if num_cores == 1 else 4 * num_cores
+    bounds = np.linspace(0, nfits, nblocks + 1).astype(int)
+    tasks = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi > lo:
+            sl = slice(lo, hi)
+            tasks.append((block(y, sl), block(x, sl), block(err, sl),
+                          block(weights, sl), par[sl], parinfo, maxiter,
+                          autoderivative))
+
+    if num_cores == 1:
+        results = [_fit_rows(t) for t in tasks]
+    else:
+        pool = multiprocessing.Pool(processes=num_cores)
+        try:
+            results = pool.map(_fit_rows, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    if not results:
+        return GFitResult(np.zeros((0, 3)), np.zeros((0, 3)),
+                          np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                          np.zeros(0))
+    return GFitResult(*[np.concatenate(field) for field in zip(*results)])
+
+
 def plot_fit(y, mfit, x=None):
     if x is None:
         x = N.arange(len(y))
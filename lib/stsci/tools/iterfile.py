@@ -1,8 +1,100 @@
 from __future__ import division # confidence high
 
+import operator
+import threading
+from collections import OrderedDict
+
+import numpy as np
 from astropy.io import fits
 
-__version__ = '0.3 (01-July-2014)'
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+__version__ = '0.5 (18-October-2026)'
+
+
+def _default_pool_size():
+    """ Returns the number of files the shared handle pool keeps open,
+        half of the open-file limit of the process up to 256."""
+    size = 256
+    if resource is not None:
+        soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        if soft != resource.RLIM_INFINITY:
+            size = max(1, min(size, soft // 2))
+    return size
+
+
+class HandlePool(object):
+    """ A pool of open FITS files shared by `IterFitsFile` objects.
+
+        Files are keyed by name and opened read-only.  At most `maxsize`
+        of them are kept open: when another one is needed, the least
+        recently used file not currently in use is closed.  Files in use
+        are never closed, so the pool may briefly hold more than `maxsize`
+        files when that many are read at the same time.
+    """
+    def __init__(self, maxsize=None):
+        if maxsize is None:
+            maxsize = _default_pool_size()
+        self.maxsize = maxsize
+        self._handles = OrderedDict()
+        self._inuse = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __contains__(self, fname):
+        return fname in self._handles
+
+    def acquire(self, fname):
+        """ Returns the open HDUList for `fname`, opening it if needed.
+            The file stays open until given back with `release`."""
+        with self._lock:
+            handle = self._handles.pop(fname, None)
+            if handle is None:
+                self._evict(self.maxsize - 1)
+                handle = fits.open(fname, mode='readonly')
+            self._handles[fname] = handle
+            self._inuse[fname] = self._inuse.get(fname, 0) + 1
+            return handle
+
+    def release(self, fname):
+        """ Gives back a file obtained from `acquire`; it is left open
+            for the next user of the pool."""
+        with self._lock:
+            count = self._inuse.get(fname, 0) - 1
+            if count > 0:
+                self._inuse[fname] = count
+            else:
+                self._inuse.pop(fname, None)
+            self._evict(self.maxsize)
+
+    def close(self, fname=None):
+        """ Closes `fname`, or all files when no name is given, unless in
+            use.  This is needed before reading a file which was changed
+            on disk since the pool opened it."""
+        with self._lock:
+            names = list(self._handles) if fname is None else [fname]
+            for name in names:
+                if name in self._handles and name not in self._inuse:
+                    self._handles.pop(name).close()
+
+    def _evict(self, size):
+        """ Closes the least recently used files not in use until no more
+            than `size` are open."""
+        for fname in list(self._handles):
+            if len(self._handles) <= size:
+                break
+            if fname not in self._inuse:
+                self._handles.pop(fname).close()
+
+
+# The pool shared by default by all IterFitsFile objects
+handle_pool = HandlePool()
 
 
 class IterFitsFile(object):
@@ -10,14 +102,30 @@ class IterFitsFile(object):
         access the data from a FITS file without leaving
         the file-handle open between reads.
 
+        By default the file is opened through `handle_pool`, which keeps
+        a bounded number of recently used files open between reads so
+        that iterating over many files does not re-open them for every
+        row.  Use ``pool=False`` to open and close the file on each read,
+        or give another `HandlePool`.
+
+        With ``readahead=n``, reading rows through ``__getitem__`` reads
+        at least `n` rows in one go and serves the following rows from
+        them.
     """
-    def __init__(self,name):
+    def __init__(self,name,pool=True,readahead=0):
         self.name = name
         self.fname = None
         self.extn = None
         self.handle = None
         self.inmemory = False
         self.compress = False
+        if pool is True:
+            pool = handle_pool
+        elif pool is False:
+            pool = None
+        self.pool = pool
+        self.readahead = readahead
+        self._block = None
 
         if not self.fname:
             self.fname,self.extn = parseFilename(name)
@@ -32,34 +140,31 @@ class IterFitsFile(object):
         """ Returns the shape of the data array associated with this file."""
         hdu = self.open()
         _shape = hdu.shape
-        if not self.inmemory:
-            self.close()
-            del hdu
+        self._done(hdu)
         return _shape
 
     def _data(self):
         """ Returns the data array associated with this file/extenstion."""
         hdu = self.open()
         _data = hdu.data.copy()
-        if not self.inmemory:
-            self.close()
-            del hdu
+        self._done(hdu)
         return _data
 
     def type(self):
         """ Returns the shape of the data array associated with this file."""
         hdu = self.open()
         _type = hdu.data.dtype.name
-        if not self.inmemory:
-            self.close()
-            del hdu
+        self._done(hdu)
         return _type
 
     def open(self):
         """ Opens the file for subsequent access. """
 
         if self.handle is None:
-            self.handle = fits.open(self.fname, mode='readonly')
+            if self.pool is None:
+                self.handle = fits.open(self.fname, mode='readonly')
+            else:
+                self.handle = self.pool.acquire(self.fname)
 
         if self.extn:
             if len(self.extn) == 1:
@@ -74,23 +179,54 @@ class IterFitsFile(object):
 
 
     def close(self):
-        """ Closes file handle for this FITS object."""
+        """ Closes file handle for this FITS object, or gives it back to
+            the handle pool."""
         if self.handle is not None:
-            self.handle.close()
+            if self.pool is None:
+                self.handle.close()
+            else:
+                self.pool.release(self.fname)
         self.handle = None
 
+    def _done(self, hdu):
+        """ Ends an access to `hdu`, closing the file unless inmemory."""
+        if not self.inmemory:
+            if self.pool is not None and 'data' in hdu.__dict__:
+                # the pooled file should not hold on to the whole array
+                del hdu.data
+            self.close()
+
+    def _readahead(self, hdu, i):
+        """ Returns rows `i`, reading `readahead` rows at a time. """
+        nrows = hdu.shape[0]
+        rows = _rowRange(i, nrows)
+        if rows is None:
+            return hdu.section[i,:]
+        start, stop = rows
+
+        block = self._block
+        if (block is None or start < block[0] or
+                stop > block[0] + len(block[1])):
+            end = min(nrows, max(stop, start + self.readahead))
+            block = (start, hdu.section[start:end])
+            self._block = block
+
+        if isinstance(i, slice):
+            return block[1][start - block[0]:stop - block[0]].copy()
+        return block[1][start - block[0]].copy()
+
     def __getitem__(self,i):
         """ Returns a PyFITS section for the rows specified. """
         # All I/O must be done here, starting with open
         hdu = self.open()
         if self.inmemory or self.compress:
             _data = hdu.data[i,:]
+        elif self.readahead:
+            _data = self._readahead(hdu, i)
         else:
             _data = hdu.section[i,:]
 
-        if not self.inmemory:
-            self.close()
-            del hdu
+        self._done(hdu)
 
         return _data
 
@@ -104,6 +240,191 @@ class IterFitsFile(object):
             return object.__getattribute__(self,name)
 
 
+def _rowRange(i, nrows):
+    """ Returns the (start, stop) rows of a row number or of a contiguous
+        slice of rows, None for any other index."""
+    if isinstance(i, slice):
+        start, stop, step = i.indices(nrows)
+        if step != 1 or stop <= start:
+            return None
+        return start, stop
+    try:
+        i = operator.index(i)
+    except TypeError:
+        return None
+    if i < 0:
+        i += nrows
+    if not 0 <= i < nrows:
+        return None
+    return i, i + 1
+
+
+# Memory used by default by the blocks of iterStack
+STACK_MEMORY = 64 * 2**20
+
+_BITPIX_DTYPES = {8: np.dtype('u1'), 16: np.dtype('>i2'),
+                  32: np.dtype('>i4'), 64: np.dtype('>i8'),
+                  -32: np.dtype('>f4'), -64: np.dtype('>f8')}
+
+
+class _StackInput(object):
+    """ How the rows of one input of `iterStack` are read: straight from
+        a memory map of the file when the data on disk need no scaling
+        or decompression, through `section` otherwise."""
+    def __init__(self, image):
+        self.image = image
+        hdu = image.open()
+        try:
+            self.shape = hdu.shape
+            # compressed images have no section in older astropy
+            self.section = hasattr(hdu, 'section')
+            if not self.shape:
+                self.dtype = None
+            elif self.section:
+                self.dtype = hdu.section[0:0].dtype
+            else:
+                self.dtype = hdu.data.dtype
+            self.offset = None
+            if self.shape and not image.compress:
+                info = hdu.fileinfo()
+                raw = _BITPIX_DTYPES.get(hdu.header['BITPIX'])
+                if (info is not None and info['file'].compression is None and
+                        raw == self.dtype):
+                    self.offset = info['datLoc']
+        finally:
+            image._done(hdu)
+
+    def read(self, start, stop, out):
+        """ Reads rows `start` to `stop` into the array `out`."""
+        if self.offset is None:
+            hdu = self.image.open()
+            try:
+                if self.section:
+                    out[...] = hdu.section[start:stop]
+                else:
+                    out[...] = hdu.data[start:stop]
+            finally:
+                self.image._done(hdu)
+            return
+        rowsize = self.dtype.itemsize * int(np.prod(self.shape[1:]))
+        rows = np.memmap(self.image.fname, dtype=self.dtype, mode='r',
+                         offset=self.offset + start * rowsize,
+                         shape=(stop - start,) + tuple(self.shape[1:]))
+        try:
+            np.copyto(out, rows)
+        finally:
+            del rows
+
+
+def _fillBlock(inputs, start, stop, out):
+    for k, f in enumerate(inputs):
+        f.read(start, stop, out[k, :stop - start])
+
+
+class _Prefetch(threading.Thread):
+    """ Fills one block of `iterStack` in the background. """
+    def __init__(self, inputs, start, stop, out):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.args = (inputs, start, stop, out)
+        self.error = None
+
+    def run(self):
+        try:
+            _fillBlock(*self.args)
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+def iterStack(images, memory=STACK_MEMORY, rows=None, prefetch=True):
+    """ Iterates over a stack of images of the same shape, block of rows
+        by block of rows.
+
+        Parameters
+        ----------
+        images : list of str or `IterFitsFile`
+            Input images; names may include an extension as in
+            ``'file.fits[sci,1]'``.
+
+        memory : int
+            Number of bytes the blocks may use, which sets the number of
+            rows read at a time.
+
+        rows : int or None
+            Number of rows read at a time, overriding `memory`.
+
+        prefetch : bool
+            Read the next block on a background thread while the caller
+            works on the current one.  This takes two blocks of memory.
+
+        Yields
+        ------
+        rows, block : slice, ndarray
+            The rows of the images in this block, and an array of shape
+            ``(len(images), nrows) + shape[1:]`` holding them.  The block
+            array is reused: copy it to keep it past the next iteration.
+
+        Data which need no scaling or decompression are copied straight
+        from memory maps of the files into the block; other data are
+        read through ``section``.  For example, the median image is::
+
+            >>> median = np.empty(shape, dtype=np.float32)  # doctest: +SKIP
+            >>> for rows, block in iterStack(names):  # doctest: +SKIP
+            ...     median[rows] = np.median(block, axis=0)
+    """
+    images = [f if isinstance(f, IterFitsFile) else IterFitsFile(f)
+              for f in images]
+    if not images:
+        return
+    inputs = [_StackInput(f) for f in images]
+    shape = inputs[0].shape
+    for f in inputs[1:]:
+        if f.shape != shape:
+            raise ValueError('Image %s has shape %s, %s has shape %s' %
+                             (f.image.name, f.shape, images[0].name, shape))
+    if not shape:
+        raise ValueError('Images %s have no data' % images[0].name)
+    dtype = np.result_type(*[f.dtype.newbyteorder('=') for f in inputs])
+
+    nrows = shape[0]
+    if rows is None:
+        rowsize = len(inputs) * dtype.itemsize * int(np.prod(shape[1:]))
+        rows = memory // (rowsize * (2 if prefetch else 1))
+    rows = max(1, min(nrows, rows))
+    nbuffers = 2 if prefetch and rows < nrows else 1
+    buffers = [np.empty((len(inputs), rows) + tuple(shape[1:]), dtype=dtype)
+               for n in range(nbuffers)]
+    starts = list(range(0, nrows, rows))
+
+    if nbuffers == 1:
+        for start in starts:
+            stop = min(nrows, start + rows)
+            _fillBlock(inputs, start, stop, buffers[0])
+            yield slice(start, stop), buffers[0][:, :stop - start]
+        return
+
+    pending = _Prefetch(inputs, 0, min(nrows, rows), buffers[0])
+    pending.start()
+    try:
+        for n, start in enumerate(starts):
+            stop = min(nrows, start + rows)
+            pending.result()
+            pending = None
+            if n + 1 < len(starts):
+                pending = _Prefetch(inputs, stop, min(nrows, stop + rows),
+                                    buffers[(n + 1) % 2])
+                pending.start()
+            yield slice(start, stop), buffers[n % 2][:, :stop - start]
+    finally:
+        if pending is not None:
+            pending.join()
+
+
 def parseFilename(filename):
     """
         Parse out filename from any specified extensions.
@@ -4,6 +4,9 @@ Fit a line to a data set with optional weights.
 Returns the parameters of the model, bo, b1:
 Y = b0 + b1* X
 
+`linefit_many` fits many independent lines at once (e.g. one per
+column of an image).
+
 :author: Nadia Dencheva
 :version: '1.0 (2007-02-20)'
 
@@ -12,8 +15,8 @@ from __future__ import absolute_import, division, print_function
 
 import numpy as N
 
-__version__ = '1.0'          # Release version number only
-__vdate__ = '2007-02-20'     # Date of this version
+__version__ = '1.1'          # Release version number only
+__vdate__ = '2026-10-18'     # Date of this version
 
 
 def linefit(x, y, weights=None):
@@ -46,27 +49,100 @@ def linefit(x, y, weights=None):
         print("Error: X and Y must have equal size\n")
         return
     n = len(x)
-    w = N.zeros((n,n)).astype(N.float)
     if weights is None:
-        for i in N.arange(n):
-            w[i,i] = 1
+        w = N.ones(n)
     else:
         if len(weights) != n:
             print("Error: Weights must have the same size as X and Y.\n")
             return
-        for i in N.arange(n):
-            w[i,i] = weights[i]
-    x = x.astype(N.float)
-    y = y.astype(N.float)
-    # take the weighted avg for calculatiing the covarince
-    Xavg = N.sum(N.dot(w,x)) / N.sum(w.diagonal())
-    Yavg = N.sum(N.dot(w,y)) / N.sum(w.diagonal())
+        w = N.asarray(weights, dtype=N.float64)
+    x = N.asarray(x, dtype=N.float64)
+    y = N.asarray(y, dtype=N.float64)
+
+    return _weighted_fit(x, y, w, 0)
+
+
+def linefit_many(x, y, weights=None, axis=0):
+
+    """
+    Fit many independent lines at once.
+
+    Parameters
+    ----------
+    x: numpy array
+        The x values. Either a 1D array with one value per point along
+        ``axis`` of ``y`` (shared by all fits) or an array with the same
+        shape as ``y``.
+    y: 2D numpy array
+        The data to be fitted; each 1D slice along ``axis`` is fitted
+        independently (with the default ``axis=0`` one line is fitted
+        to each column).
+    weights: numpy array or None
+        Weight values, either 1D (shared by all fits) or with the same
+        shape as ``y``.
+    axis: int
+        The axis of ``y`` along which the points of each fit lie.
+
+    Returns
+    -------
+    b0, b1: 1D numpy arrays
+        The intercept and slope of each fit.
+
+    Examples
+    --------
+    >>> import numpy as N
+    >>> from numpy.core import around
+    >>> x = N.arange(5.)
+    >>> y = N.array([2. + 3. * x, 1. - x]).T
+    >>> b0, b1 = linefit_many(x, y)
+    >>> around(b0, decimals=5), around(b1, decimals=5)
+    (array([2., 1.]), array([ 3., -1.]))
+    """
+    y = N.asarray(y, dtype=N.float64)
+    if y.ndim != 2:
+        raise ValueError("Y must be a 2D array.")
+    if axis not in (0, 1, -1, -2):
+        raise ValueError("Axis must be 0 or 1.")
+    if axis in (1, -1):
+        y = y.T
+        if weights is not None and N.ndim(weights) == 2:
+            weights = N.asarray(weights).T
+        if N.ndim(x) == 2:
+            x = N.asarray(x).T
+
+    n = y.shape[0]
+    x = N.asarray(x, dtype=N.float64)
+    if x.ndim == 1 and x.shape[0] == n:
+        x = x[:, N.newaxis]
+    elif x.shape != y.shape:
+        raise ValueError("X must be 1D with one value per point, "
+                         "or have the same shape as Y.")
+
+    if weights is None:
+        w = N.ones((n, 1))
+    else:
+        w = N.asarray(weights, dtype=N.float64)
+        if w.ndim == 1 and w.shape[0] == n:
+            w = w[:, N.newaxis]
+        elif w.shape != y.shape:
+            raise ValueError("Weights must be 1D with one value per point, "
+                             "or have the same shape as Y.")
+
+    return _weighted_fit(x, y, w, 0)
+
+
+def _weighted_fit(x, y, w, axis):
+    # Weighted least squares as O(n) weighted sums (a diagonal weight
+    # matrix never needs to be built). The data are centered on their
+    # weighted averages first, as in the covariance form of the solution.
+    sw = N.sum(w, axis=axis, keepdims=True)
+    Xavg = N.sum(w * x, axis=axis, keepdims=True) / sw
+    Yavg = N.sum(w * y, axis=axis, keepdims=True) / sw
 
     xm = x - Xavg
-    xmt = N.transpose(xm)
     ym = y - Yavg
 
-    b1 = N.dot(xmt,N.dot(w,ym)) / N.dot(xmt ,N.dot(w,xm))
-    b0 = Yavg - b1 * Xavg
+    b1 = N.sum(w * xm * ym, axis=axis) / N.sum(w * xm * xm, axis=axis)
+    b0 = Yavg.squeeze(axis) - b1 * Xavg.squeeze(axis)
 
     return b0, b1
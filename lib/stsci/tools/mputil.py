@@ -3,7 +3,34 @@
 from __future__ import division, print_function
 
 import math
+import multiprocessing
+import os
 import time
+import traceback
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from multiprocessing.connection import wait as _wait
+except ImportError:
+    # Python 2: poll the processes instead
+    _wait = None
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+# Array results at least this large come back from TaskExecutor tasks
+# through shared memory rather than pickled through a pipe
+SHARED_RESULT_SIZE = 2**20
+
+
+ProcessResult = namedtuple('ProcessResult', ['name', 'exitcode', 'seconds'])
+ProcessResult.__doc__ = """Outcome of one process run by `launch_and_wait`:
+its name, exit code and wall time in seconds."""
 
 
 class WatchedProcess(object):
@@ -13,6 +40,7 @@ class WatchedProcess(object):
         self.process = proc
         self.state = 0 # 0=not-yet-started; 1=started; 2=finished-or-terminated
         self._start_time = None
+        self._end_time = None
 
     def start_process(self):
         if self.state:
@@ -25,6 +53,8 @@ class WatchedProcess(object):
         if self.state < 1:
             raise RuntimeError("Not started: " + str(self.process))
         self.process.join()
+        if self._end_time is None:
+            self._end_time = time.time()
         self.state = 2
 
     def time_since_started(self):
@@ -32,83 +62,314 @@ class WatchedProcess(object):
             raise RuntimeError("Not yet started: " + str(self.process))
         return time.time() - self._start_time
 
+    def wall_time(self):
+        """ Seconds from start to join, or so far if not yet joined. """
+        if self._end_time is None:
+            return self.time_since_started()
+        return self._end_time - self._start_time
+
+    def result(self):
+        return ProcessResult(self.process.name, self.process.exitcode,
+                             self.wall_time())
+
     def __repr__(self):
         return "WatchedProcess for: "+str(self.process)+', state='+str(self.state)
 
 
-def launch_and_wait(mp_proc_list, pool_size):
+def _join_any(running):
+    """ Blocks until at least one of the running WatchedProcess objects
+    has finished, then joins and removes from the list those which have. """
+    if _wait is not None:
+        ready = _wait([p.process.sentinel for p in running])
+        done = [p for p in running if p.process.sentinel in ready]
+    else:
+        done = [p for p in running if not p.process.is_alive()]
+        while not done:
+            time.sleep(0.01)
+            done = [p for p in running if not p.process.is_alive()]
+    for p in done:
+        p.join_process()
+        running.remove(p)
+
+
+def launch_and_wait(mp_proc_list, pool_size, check=True):
     """ Given a list of multiprocessing.Process objects which have not yet
     been started, this function launches them and blocks until the last
     finishes.  This makes sure that only <pool_size> processes are ever
     working at any one time (this number does not include the main process
     which called this function, since that will not tax the CPU).
+    A new process is started as soon as a running one finishes.
     The idea here is roughly analogous to multiprocessing.Pool
     with the exceptions that:
         1 - The caller will get to use the multiprocessing.Process model of
             using shared memory (inheritance) to pass arg data to the child,
         2 - maxtasksperchild is always 1,
-        3 - no function return value is kept/tranferred (not yet implemented)
+        3 - no function return value is kept/tranferred (see TaskExecutor
+            for that)
+
+    Returns a list of ProcessResult (name, exitcode, seconds), in the
+    order of mp_proc_list.  Unless check is False, a RuntimeError is
+    raised after all processes have finished if any exited with a
+    non-zero code.
     """
 
     # Sanity check
     if len(mp_proc_list) < 1:
-        return
+        return []
 
     # Create or own list with easy state watching
     procs = []
     for p in mp_proc_list:
         procs.append(WatchedProcess(p))
 
-    # Launch all of them, but only so pool_size are running at any time
-    keep_going = True
-    while (keep_going):
-        # Before we start any more, find out how many are running.  First go
-        # through the list of those started and see if alive.  Update state.
-        for p in procs:
-            if p.state == 1: # been started
-                if not p.process.is_alive():
-                    p.state = 2 # process has finished or been terminated
-                    if p.process.exitcode is None:
-                        raise RuntimeError(
-                            "Process is not alive but has no exitcode? " +
-                            str(p.process))
-
-        # now figure num_running
-        num_running = len([p for p in procs if p.state == 1])
-
-        # Start some.  Only as many as pool_size should ever be running.
-        num_avail_cpus = pool_size - num_running
-        num_to_start = len([p for p in procs if p.state == 0])
-        if num_to_start < 1:
-            # all have been started, can finally leave loop and go wait
-            break
-        if num_avail_cpus > 0 and num_to_start > 0:
-            num_to_start_now = min(num_avail_cpus, num_to_start)
-            started_now = 0
-            for p in procs:
-                if started_now < num_to_start_now and p.state == 0:
-                    p.start_process()
-                    # debug "launch_and_wait: started: "+str(p.process)
-                    started_now += 1
-        # else: otherwise, all cpus are in use, just wait ...
-
-        # sleep to tame loop activity, but also must sleep a bit after each
-        # start call so that the call to is_alive() woorks correctly
-        time.sleep(1)
-
-    # Out of the launching loop, can now wait on all procs left.
+    # Launch all of them, but only so pool_size are running at any time,
+    # waking up whenever one of those running is done
+    running = []
     for p in procs:
-        p.join_process()
+        while len(running) >= max(1, pool_size):
+            _join_any(running)
+        p.start_process()
+        running.append(p)
+
+    # All have been started, can now wait on all procs left.
+    while running:
+        _join_any(running)
+
+    results = [p.result() for p in procs]
 
     # Check all exit codes before returning
-    for p in procs:
-        if 0 != p.process.exitcode:
-            raise RuntimeError("Problem during: "+str(p.process.name)+ \
-                  ', exitcode: '+str(p.process.exitcode)+'. Check log.')
-    # all is well, can return
+    if check:
+        for r in results:
+            if 0 != r.exitcode:
+                raise RuntimeError("Problem during: "+str(r.name)+ \
+                      ', exitcode: '+str(r.exitcode)+'. Check log.')
+    return results
+
+
+class SharedArray(object):
+    """ A NumPy array in shared memory.
+
+    The array itself is the `array` attribute.  A SharedArray pickles as
+    the name of its shared memory block, so it is handed to child
+    processes without copying the data, and what the children write to
+    it is seen by all processes.  The process which created it frees the
+    memory with `close`, after dropping any other reference to `array`.
+    """
+
+    def __init__(self, shape, dtype=float, name=None):
+        if shared_memory is None:
+            raise RuntimeError("SharedArray requires Python 3.8 or later")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        if self.dtype.hasobject:
+            raise ValueError("Arrays of objects cannot be shared")
+        if name is None:
+            size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = os.getpid()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = None
+        self.array = np.ndarray(self.shape, dtype=self.dtype,
+                                buffer=self._shm.buf)
+
+    @classmethod
+    def copy(cls, array):
+        """ Returns a new SharedArray holding a copy of array. """
+        array = np.asanyarray(array)
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return self.shape, self.dtype.str, self.name
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def close(self):
+        """ Unmaps the array, and frees the shared memory when called in
+        the process which created it. """
+        if self._shm is None:
+            return
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # views of the array are still around; the memory stays
+            # mapped until they are gone
+            pass
+        if self._owner == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "SharedArray(%s, %s, name=%r)" % (self.shape, self.dtype,
+                                                 self.name)
+
+
+def _run_task(conn, func, args, kwargs):
+    """ Runs one TaskExecutor task in a child process and sends back its
+    result: ('value', result), ('shared', (shape, dtype, name)) for large
+    arrays, or ('error', traceback text). """
+    try:
+        result = func(*args, **kwargs)
+        if (isinstance(result, np.ndarray) and not result.dtype.hasobject
+                and result.nbytes >= SHARED_RESULT_SIZE):
+            shared = SharedArray.copy(result)
+            # the parent frees the memory once it has its copy
+            shared._owner = None
+            message = ('shared', shared.__getstate__())
+            shared.close()
+        else:
+            message = ('value', result)
+    except Exception:
+        message = ('error', traceback.format_exc())
+    conn.send(message)
+    conn.close()
+
+
+def _task_result(status, value):
+    """ Turns the message sent by _run_task back into the task result. """
+    if status != 'shared':
+        return value
+    shared = SharedArray(*value)
+    try:
+        return shared.array.copy()
+    finally:
+        shared._owner = os.getpid()
+        shared.close()
+
+
+class TaskExecutor(object):
+    """ Runs functions in child processes, at most pool_size at a time,
+    and collects their return values.
 
+    Large NumPy inputs and outputs are passed through SharedArray
+    objects made with `share` and `empty`: only their names are sent to
+    the children.  Large array results are also returned through shared
+    memory.  For example::
 
-def best_tile_layout(pool_size):
+        >>> with TaskExecutor(4) as ex:  # doctest: +SKIP
+        ...     image = ex.share(data)
+        ...     out = ex.empty(data.shape)
+        ...     for rows in blocks:
+        ...         ex.submit(smooth, image, out, rows)
+        ...     results = ex.run()
+        ...     smoothed = out.array.copy()
+
+    Each task runs in a new process (maxtasksperchild is 1), so the
+    functions and their arguments must be picklable when processes are
+    not started by forking.
+    """
+
+    def __init__(self, pool_size=None):
+        if pool_size is None:
+            pool_size = multiprocessing.cpu_count()
+        self.pool_size = max(1, pool_size)
+        self.process_results = []
+        self._tasks = []
+        self._shared = []
+
+    def share(self, array):
+        """ Returns a SharedArray holding a copy of array, freed with the
+        executor. """
+        shared = SharedArray.copy(array)
+        self._shared.append(shared)
+        return shared
+
+    def empty(self, shape, dtype=float):
+        """ Returns a new uninitialized SharedArray, freed with the
+        executor. """
+        shared = SharedArray(shape, dtype)
+        self._shared.append(shared)
+        return shared
+
+    def submit(self, func, *args, **kwargs):
+        """ Queues func(*args, **kwargs) for the next `run`, and returns
+        the index of its result. """
+        self._tasks.append((func, args, kwargs))
+        return len(self._tasks) - 1
+
+    def run(self):
+        """ Runs the queued tasks and returns their results in the order
+        they were submitted.  A ProcessResult for every task is kept in
+        `process_results`.  If any task raised an exception or died, a
+        RuntimeError is raised once all tasks have finished. """
+        if _wait is None:
+            raise RuntimeError("TaskExecutor requires Python 3")
+        if shared_memory is not None:
+            # children must not start trackers of their own, which would
+            # free the shared memory of their results when they exit
+            resource_tracker.ensure_running()
+        tasks, self._tasks = self._tasks, []
+        results = [None] * len(tasks)
+        procs = [None] * len(tasks)
+        errors = []
+        running = {}
+        next_task = 0
+
+        while next_task < len(tasks) or running:
+            # Start tasks as long as there are free slots
+            while next_task < len(tasks) and len(running) < self.pool_size:
+                func, args, kwargs = tasks[next_task]
+                reader, writer = multiprocessing.Pipe(duplex=False)
+                p = WatchedProcess(multiprocessing.Process(
+                    target=_run_task, args=(writer, func, args, kwargs),
+                    name=getattr(func, '__name__', 'task')))
+                p.start_process()
+                writer.close()
+                running[reader] = next_task
+                procs[next_task] = p
+                next_task += 1
+
+            # A pipe is ready when its task sent its result, or died
+            for reader in _wait(list(running)):
+                index = running.pop(reader)
+                try:
+                    status, value = reader.recv()
+                except EOFError:
+                    status, value = 'error', 'no result'
+                reader.close()
+                procs[index].join_process()
+                if status == 'error':
+                    errors.append((index, value))
+                else:
+                    results[index] = _task_result(status, value)
+
+        self.process_results = [p.result() for p in procs]
+        if errors:
+            index, message = min(errors)
+            raise RuntimeError("Problem during task %d (%s), exitcode: %s:"
+                               "\n%s" % (index, procs[index].process.name,
+                                         procs[index].process.exitcode,
+                                         message))
+        return results
+
+    def close(self):
+        """ Frees the shared arrays made by the executor. """
+        for shared in self._shared:
+            shared.close()
+        self._shared = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def best_tile_layout(pool_size, shape=None, halo=0):
     """ Determine and return the best layout of "tiles" for fastest
     overall parallel processing of a rectangular image broken up into N
     smaller equally-sized rectangular tiles, given as input the number
@@ -140,7 +401,17 @@ def best_tile_layout(pool_size):
     For higher, odd pool_size values (say 39), it is deemed best to
     sacrifice a few unused cores to satisfy our other constraints, and thus
     the result of 6x6 is best (giving 36 tiles and 3 unused cores).
+
+    When the (ny, nx) shape of the image is given, the layout is instead
+    the one whose largest tile, including a margin of halo pixels on
+    every side, is smallest, so that elongated images are cut across
+    their long side.  Among equally good layouts, the one with squarer
+    and fewer tiles is chosen, then the one with fewer tiles in X so
+    that tiles hold contiguous rows.
     """
+    if shape is not None:
+        return _aspect_tile_layout(pool_size, shape, halo)
+
     # Easy answer sanity-checks
     if pool_size < 2:
         return (1, 1)
@@ -162,3 +433,119 @@ def best_tile_layout(pool_size):
     xnum = int(math.sqrt(pool_size))
     ynum = int((1.*pool_size)/xnum)
     return (xnum, ynum)
+
+
+def _aspect_tile_layout(pool_size, shape, halo):
+    """ best_tile_layout for an image of the given shape. """
+    if len(shape) != 2:
+        raise ValueError("Tiled images must be 2-D, not of shape " +
+                         str(shape))
+    ny_pix, nx_pix = shape
+    best = None
+    for xnum in range(1, max(1, min(pool_size, nx_pix)) + 1):
+        ynum = max(1, min(pool_size // xnum, ny_pix))
+        width = min(nx_pix, -(-nx_pix // xnum) + 2 * halo)
+        height = min(ny_pix, -(-ny_pix // ynum) + 2 * halo)
+        score = (width * height, width + height, xnum * ynum)
+        if best is None or score < best[0]:
+            best = (score, (xnum, ynum))
+    return best[1]
+
+
+Tile = namedtuple('Tile', ['slices', 'halo_slices', 'trim'])
+Tile.__doc__ = """One tile of an image, from `tile_slices`.
+
+``slices`` select the tile in the image, ``halo_slices`` the tile and
+its halo in the image, and ``trim`` select the tile within the array
+read with ``halo_slices``.
+"""
+
+
+def _bounds(size, num):
+    return [i * size // num for i in range(num + 1)]
+
+
+def tile_slices(shape, layout=None, halo=0, pool_size=None):
+    """ Returns the list of Tile for cutting an image of the given (ny, nx)
+    shape into layout = (<num tiles in X>, <num tiles in Y>) tiles of
+    nearly equal size, row by row.  Each tile comes with a margin of up
+    to halo pixels of its neighbors, clipped at the image edges.  Without
+    a layout, best_tile_layout is used for pool_size processes (the
+    number of CPUs by default).
+    """
+    if layout is None:
+        if pool_size is None:
+            pool_size = multiprocessing.cpu_count()
+        layout = best_tile_layout(pool_size, shape=shape, halo=halo)
+    if len(shape) != 2:
+        raise ValueError("Tiled images must be 2-D, not of shape " +
+                         str(shape))
+    xnum, ynum = layout
+    xbounds = _bounds(shape[1], xnum)
+    ybounds = _bounds(shape[0], ynum)
+
+    tiles = []
+    for y0, y1 in zip(ybounds[:-1], ybounds[1:]):
+        if y0 == y1:
+            continue
+        hy0, hy1 = max(0, y0 - halo), min(shape[0], y1 + halo)
+        for x0, x1 in zip(xbounds[:-1], xbounds[1:]):
+            if x0 == x1:
+                continue
+            hx0, hx1 = max(0, x0 - halo), min(shape[1], x1 + halo)
+            tiles.append(Tile((slice(y0, y1), slice(x0, x1)),
+                              (slice(hy0, hy1), slice(hx0, hx1)),
+                              (slice(y0 - hy0, y1 - hy0),
+                               slice(x0 - hx0, x1 - hx0))))
+    return tiles
+
+
+def _run_tile(kernel, image, out, tile, args, kwargs):
+    """ Runs kernel on one tile and writes its result to out. """
+    if isinstance(image, SharedArray):
+        image, out = image.array, out.array
+    result = kernel(image[tile.halo_slices], *args, **kwargs)
+    if np.shape(result) != image[tile.halo_slices].shape:
+        raise ValueError("Kernel returned shape %s for a tile of shape %s" %
+                         (np.shape(result), image[tile.halo_slices].shape))
+    out[tile.slices] = np.asarray(result)[tile.trim]
+
+
+def run_tiled(kernel, image, halo=0, pool_size=None, layout=None,
+              dtype=None, args=(), kwargs=None):
+    """ Applies kernel to a 2-D image tile by tile, in parallel.
+
+    kernel(tile, *args, **kwargs) gets each tile with its halo, and must
+    return an array of the same shape; only the part of it within the
+    tile is kept, so kernels which use neighbors up to halo pixels away
+    give the same result as on the whole image.  The tiles are run by a
+    TaskExecutor of pool_size processes (the number of CPUs by default)
+    with the image in shared memory, and every process writes its tile
+    straight into a shared output array of the given dtype (that of the
+    image by default), which is returned.  With a pool_size of 1 the
+    kernel runs in this process.
+    """
+    image = np.asanyarray(image)
+    if pool_size is None:
+        pool_size = multiprocessing.cpu_count()
+    if kwargs is None:
+        kwargs = {}
+    if dtype is None:
+        dtype = image.dtype
+    tiles = tile_slices(image.shape, layout=layout, halo=halo,
+                        pool_size=pool_size)
+
+    if pool_size <= 1 or len(tiles) == 1:
+        out = np.empty(image.shape, dtype=dtype)
+        for tile in tiles:
+            _run_tile(kernel, image, out, tile, args, kwargs)
+        return out
+
+    with TaskExecutor(pool_size) as ex:
+        shared_image = ex.share(image)
+        shared_out = ex.empty(image.shape, dtype)
+        for tile in tiles:
+            ex.submit(_run_tile, kernel, shared_image, shared_out, tile,
+                      args, kwargs)
+        ex.run()
+        return shared_out.array.copy()
@@ -411,9 +411,26 @@ Perform Levenberg-Marquardt least-squares minimization, based on MINPACK-1.
 
         Translated from MPFIT (Craig Markwardt's IDL package) to Python,
         August, 2002.  Mark Rivers
+
+        Added the LINALG='lapack' backend (pivoted QR factorization and
+        triangular solves through scipy.linalg), and the VECTORIZED and
+        POOL options for computing the finite-difference jacobian, and
+        MPFIT_BATCH for fitting many small problems in lockstep, and the
+        .stats fit statistics and STATFUNCT hook, and the WARMSTART and
+        BROYDEN options, October, 2026.
 """
 import numpy
 import types
+from timeit import default_timer
+
+try:
+    import scipy.linalg as sla
+except ImportError:
+    sla = None
+
+## Linear algebra backends for the QR factorization and the triangular
+## solves.  'reference' is the line-by-line MINPACK port.
+LINALG_BACKENDS = ('reference', 'lapack')
 
 
 #     Original FORTRAN documentation
@@ -598,13 +615,26 @@ import types
 #
 #     **********
 
+class _functcall(object):
+    """Picklable callable evaluating the user function for POOL.map."""
+    def __init__(self, fcn, functkw):
+        self.fcn = fcn
+        self.functkw = functkw
+
+    def __call__(self, x):
+        return self.fcn(x, fjac=None, **self.functkw)
+
+
 class mpfit:
     def __init__(self, fcn, xall=None, functkw={}, parinfo=None,
                                             ftol=1.e-10, xtol=1.e-10, gtol=1.e-10,
                                             damp=0., maxiter=200, factor=100., nprint=1,
                                             iterfunct='default', iterkw={}, nocovar=0,
                                             fastnorm=0, rescale=0, autoderivative=1, quiet=0,
-                                            diag=None, epsfcn=None, debug=0):
+                                            diag=None, epsfcn=None, debug=0,
+                                            linalg='reference', vectorized=0, pool=None,
+                                            statfunct=None, warmstart=None, keepjac=0,
+                                            broyden=0):
         """
 Inputs:
 fcn:
@@ -621,6 +651,16 @@ xall:
 
 Keywords:
 
+broyden:
+        The maximum number of consecutive iterations in which the jacobian is
+        updated with a rank-1 (Broyden) update from the last accepted step
+        instead of being recomputed.  A full jacobian is computed whenever
+        this number is reached or the last step was poorly predicted by the
+        linear model.  Useful when the jacobian is expensive and changes
+        slowly; it usually takes a few more iterations but far fewer function
+        evaluations.
+                Default: 0  The jacobian is recomputed every iteration.
+
 autoderivative:
         If this is set, derivatives of the function will be computed
         automatically via a finite differencing procedure.  If not set, then
@@ -708,6 +748,29 @@ iterfunct:
         Set iterfunct=None if there is no user-defined routine and you don't
         want the internal default routine be called.
 
+pool:
+        An object with a map() method, such as a multiprocessing.Pool or a
+        concurrent.futures thread or process pool executor.  When given,
+        the function evaluations of the finite-difference jacobian are
+        spread over the pool with pool.map().  For process pools, fcn and
+        the values in functkw must be picklable.
+                Default: None  The evaluations are made one after another.
+
+keepjac:
+        Set this keyword to keep the last jacobian of the free parameters
+        in .fjac (an m x nfree array), e.g. to warm-start another fit.
+                Default: clear (=0)
+
+linalg:
+        The linear algebra backend used for the QR factorization of the
+        jacobian and the triangular solves of the Levenberg-Marquardt step.
+        'reference' uses the Python port of the MINPACK routines (QRFAC,
+        QRSOLV and LMPAR).  'lapack' uses the LAPACK routines of
+        scipy.linalg (pivoted QR, solve_triangular), which is much faster
+        for large numbers of residuals or parameters.  The results agree
+        to within rounding errors.  'lapack' requires scipy.
+        Default: 'reference'
+
 maxiter:
         The maximum number of iterations to perform.  If the number is exceeded,
         then the status value is set to 5 and MPFIT returns.
@@ -738,6 +801,24 @@ parinfo
 quiet:
         Set this keyword when no textual output should be printed by MPFIT
 
+statfunct:
+        A function called with the fit statistics (see .stats below) after
+        each iteration and once more when the fit terminates, for example
+        to log them or send them to a monitoring system:
+                def statfunct(stats)
+        stats['done'] is set on the final call.  The dictionary is updated
+        in place as the fit proceeds; copy it to keep a snapshot.
+                Default: None
+
+vectorized:
+        Set this keyword if fcn also accepts a block of parameter sets.  To
+        compute the finite-difference jacobian, fcn is then called once
+        with a 2-D array of shape (k, npar), one parameter set per row, and
+        must return [status, deviates] where deviates has shape (k, m).
+        All other calls pass a single parameter set as usual.  .nfev
+        counts each row of a block as one function evaluation.
+                Default: clear (=0)
+
 damp:
         A scalar number, indicating the cut-off value of residuals where
         "damping" will occur.  Residuals with magnitudes greater than this
@@ -750,6 +831,17 @@ damp:
 
         Note: DAMP doesn't work with autoderivative=0
 
+warmstart:
+        The result of a previous fit (an mpfit object, or any object with
+        the same attributes) of a similar problem, used to seed this fit:
+        its .params are the starting values if xall is not given, its
+        .diag scaling and .par Levenberg-Marquardt parameter are used from
+        the start, and its .fjac jacobian (see KEEPJAC), if any, replaces
+        the first jacobian computation.  The previous fit must have the
+        same free parameters, as recorded in its .ifree indices (and, for
+        .fjac, the same number of residuals).
+                Default: None
+
 xtol:
         A nonnegative input variable. Termination occurs when the relative error
         between two consecutive iterates is at most xtol (and status is
@@ -800,6 +892,9 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         8  gtol is too small. fvec is orthogonal to the columns of the jacobian
                 to machine precision.
 
+        9  (mpfit_batch only) No step reducing the sum of squares could be
+                found.
+
 .fnorm
         The value of the summed squared residuals for the returned parameter
         values.
@@ -830,6 +925,38 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 .niter
         The number of iterations completed.
 
+.diag, .par, .ifree
+        The final parameter scaling and Levenberg-Marquardt parameter, and
+        the indices of the free parameters, for use with WARMSTART.
+
+.fjac
+        The last jacobian of the free parameters if KEEPJAC was set,
+        otherwise None.
+
+.stats
+        A dictionary of statistics on where the fit spent its time:
+                'time_total'  wall time of the whole fit [s]
+                'time_fcn'    time spent in calls of the user function [s]
+                'time_fdjac2' time spent computing jacobians, including the
+                              user function calls this needs [s]
+                'time_qrfac'  time spent in QR factorizations [s]
+                'time_lmpar'  time spent computing Levenberg-Marquardt
+                              steps (LMPAR and QRSOLV) [s]
+                'nfev'        dictionary with the number of function
+                              evaluations for the 'initial' call, the
+                              'jacobian', trial 'step's, the 'final' call
+                              and 'iterfunct' printing
+                'njacobian'   number of jacobians computed in full
+                'nbroyden'    number of rank-1 jacobian updates
+                'nsteps'      number of trial steps
+                'naccepted'   number of accepted steps
+                'acceptance'  naccepted / nsteps
+                'niter'       number of iterations
+                'status'      current status
+                'done'        set when the fit has terminated
+        The times are inclusive, so user function time within jacobians is
+        counted in both 'time_fcn' and 'time_fdjac2'.
+
 .perror
         The formal 1-sigma errors in each parameter, computed from the
         covariance matrix.  If a parameter is held fixed, or if it touches a
@@ -849,10 +976,49 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                 pcerror = mpfit.perror * numpy.sqrt(mpfit.fnorm / dof)
 
         """
+        self.stats = {'time_total': 0., 'time_fcn': 0., 'time_fdjac2': 0.,
+                      'time_qrfac': 0., 'time_lmpar': 0.,
+                      'nfev': {'initial': 0, 'jacobian': 0, 'step': 0,
+                               'final': 0, 'iterfunct': 0},
+                      'njacobian': 0, 'nbroyden': 0,
+                      'nsteps': 0, 'naccepted': 0, 'acceptance': 0.,
+                      'niter': 0, 'status': 0, 'done': False}
+        self.statfunct = statfunct
+        self.purpose = 'initial'
+        tstart = default_timer()
+        try:
+            self.lmdif(fcn, xall, functkw, parinfo, ftol, xtol, gtol, damp,
+                       maxiter, factor, nprint, iterfunct, iterkw, nocovar,
+                       fastnorm, rescale, autoderivative, quiet, diag, epsfcn,
+                       debug, linalg, vectorized, pool, warmstart, keepjac,
+                       broyden)
+        except BaseException:
+            self.stats['time_total'] = default_timer() - tstart
+            self.stats['done'] = True
+            ## Errors of STATFUNCT must not hide that of the fit
+            try:
+                self.updatestats()
+            except Exception:
+                pass
+            raise
+        self.stats['time_total'] = default_timer() - tstart
+        self.stats['done'] = True
+        self.updatestats()
+
+
+    ## Levenberg-Marquardt minimization (MINPACK-1 LMDIF), see __init__
+    def lmdif(self, fcn, xall, functkw, parinfo, ftol, xtol, gtol, damp,
+              maxiter, factor, nprint, iterfunct, iterkw, nocovar, fastnorm,
+              rescale, autoderivative, quiet, diag, epsfcn, debug, linalg,
+              vectorized, pool, warmstart, keepjac, broyden):
         self.niter = 0
         self.params = None
         self.covar = None
         self.perror = None
+        self.diag = None
+        self.par = None
+        self.fjac = None
+        self.ifree = None
         self.status = 0  # Invalid input flag set while we check inputs
         self.debug = debug
         self.errmsg = ''
@@ -861,11 +1027,21 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         self.damp = damp
         self.machar = machar(double=1)
         machep = self.machar.machep
+        self.linalg = linalg
+        self.vectorized = vectorized
+        self.pool = pool
 
         if fcn is None:
             self.errmsg = "Usage: parms = mpfit('myfunt', ... )"
             return
 
+        if linalg not in LINALG_BACKENDS:
+            self.errmsg = 'ERROR: LINALG must be one of ' + str(LINALG_BACKENDS)
+            return
+        if linalg == 'lapack' and sla is None:
+            self.errmsg = 'ERROR: LINALG="lapack" requires scipy'
+            return
+
         if iterfunct == 'default':
             iterfunct = self.defiter
 
@@ -875,6 +1051,10 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             self.errmsg =  'ERROR: keywords DAMP and AUTODERIVATIVE are mutually exclusive'
             return
 
+        ## Start from the parameters of a previous fit
+        if xall is None and warmstart is not None and warmstart.params is not None:
+            xall = numpy.array(warmstart.params, numpy.float64)
+
         ## Parameters can either be stored in parinfo, or x. x takes precedence if it exists
         if xall is None and parinfo is None:
             self.errmsg = 'ERROR: must pass parameters in P or PARINFO'
@@ -1023,6 +1203,31 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         ## Initialize Levelberg-Marquardt parameter and iteration counter
 
         par = 0.
+
+        ## Seed the scaling, LM parameter and first jacobian from a
+        ## previous fit
+        warmdiag = 0
+        nextjac = None
+        if warmstart is not None:
+            self.errmsg = 'ERROR: WARMSTART does not match the free parameters of this fit'
+            wfree = getattr(warmstart, 'ifree', None)
+            if wfree is not None and not numpy.array_equal(wfree, ifree):
+                return
+            wdiag = getattr(warmstart, 'diag', None)
+            if wdiag is not None:
+                if len(wdiag) != n: return
+                diag = numpy.array(wdiag, numpy.float64)
+                warmdiag = 1
+            if getattr(warmstart, 'par', None) is not None:
+                par = warmstart.par
+            wjac = getattr(warmstart, 'fjac', None)
+            if wjac is not None:
+                if numpy.shape(wjac) != (m, n): return
+                nextjac = numpy.array(wjac, numpy.float64)
+            self.errmsg = ''
+        nbroyden = 0
+        warmjac = 0
+        ratio = 1.
         self.niter = 1
         qtf = x * 0.
         self.status = 0
@@ -1042,6 +1247,7 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                     xnew0 = self.params.copy()
 
                     dof = max(len(fvec) - len(x), 0)
+                    self.purpose = 'iterfunct'
                     status = iterfunct(fcn, self.params, self.niter, self.fnorm**2,
                             functkw=functkw, parinfo=parinfo, quiet=quiet,
                             dof=dof, **iterkw)
@@ -1061,14 +1267,36 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 
             ## Calculate the jacobian matrix
             self.status = 2
-            catch_msg = 'calling MPFIT_FDJAC2'
-            fjac = self.fdjac2(fcn, x, fvec, step, qulim, ulim, dside,
-                                                    epsfcn=epsfcn,
-                                                    autoderivative=autoderivative, dstep=dstep,
-                                                    functkw=functkw, ifree=ifree, xall=self.params)
-            if fjac is None:
-                self.errmsg = 'WARNING: premature termination by FDJAC2'
-                return
+            ## (or reuse the warm-start jacobian, or the rank-1 update of the
+            ## previous one)
+            if nextjac is not None and self.niter == 1:
+                fjac = nextjac
+                warmjac = 1
+            elif (nextjac is not None and nbroyden < broyden and ratio >= 0.25):
+                fjac = nextjac
+                nbroyden = nbroyden + 1
+                self.stats['nbroyden'] += 1
+            else:
+                catch_msg = 'calling MPFIT_FDJAC2'
+                self.purpose = 'jacobian'
+                tstart = default_timer()
+                fjac = self.fdjac2(fcn, x, fvec, step, qulim, ulim, dside,
+                                                        epsfcn=epsfcn,
+                                                        autoderivative=autoderivative, dstep=dstep,
+                                                        functkw=functkw, ifree=ifree, xall=self.params)
+                self.stats['time_fdjac2'] += default_timer() - tstart
+                if fjac is None:
+                    self.errmsg = 'WARNING: premature termination by FDJAC2'
+                    return
+                self.stats['njacobian'] += 1
+                nbroyden = 0
+                warmjac = 0
+            nextjac = None
+
+            ## Keep the jacobian, which is overwritten by the QR factorization
+            if keepjac or broyden > 0:
+                jac = fjac.copy()
+                if keepjac: self.fjac = jac
 
             ## Determine if any of the parameters are pegged at the limits
             if qanylim:
@@ -1090,13 +1318,18 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                         if (sum < 0): fjac[:,whupeg[i]] = 0
 
             ## Compute the QR factorization of the jacobian
-            [fjac, ipvt, wa1, wa2] = self.qrfac(fjac, pivot=1)
+            tstart = default_timer()
+            if self.linalg == 'lapack':
+                [fjac, ipvt, qtf, wa2] = self.qrfac_lapack(fjac, fvec)
+                wa1 = qtf * 0.
+            else:
+                [fjac, ipvt, wa1, wa2] = self.qrfac(fjac, pivot=1)
 
             ## On the first iteration if "diag" is unspecified, scale
             ## according to the norms of the columns of the initial jacobian
             catch_msg = 'rescaling diagonal elements'
             if self.niter == 1:
-                if rescale == 0 or len(diag) < n:
+                if (rescale == 0 or len(diag) < n) and not warmdiag:
                     diag = wa2.copy()
                     wh = (numpy.nonzero(diag == 0) )[0]
                     numpy.put(diag, wh, 1.)
@@ -1109,26 +1342,29 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                 if (delta == 0.): delta = factor
 
             ## Form (q transpose)*fvec and store the first n components in qtf
+            ## (already done by qrfac_lapack)
             catch_msg = 'forming (q transpose)*fvec'
-            wa4 = fvec.copy()
-            for j in range(n):
-                lj = ipvt[j]
-                temp3 = fjac[j,lj]
-                if (temp3 != 0):
-                    fj = fjac[j:,lj]
-                    wj = wa4[j:]
-                    ## *** optimization wa4(j:*)
-                    wa4[j:] = wj - fj * numpy.sum(fj*wj) / temp3
-                fjac[j,lj] = wa1[j]
-                qtf[j] = wa4[j]
-            ## From this point on, only the square matrix, consisting of the
-            ## triangle of R, is needed.
-            fjac = fjac[0:n, 0:n]
-            fjac.shape = [n, n]
-            temp = fjac.copy()
-            for i in range(n):
-                temp[:,i] = fjac[:, ipvt[i]]
-            fjac = temp.copy()
+            if self.linalg != 'lapack':
+                wa4 = fvec.copy()
+                for j in range(n):
+                    lj = ipvt[j]
+                    temp3 = fjac[j,lj]
+                    if (temp3 != 0):
+                        fj = fjac[j:,lj]
+                        wj = wa4[j:]
+                        ## *** optimization wa4(j:*)
+                        wa4[j:] = wj - fj * numpy.sum(fj*wj) / temp3
+                    fjac[j,lj] = wa1[j]
+                    qtf[j] = wa4[j]
+                ## From this point on, only the square matrix, consisting of the
+                ## triangle of R, is needed.
+                fjac = fjac[0:n, 0:n]
+                fjac.shape = [n, n]
+                temp = fjac.copy()
+                for i in range(n):
+                    temp[:,i] = fjac[:, ipvt[i]]
+                fjac = temp.copy()
+            self.stats['time_qrfac'] += default_timer() - tstart
 
             ## Check for overflow.  This should be a cheap test here since FJAC
             ## has been reduced to a (small) square matrix, and the test is
@@ -1146,10 +1382,15 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                         sum = numpy.sum(fjac[0:j+1,j]*qtf[0:j+1])/self.fnorm
                         gnorm = max([gnorm,abs(sum/wa2[l])])
 
-            ## Test for convergence of the gradient norm
+            ## Test for convergence of the gradient norm.  A rank-1 updated
+            ## or warm-start jacobian is not good enough for that: compute it
+            ## in full.
+            if (gnorm <= gtol) and (nbroyden > 0 or warmjac):
+                nbroyden = broyden
+                continue
             if (gnorm <= gtol):
                 self.status = 4
-                return
+                break
 
             ## Rescale if necessary
             if (rescale == 0):
@@ -1160,8 +1401,10 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 
                 ## Determine the levenberg-marquardt parameter
                 catch_msg = 'calculating LM parameter (MPFIT_)'
+                tstart = default_timer()
                 [fjac, par, wa1, wa2] = self.lmpar(fjac, ipvt, diag, qtf,
                                                                                                                         delta, wa1, wa2, par=par)
+                self.stats['time_lmpar'] += default_timer() - tstart
                 ## Store the direction p and x+p. Calculate the norm of p
                 wa1 = -wa1
 
@@ -1232,6 +1475,8 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                 ## Evaluate the function at x+p and calculate its norm
                 mperr = 0
                 catch_msg = 'calling '+str(fcn)
+                self.purpose = 'step'
+                self.stats['nsteps'] += 1
                 [self.status, wa4] = self.call(fcn, self.params, functkw)
                 if (self.status < 0):
                     self.errmsg = 'WARNING: premature termination by "'+fcn+'"'
@@ -1274,6 +1519,15 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 
                 ## Test for successful iteration
                 if (ratio >= 0.0001):
+                    ## Rank-1 (Broyden) update of the jacobian for the step
+                    ## actually taken: J + ((df - J dx) dx^T) / (dx^T dx)
+                    if broyden > 0:
+                        dx = wa2 - x
+                        dxnorm2 = numpy.sum(dx*dx)
+                        if dxnorm2 > 0:
+                            nextjac = jac + numpy.outer(
+                                    (wa4 - fvec) - numpy.dot(jac, dx), dx/dxnorm2)
+
                     ## Successful iteration.  Update x, fvec, and their norms
                     x = wa2
                     wa2 = diag * x
@@ -1281,6 +1535,7 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
                     xnorm = self.enorm(wa2)
                     self.fnorm = fnorm1
                     self.niter = self.niter + 1
+                    self.stats['naccepted'] += 1
 
                 ## Tests for convergence
                 if ((abs(actred) <= ftol) and (prered <= ftol)
@@ -1310,6 +1565,7 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             ##   self.status = -16
             ##   break
             if (self.status != 0): break;
+            self.updatestats()
         ## End of outer loop.
 
         catch_msg = 'in the termination phase'
@@ -1324,6 +1580,7 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 
         if nprint > 0 and self.status > 0:
             catch_msg = 'calling ' + str(fcn)
+            self.purpose = 'final'
             [status, fvec] = self.call(fcn, self.params, functkw)
             catch_msg = 'in the termination phase'
             self.fnorm = self.enorm(fvec)
@@ -1332,6 +1589,35 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             self.fnorm = max([self.fnorm, fnorm1])
             self.fnorm = self.fnorm**2.
 
+        self.diag = diag
+        self.par = par
+        self.ifree = ifree
+
+        ## The covariance needs a jacobian computed in full, not a rank-1
+        ## update or a warm-start one
+        if ((nbroyden > 0 or warmjac) and self.status > 0 and nocovar == 0):
+            catch_msg = 'computing the final jacobian'
+            self.purpose = 'final'
+            fjac = self.fdjac2(fcn, x, fvec, step, qulim, ulim, dside,
+                                                    epsfcn=epsfcn,
+                                                    autoderivative=autoderivative, dstep=dstep,
+                                                    functkw=functkw, ifree=ifree, xall=self.params)
+            if fjac is not None:
+                self.stats['njacobian'] += 1
+                if keepjac: self.fjac = fjac.copy()
+                if qanylim:
+                    sum = numpy.dot(fvec, fjac)
+                    wh = (numpy.nonzero((qllim & (x == llim) & (sum > 0)) |
+                                        (qulim & (x == ulim) & (sum < 0))))[0]
+                    fjac[:,wh] = 0
+                if self.linalg == 'lapack':
+                    [fjac, ipvt, wa1, wa2] = self.qrfac_lapack(fjac, fvec)
+                else:
+                    [fjac, ipvt, wa1, wa2] = self.qrfac(fjac, pivot=1)
+                    for j in range(n):
+                        fjac[j,ipvt[j]] = wa1[j]
+                    fjac = numpy.take(fjac[0:n, 0:n], ipvt, axis=1)
+
         self.covar = None
         self.perror = None
         ## (very carefully) set the covariance matrix COVAR
@@ -1364,6 +1650,17 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         return
 
 
+    ## Refresh the derived entries of .stats and pass them to STATFUNCT
+    def updatestats(self):
+        stats = self.stats
+        stats['niter'] = self.niter
+        stats['status'] = self.status
+        if stats['nsteps'] > 0:
+            stats['acceptance'] = stats['naccepted'] / stats['nsteps']
+        if self.statfunct is not None:
+            self.statfunct(stats)
+
+
     ## Default procedure to be called every iteration.  It simply prints
     ## the parameter values.
     def defiter(self, fcn, x, iter, fnorm=None, functkw=None,
@@ -1455,9 +1752,16 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             x = self.tie(x, self.ptied)
 
         self.nfev = self.nfev + 1
+        self.stats['nfev'][self.purpose] += 1
+
+        tstart = default_timer()
+        try:
+            result = fcn(x, fjac=fjac, **functkw)
+        finally:
+            self.stats['time_fcn'] += default_timer() - tstart
 
         if fjac is None:
-            [status, f] = fcn(x, fjac=fjac, **functkw)
+            [status, f] = result
 
             if self.damp > 0:
                 ## Apply the damping if requested.  This replaces the residuals
@@ -1467,7 +1771,38 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             return([status, f])
 
         else:
-            return(fcn(x, fjac=fjac, **functkw))
+            return(result)
+
+
+    ## Call user function for each row of the (k, npar) array XS, either
+    ## with the whole block at once (VECTORIZED) or through POOL.map.
+    ## Returns the lowest status and the (k, m) array of deviates.
+    def call_many(self, fcn, xs, functkw):
+        if self.debug:
+            print('Entering call_many...')
+
+        if self.qanytied:
+            for x in xs:
+                self.tie(x, self.ptied)
+
+        self.nfev = self.nfev + len(xs)
+        self.stats['nfev'][self.purpose] += len(xs)
+
+        tstart = default_timer()
+        try:
+            if self.vectorized:
+                [status, f] = fcn(xs, fjac=None, **functkw)
+                f = numpy.reshape(f, [len(xs), -1])
+            else:
+                results = list(self.pool.map(_functcall(fcn, functkw), list(xs)))
+                status = min([r[0] for r in results])
+                f = numpy.array([r[1] for r in results])
+        finally:
+            self.stats['time_fcn'] += default_timer() - tstart
+
+        if self.damp > 0:
+            f = numpy.tanh(f/self.damp)
+        return([status, f])
 
 
     def enorm(self, vec):
@@ -1528,24 +1863,28 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         ## Compute analytical derivative if requested
         if (autoderivative == 0):
             mperr = 0
-            fjac = numpy.zeros(nall, numpy.float)
+            fjac = numpy.zeros(nall, numpy.float64)
             numpy.put(fjac, ifree, 1.0)  ## Specify which parameters need derivatives
-            [status, fp] = self.call(fcn, xall, functkw, fjac=fjac)
+            result = self.call(fcn, xall, functkw, fjac=fjac)
+            if result[0] < 0:
+                return(None)
+            pderiv = None
+            if len(result) > 2:
+                pderiv = result[2]
 
-            if len(fjac) != m*nall:
+            if pderiv is None or numpy.size(pderiv) != m*nall:
                 print('ERROR: Derivative matrix was not computed properly.')
                 return(None)
 
             ## This definition is c1onsistent with CURVEFIT
             ## Sign error found (thanks Jesus Fernandez <fernande@irm.chu-caen.fr>)
-            fjac.shape = [m,nall]
-            fjac = -fjac
+            fjac = -numpy.reshape(numpy.asarray(pderiv, numpy.float64), [m, nall])
 
             ## Select only the free parameters
             if len(ifree) < nall:
                 fjac = fjac[:,ifree]
                 fjac.shape = [m, n]
-                return(fjac)
+            return(fjac)
 
         fjac = numpy.zeros([m, n], numpy.float)
 
@@ -1578,6 +1917,28 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             wh = (numpy.nonzero(mask))[0]
 
             if len(wh) > 0: numpy.put(h, wh, -numpy.take(h, wh))
+
+        twosided = abs(numpy.take(dside, ifree)) > 1
+
+        ## Evaluate all the perturbed parameter sets in one block, or
+        ## through the pool
+        if self.vectorized or self.pool is not None:
+            wh = (numpy.nonzero(twosided))[0]
+            xp = numpy.repeat(xall[numpy.newaxis,:], n + len(wh), axis=0)
+            xp[numpy.arange(n), ifree] = xp[numpy.arange(n), ifree] + h
+            xp[n + numpy.arange(len(wh)), ifree[wh]] = (
+                    xp[n + numpy.arange(len(wh)), ifree[wh]] - h[wh])
+            [status, fp] = self.call_many(fcn, xp, functkw)
+            if (status < 0): return(None)
+
+            ## COMPUTE THE ONE-SIDED DERIVATIVES
+            fjac = numpy.transpose((fp[0:n]-fvec)/h[:,numpy.newaxis])
+            if len(wh) > 0:
+                ## COMPUTE THE TWO-SIDED DERIVATIVES
+                fjac[:,wh] = numpy.transpose(
+                        (fp[wh]-fp[n:])/(2*h[wh,numpy.newaxis]))
+            return(fjac)
+
         ## Loop through parameters, computing the derivative for each
         for j in range(n):
             xp = xall.copy()
@@ -1585,7 +1946,7 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             [status, fp] = self.call(fcn, xp, functkw)
             if (status < 0): return(None)
 
-            if abs(dside[j]) <= 1:
+            if not twosided[j]:
                 ## COMPUTE THE ONE-SIDED DERIVATIVE
                 ## Note optimization fjac(0:*,j)
                 fjac[0:,j] = (fp-fvec)/h[j]
@@ -1802,6 +2163,22 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         return([a, ipvt, rdiag, acnorm])
 
 
+    ## LAPACK version of QRFAC followed by the formation of (q transpose)*fvec.
+    ## Returns the n x n upper triangular matrix R (columns in pivot order,
+    ## as QRFAC's output after MPFIT has shed the extraneous rows), the
+    ## permutation IPVT, the first n components of (q transpose)*fvec and
+    ## the norms of the columns of the input matrix.
+    def qrfac_lapack(self, a, fvec):
+
+        if (self.debug): print('Entering qrfac_lapack...')
+        n = numpy.shape(a)[1]
+        acnorm = numpy.sqrt(numpy.sum(a*a, axis=0))
+        qtf, r, ipvt = sla.qr_multiply(a, fvec, mode='right', pivoting=True,
+                                       overwrite_a=True)
+        r = numpy.triu(r[0:n, 0:n])
+        return([r, ipvt, qtf[0:n], acnorm])
+
+
     #     Original FORTRAN documentation
     #     **********
     #
@@ -1952,6 +2329,41 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         return(r, x, sdiag)
 
 
+    ## LAPACK version of QRSOLV.  The system r*z = qtb, p^T*d*p*z = 0 is
+    ## reduced by a QR factorization of the stacked 2n x n matrix
+    ## [r; p^T*d*p] instead of Givens rotations.  As in QRSOLV, the strict
+    ## lower triangle of r receives the transpose of s.
+    def qrsolv_lapack(self, r, ipvt, diag, qtb, sdiag):
+        if (self.debug): print('Entering qrsolv_lapack...')
+        n = numpy.shape(r)[1]
+
+        a = numpy.vstack([numpy.triu(r), numpy.diag(numpy.take(diag, ipvt))])
+        b = numpy.concatenate([qtb, numpy.zeros(n)])
+        qb, s = sla.qr_multiply(a, b, mode='right', overwrite_a=True)
+        s = s[0:n, 0:n]
+
+        sdiag[:] = numpy.diagonal(s)
+        ilow = numpy.tril_indices(n, -1)
+        r[ilow] = s.T[ilow]
+
+        ## Solve the triangular system for z.  If the system is singular
+        ## then obtain a least squares solution
+        wa = qb[0:n].copy()
+        nsing = n
+        wh = (numpy.nonzero(sdiag == 0) )[0]
+        if (len(wh) > 0):
+            nsing = wh[0]
+            wa[nsing:] = 0
+        if (nsing >= 1):
+            wa[0:nsing] = sla.solve_triangular(s[0:nsing, 0:nsing], wa[0:nsing],
+                                               check_finite=False)
+
+        ## Permute the components of z back to components of x
+        x = numpy.zeros(n)
+        numpy.put(x, ipvt, wa)
+        return(r, x, sdiag)
+
+
 
 
     #     Original FORTRAN documentation
@@ -2064,7 +2476,10 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         if len(wh) > 0:
             nsing = wh[0]
             wa1[wh[0]:] = 0
-        if nsing > 1:
+        if nsing > 1 and self.linalg == 'lapack':
+            wa1[0:nsing] = sla.solve_triangular(r[0:nsing, 0:nsing], wa1[0:nsing],
+                                                check_finite=False)
+        elif nsing > 1:
             ## *** Reverse loop ***
             for j in range(nsing-1,-1,-1):
                 wa1[j] = wa1[j]/r[j,j]
@@ -2090,18 +2505,24 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
         parl = 0.
         if nsing >= n:
             wa1 = numpy.take(diag, ipvt)*numpy.take(wa2, ipvt)/dxnorm
-            wa1[0] = wa1[0] / r[0,0] ## Degenerate case
-            for j in range(1,n):   ## Note "1" here, not zero
-                sum = numpy.sum(r[0:j,j]*wa1[0:j])
-                wa1[j] = (wa1[j] - sum)/r[j,j]
+            if self.linalg == 'lapack':
+                wa1 = sla.solve_triangular(r, wa1, trans='T', check_finite=False)
+            else:
+                wa1[0] = wa1[0] / r[0,0] ## Degenerate case
+                for j in range(1,n):   ## Note "1" here, not zero
+                    sum = numpy.sum(r[0:j,j]*wa1[0:j])
+                    wa1[j] = (wa1[j] - sum)/r[j,j]
 
             temp = self.enorm(wa1)
             parl = ((fp/delta)/temp)/temp
 
         ## Calculate an upper bound, paru, for the zero of the function
-        for j in range(n):
-            sum = numpy.sum(r[0:j+1,j]*qtb[0:j+1])
-            wa1[j] = sum/diag[ipvt[j]]
+        if self.linalg == 'lapack':
+            wa1 = numpy.dot(qtb, numpy.triu(r)) / numpy.take(diag, ipvt)
+        else:
+            for j in range(n):
+                sum = numpy.sum(r[0:j+1,j]*qtb[0:j+1])
+                wa1[j] = sum/diag[ipvt[j]]
         gnorm = self.enorm(wa1)
         paru = gnorm/delta
         if paru == 0: paru = dwarf/min([delta,0.1])
@@ -2121,7 +2542,10 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             if par == 0: par = max([dwarf, paru*0.001])
             temp = numpy.sqrt(par)
             wa1 = temp * diag
-            [r, x, sdiag] = self.qrsolv(r, ipvt, wa1, qtb, sdiag)
+            if self.linalg == 'lapack':
+                [r, x, sdiag] = self.qrsolv_lapack(r, ipvt, wa1, qtb, sdiag)
+            else:
+                [r, x, sdiag] = self.qrsolv(r, ipvt, wa1, qtb, sdiag)
             wa2 = diag*x
             dxnorm = self.enorm(wa2)
             temp = fp
@@ -2134,10 +2558,16 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
             ## Compute the newton correction
             wa1 = numpy.take(diag, ipvt)*numpy.take(wa2, ipvt)/dxnorm
 
-            for j in range(n-1):
-                wa1[j] = wa1[j]/sdiag[j]
-                wa1[j+1:n] = wa1[j+1:n] - r[j+1:n,j]*wa1[j]
-            wa1[n-1] = wa1[n-1]/sdiag[n-1] ## Degenerate case
+            if self.linalg == 'lapack':
+                ## s transpose: sdiag on the diagonal, strict lower triangle of r
+                st = numpy.tril(r, -1)
+                st[numpy.diag_indices(n)] = sdiag
+                wa1 = sla.solve_triangular(st, wa1, lower=True, check_finite=False)
+            else:
+                for j in range(n-1):
+                    wa1[j] = wa1[j]/sdiag[j]
+                    wa1[j+1:n] = wa1[j+1:n] - r[j+1:n,j]*wa1[j]
+                wa1[n-1] = wa1[n-1]/sdiag[n-1] ## Degenerate case
 
             temp = self.enorm(wa1)
             parc = ((fp/delta)/temp)/temp
@@ -2302,6 +2732,356 @@ e.g. mpfit.status, mpfit.errmsg, mpfit.params, npfit.niter, mpfit.covar.
 
         return(r)
 
+class mpfit_batch(mpfit):
+    def __init__(self, fcn, xall=None, functkw={}, batchkw={}, parinfo=None,
+                 ftol=1.e-10, xtol=1.e-10, gtol=1.e-10, maxiter=200,
+                 lambda0=1.e-3, nocovar=0, epsfcn=None, debug=0):
+        """
+Fit many independent problems that share the same model and number of
+parameters, running the Levenberg-Marquardt iterations in lockstep over the
+whole batch with array operations.  Each problem keeps its own damping
+parameter and convergence status; problems that have converged are dropped
+from the calculation while the others continue.
+
+This driver uses the classic (multiplicative) Marquardt damping of the
+normal equations, solved for all problems at once with numpy.linalg,
+instead of the MINPACK trust region of mpfit.  Results agree with mpfit
+to within the requested tolerances, not bit for bit.
+
+Inputs:
+fcn:
+        The function to be minimized.  It is called as
+
+                [status, deviates] = fcn(p, fjac=None, **keywords)
+
+        where p is a (k, npar) array with the parameters of k of the
+        problems (one problem per row) and deviates must be a (k, m) array.
+        The keywords are those of functkw, plus those of batchkw restricted
+        to the same k problems.  status may be a scalar or an array of k
+        values; a negative value stops the fit of the corresponding problems.
+
+xall:
+        A (nprob, npar) array of starting values, one row per problem.  A 1-D
+        array of npar values is used for every problem; the number of
+        problems is then taken from batchkw.
+
+Keywords:
+
+functkw:
+        Keyword arguments passed unchanged to fcn, as in mpfit.
+                Default: {}
+
+batchkw:
+        Keyword arguments with one entry per problem along their first axis
+        (e.g. the data and errors of each problem).  fcn receives the rows of
+        the problems it is asked to evaluate.
+                Default: {}
+
+parinfo:
+        As in mpfit, shared by all problems.  Only the 'fixed', 'limited',
+        'limits', 'step' and 'relstep' keys are used; 'value' may hold the
+        starting values if xall is not given.  Tied parameters are not
+        supported.
+                Default: None
+
+ftol, xtol, gtol, maxiter, nocovar, epsfcn:
+        As in mpfit, applied to each problem.
+
+lambda0:
+        Starting value of the Marquardt damping parameter.  It is divided by
+        10 after every successful step and multiplied by 10 after every
+        unsuccessful one.
+                Default: 1E-3
+
+Outputs:
+
+.params, .perror
+        (nprob, npar) arrays of the parameters and their formal 1-sigma errors
+        (zero for fixed or pegged parameters).  .perror is None if nocovar is
+        set.
+
+.covar
+        (nprob, npar, npar) array of covariance matrices, or None.
+
+.status
+        Array of the status of each problem; the values have the meaning of
+        mpfit.status, plus 9 meaning that no step reducing the sum of squares
+        could be found (the damping parameter grew beyond 1E16).
+
+.niter
+        Array of the number of iterations of each problem.
+
+.fnorm
+        Array of the summed squared residuals of each problem.
+
+.nfev
+        The total number of parameter sets evaluated (summed over problems).
+
+.errmsg
+        A string error message; the status of every problem is 0 if the
+        input was invalid.
+        """
+        self.debug = debug
+        self.errmsg = ''
+        self.nfev = 0
+        self.machar = machar(double=1)
+        machep = self.machar.machep
+        self.params = None
+        self.perror = None
+        self.covar = None
+        self.status = None
+        self.niter = None
+        self.fnorm = None
+
+        if fcn is None:
+            self.errmsg = "Usage: parms = mpfit_batch('myfunt', ... )"
+            return
+
+        if xall is None:
+            if parinfo is None:
+                self.errmsg = 'ERROR: must pass parameters in P or PARINFO'
+                return
+            xall = self.parinfo(parinfo, 'value')
+        xall = numpy.array(xall, numpy.float64)
+        if xall.ndim == 1:
+            if len(batchkw) == 0:
+                self.errmsg = 'ERROR: P must be 2-D when BATCHKW is empty'
+                return
+            nprob = len(list(batchkw.values())[0])
+            xall = numpy.repeat(xall[numpy.newaxis,:], nprob, axis=0)
+        nprob, npar = xall.shape
+        self.params = xall
+        self.status = numpy.zeros(nprob, dtype=int)
+        self.niter = numpy.zeros(nprob, dtype=int)
+
+        for key, value in batchkw.items():
+            if len(value) != nprob:
+                self.errmsg = 'ERROR: BATCHKW["' + key + '"] must have one entry per problem'
+                return
+
+        if parinfo is not None and len(parinfo) != npar:
+            self.errmsg = 'ERROR: number of elements in PARINFO and P must agree'
+            return
+        ptied = self.parinfo(parinfo, 'tied', default='', n=npar)
+        if any([t.strip() != '' for t in ptied]):
+            self.errmsg = 'ERROR: tied parameters are not supported by MPFIT_BATCH'
+            return
+        if ((ftol <= 0) or (xtol <= 0) or (gtol <= 0) or (maxiter <= 0)
+                or (lambda0 <= 0)):
+            self.errmsg = 'ERROR: input keywords are inconsistent'
+            return
+
+        pfixed = self.parinfo(parinfo, 'fixed', default=0, n=npar) == 1
+        ifree = (numpy.nonzero(~pfixed))[0]
+        n = len(ifree)
+        if n == 0:
+            self.errmsg = 'ERROR: no free parameters'
+            return
+
+        step = numpy.take(self.parinfo(parinfo, 'step', default=0., n=npar), ifree)
+        dstep = numpy.take(self.parinfo(parinfo, 'relstep', default=0., n=npar), ifree)
+        limited = self.parinfo(parinfo, 'limited', default=[0,0], n=npar)
+        limits = self.parinfo(parinfo, 'limits', default=[0.,0.], n=npar)
+        qllim = numpy.take(limited[:,0], ifree) != 0
+        qulim = numpy.take(limited[:,1], ifree) != 0
+        llim = numpy.where(qllim, numpy.take(limits[:,0], ifree), -numpy.inf)
+        ulim = numpy.where(qulim, numpy.take(limits[:,1], ifree), numpy.inf)
+
+        x = xall[:,ifree]
+        if numpy.any((x < llim) | (x > ulim)):
+            self.errmsg = 'ERROR: parameters are not within PARINFO limits'
+            return
+        if numpy.any(qllim & qulim & (llim >= ulim)):
+            self.errmsg = 'ERROR: PARINFO parameter limits are not consistent'
+            return
+
+        if epsfcn is None:
+            epsfcn = machep
+        eps = numpy.sqrt(max([epsfcn, machep]))
+
+        self.fcn = fcn
+        self.functkw = functkw
+        self.batchkw = batchkw
+
+        ## First evaluation of all the problems
+        allidx = numpy.arange(nprob)
+        [status, fvec] = self.call_batch(allidx, xall)
+        m = fvec.shape[1]
+        if m < n:
+            self.status[:] = 0
+            self.errmsg = 'ERROR: number of parameters must not exceed data'
+            return
+        self.status = status
+        fnorm = numpy.sum(fvec*fvec, axis=1)
+        self.niter[:] = 1
+
+        lam = numpy.full(nprob, float(lambda0))
+        diag = numpy.zeros((nprob, n))
+        alpha = numpy.zeros((nprob, n, n))   ## J^T J
+        beta = numpy.zeros((nprob, n))       ## J^T f
+        needjac = numpy.ones(nprob, dtype=bool)
+
+        while(1):
+            active = (numpy.nonzero(self.status == 0))[0]
+            if len(active) == 0: break
+
+            ## Calculate the jacobian of the problems that moved
+            idx = active[needjac[active]]
+            if len(idx) > 0:
+                fjac = self.fdjac_batch(idx, x[idx], fvec[idx], ifree, eps,
+                                        step, dstep, qulim, ulim)
+                ## Problems whose function failed already have their status;
+                ## the others go on
+                if fjac is None:
+                    continue
+                ok = self.status[idx] == 0
+                idx = idx[ok]
+                fjac = fjac[ok]
+
+                ## Zero the derivatives of parameters pegged at their limits
+                ## that would push them out of bounds
+                grad = numpy.einsum('kmj,km->kj', fjac, fvec[idx])
+                peg = (((x[idx] == llim) & (grad > 0)) |
+                       ((x[idx] == ulim) & (grad < 0)))
+                fjac[numpy.broadcast_to(peg[:,numpy.newaxis,:], fjac.shape)] = 0.
+
+                alpha[idx] = numpy.einsum('kmi,kmj->kij', fjac, fjac)
+                beta[idx] = numpy.einsum('kmi,km->ki', fjac, fvec[idx])
+                del fjac
+                needjac[idx] = False
+
+                ## Test for convergence of the gradient norm
+                colnorm = numpy.sqrt(numpy.einsum('kii->ki', alpha[idx]))
+                fn = numpy.sqrt(fnorm[idx])[:,numpy.newaxis]
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    cosine = numpy.where((colnorm > 0) & (fn > 0),
+                                         abs(beta[idx])/(colnorm*fn), 0.)
+                gdone = idx[numpy.max(cosine, axis=1) <= gtol]
+                self.status[gdone] = 4
+
+                ## Scale according to the (largest) norms of the columns
+                diag[idx] = numpy.maximum(diag[idx], colnorm)
+                d = diag[idx]
+                d[d == 0] = 1.
+                diag[idx] = d
+
+            active = (numpy.nonzero(self.status == 0))[0]
+            if len(active) == 0: break
+
+            ## Solve the damped normal equations of all active problems
+            d2 = diag[active]**2
+            a = alpha[active] + (lam[active,numpy.newaxis,numpy.newaxis] *
+                                 (d2[:,:,numpy.newaxis] * numpy.eye(n)))
+            try:
+                dx = -numpy.linalg.solve(a, beta[active])
+            except numpy.linalg.LinAlgError:
+                dx = -numpy.einsum('kij,kj->ki', numpy.linalg.pinv(a), beta[active])
+            xnew = numpy.clip(x[active] + dx, llim, ulim)
+            dx = xnew - x[active]
+
+            pnew = self.params[active].copy()
+            pnew[:,ifree] = xnew
+            [status, fnew] = self.call_batch(active, pnew)
+            self.status[active] = status
+            fnorm1 = numpy.sum(fnew*fnew, axis=1)
+
+            ## Actual and predicted relative reductions of the sum of squares
+            fn = fnorm[active]
+            pred = (fn + 2*numpy.sum(beta[active]*dx, axis=1) +
+                    numpy.einsum('ki,kij,kj->k', dx, alpha[active], dx))
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                actred = numpy.where(fn > 0, 1. - fnorm1/fn, 0.)
+                prered = numpy.where(fn > 0, 1. - pred/fn, 0.)
+            success = (status == 0) & (fnorm1 < fn)
+
+            ## Successful steps: update x, fvec and their norms
+            ok = active[success]
+            x[ok] = xnew[success]
+            self.params[ok] = pnew[success]
+            fvec[ok] = fnew[success]
+            fnorm[ok] = fnorm1[success]
+            self.niter[ok] = self.niter[ok] + 1
+            needjac[ok] = True
+            lam[ok] = numpy.maximum(lam[ok] / 10., machep)
+            lam[active[~success]] = lam[active[~success]] * 10.
+
+            ## Tests for convergence
+            dxnorm = numpy.sqrt(numpy.sum((diag[active]*dx)**2, axis=1))
+            xnorm = numpy.sqrt(numpy.sum((diag[active]*x[active])**2, axis=1))
+            fconv = (abs(actred) <= ftol) & (prered <= ftol) & success
+            xconv = dxnorm <= xtol*xnorm
+            code = numpy.where(fconv & xconv, 3,
+                               numpy.where(xconv, 2, numpy.where(fconv, 1, 0)))
+
+            ## Tests for termination
+            code = numpy.where((code == 0) & (self.niter[active] >= maxiter), 5, code)
+            code = numpy.where((code == 0) & (lam[active] > 1.e16), 9, code)
+            self.status[active] = numpy.where(self.status[active] == 0, code,
+                                              self.status[active])
+
+        ## Termination
+        self.fnorm = fnorm
+        if nocovar == 0:
+            ## Covariance from the last jacobian of each problem
+            cv = numpy.linalg.pinv(alpha)
+            self.covar = numpy.zeros((nprob, npar, npar))
+            self.covar[:,ifree[:,numpy.newaxis],ifree] = cv
+            bad = self.status <= 0
+            self.covar[bad] = 0.
+            d = numpy.einsum('kii->ki', self.covar)
+            self.perror = numpy.sqrt(numpy.maximum(d, 0.))
+        return
+
+
+    ## Call the user function for the problems IDX with the (k, npar)
+    ## parameters P.  Returns the status of each problem and the (k, m)
+    ## deviates; problems with non-finite deviates get status -16.
+    def call_batch(self, idx, p):
+        if self.debug:
+            print('Entering call_batch...')
+
+        kw = dict(self.functkw)
+        for key, value in self.batchkw.items():
+            kw[key] = numpy.asarray(value)[idx]
+        self.nfev = self.nfev + len(idx)
+
+        [status, f] = self.fcn(p, fjac=None, **kw)
+        f = numpy.reshape(numpy.asarray(f, numpy.float64), [len(idx), -1])
+        status = numpy.array(numpy.broadcast_to(status, (len(idx),)), dtype=int)
+        status[(status >= 0) & ~numpy.all(numpy.isfinite(f), axis=1)] = -16
+        status[status > 0] = 0
+        return([status, f])
+
+
+    ## One-sided finite-difference jacobian of the problems IDX, as a
+    ## (k, m, n) array.  Returns None if the user function fails for all
+    ## of them.
+    def fdjac_batch(self, idx, x, fvec, ifree, eps, step, dstep, qulim, ulim):
+        if self.debug:
+            print('Entering fdjac_batch...')
+
+        k, m = fvec.shape
+        n = len(ifree)
+        h = eps * abs(x)
+        h = numpy.where(step > 0, step, h)
+        h = numpy.where(dstep > 0, abs(dstep*x), h)
+        h[h == 0] = eps
+        ## Reverse the sign of the step if we are up against the upper limit
+        h = numpy.where(qulim & (x > ulim-h), -h, h)
+
+        fjac = numpy.zeros((k, m, n))
+        for j in range(n):
+            p = self.params[idx].copy()
+            p[:,ifree[j]] = p[:,ifree[j]] + h[:,j]
+            [status, fp] = self.call_batch(idx, p)
+            failed = status < 0
+            if numpy.any(failed):
+                self.status[idx[failed]] = status[failed]
+                if numpy.all(self.status[idx] < 0): return(None)
+            fjac[:,:,j] = (fp - fvec)/h[:,j,numpy.newaxis]
+        return(fjac)
+
+
 class machar:
     def __init__(self, double=1):
         if (double == 0):
@@ -71,9 +71,15 @@ __version__ = "2.2 (18 Feb, 2011), \xa9 AURA"
 import os, sys
 from astropy.io import fits
 import numpy
-from numpy import memmap
+from collections import namedtuple
 from functools import reduce
 
+# What _read_header learns from a GEIS header about the groups of the image
+_GeisLayout = namedtuple('_GeisLayout',
+                         ['key', 'comm', 'formats', 'bools', 'floats', 'shape',
+                          'code', 'data_size', 'group_size', 'gcount',
+                          'bscale', 'bzero', 'uint16'])
+
 def stsci(hdulist):
     """For STScI GEIS files, need to do extra steps."""
 
@@ -104,24 +110,136 @@ def stsci2(hdulist, filename):
         hdulist[0].header['FILENAME'] = filename
 
 
-def readgeis(input):
+def read_groups(dat, dtype, shape, formats, gcount, data_size, group_size):
+    """Return views of the data and group parameters of all groups at once.
 
-    """Input GEIS files "input" will be read and a HDUList object will
-       be returned.
-
-       The user can use the writeto method to write the HDUList object to
-       a FITS file.
+    ``dat`` is the content of a GEIS ``.??d`` file (any object supporting
+    the buffer protocol, e.g. ``bytes``, ``bytearray`` or ``numpy.memmap``).
+    The returned data array has shape ``(gcount,) + shape`` and the
+    parameter record array has shape ``(gcount,)`` with one field per
+    entry in ``formats``.  Both are strided over ``dat``; nothing is copied.
+    """
+    dtype = numpy.dtype(dtype)
+    strides = [dtype.itemsize]
+    for n in shape[:0:-1]:
+        strides.insert(0, strides[0] * n)
+    data = numpy.ndarray(shape=[gcount] + list(shape), dtype=dtype, buffer=dat,
+                         strides=[group_size] + strides)
+    params = numpy.ndarray(shape=(gcount,), dtype=formats, buffer=dat,
+                           offset=data_size, strides=(group_size,))
+    return data, params
+
+
+def _format_values(values, fmt=None):
+    """Format an array of header values as FITS card value fields.
+
+    Floating point values are formatted with ``fmt`` if given, otherwise
+    with full double precision.
     """
+    values = numpy.asarray(values)
+    kind = values.dtype.kind
+    if kind == 'b':
+        return ['%20s' % ('T' if v else 'F') for v in values.tolist()]
+    if kind in 'iu':
+        return ['%20d' % v for v in values.tolist()]
+    if kind == 'f':
+        if fmt is not None:
+            return [fmt % v for v in values.tolist()]
+        fields = []
+        for v in values.tolist():
+            # same as astropy does for a float value in a Card
+            _str = '%.16G' % v
+            if _str.lstrip('+-').isdigit():
+                _str += '.0'
+            fields.append('%20s' % _str)
+        return fields
+    if kind == 'S':
+        values = numpy.char.decode(values, 'ascii')
+    return ['%-20s' % ("'%-8s'" % v.replace("'", "''"))
+            for v in values.tolist()]
+
+
+def parameter_headers(keys, columns, comments, formats=None):
+    """Build one header per row out of columns of group parameter values.
+
+    ``columns`` holds one array of length GCOUNT per keyword in ``keys``;
+    ``formats`` optionally holds a printf-style format for each floating
+    point column (`None` for full precision).  The card images for all
+    rows are formatted column by column and each header is then built
+    with a single `~astropy.io.fits.Header.fromstring` call.
+    """
+    if formats is None:
+        formats = [None] * len(keys)
 
-    global dat
+    cards = []
+    for key, values, comment, fmt in zip(keys, columns, comments, formats):
+        if comment:
+            _fmt = '%-8s= %s / ' + comment.replace('%', '%%')
+        else:
+            _fmt = '%-8s= %s'
+        cards.append([(_fmt % (key, v))[:80].ljust(80)
+                      for v in _format_values(values, fmt)])
+
+    return [fits.Header.fromstring(''.join(row)) for row in zip(*cards)]
+
+
+# Number of pixels looked at by a 'sampled' byte-order check
+_NSAMPLE = 65536
+
+
+def byteorder_suspect(data, check='full', bzero=0):
+    """Return True if the values of ``data`` hint at a byte-swapping problem.
+
+    Floating point data are suspect if they contain NaN or Inf values, and
+    integer data if their largest magnitude uses the top (sign) bit, as
+    happens when data written on a platform with the other byte order are
+    read in.  Both tests only need the minimum and maximum of the data, so
+    no temporary arrays are allocated.
+
+    ``check`` selects how much of the data is looked at: 'full' (every
+    pixel), 'sampled' (a strided subset of about 65536 pixels; a cheap
+    heuristic that may miss isolated bad values) or 'none' (always False).
+
+    ``bzero`` is added to the integer data, wrapping around in their own
+    type, before they are looked at; this is what is done to UNSIGNED*2
+    GEIS data read in as signed integers.
+    """
+    if check == 'none':
+        return False
+    if check not in ('full', 'sampled'):
+        raise ValueError("check must be one of 'full', 'sampled' or 'none'")
+    if data.size == 0 or data.dtype.kind not in 'fiu':
+        return False
+
+    if check == 'sampled' and data.size > _NSAMPLE:
+        step = int(numpy.ceil((data.size / _NSAMPLE) ** (1. / data.ndim)))
+        data = data[(slice(None, None, step),) * data.ndim]
+    if bzero and data.dtype.kind in 'iu':
+        data = data + numpy.asarray(bzero).astype(data.dtype)
+
+    dmin = data.min()
+    dmax = data.max()
+    if data.dtype.kind == 'f':
+        return not (numpy.isfinite(dmin) and numpy.isfinite(dmax))
+
+    # same as numpy.frexp(data)[1].max() == bitpix - 1, on one value only
+    exponent = numpy.frexp(max(abs(int(dmin)), abs(int(dmax))))[1]
+    return exponent == data.dtype.itemsize * 8 - 1
+
+
+def _read_header(input):
+    """Read the ``.??h`` header file of the GEIS image ``input``.
+
+    Returns the primary header, cleaned up the way it appears in the
+    converted FITS file, and a `_GeisLayout` describing the group
+    parameters and where the groups are found in the ``.??d`` data file.
+    """
     cardLen = fits.Card.length
 
     # input file(s) must be of the form *.??h and *.??d
     if input[-1] != 'h' or input[-4] != '.':
         raise "Illegal input GEIS file name %s" % input
 
-    data_file = input[:-1]+'d'
-
     _os = sys.platform
     if _os[:5] == 'linux' or _os[:5] == 'win32' or _os[:5] == 'sunos' or _os[:3] == 'osf' or _os[:6] == 'darwin':
         bytes_per_line = cardLen+1
@@ -224,82 +342,109 @@ def readgeis(input):
     phdr.set('EXTEND', value=True, comment="FITS dataset may contain extensions", after=_after)
     phdr.set('NEXTEND', value=gcount, comment="Number of standard extensions")
 
+    layout = _GeisLayout(key, comm, formats, bools, floats, _shape, _code,
+                         data_size, group_size, gcount, _bscale, _bzero,
+                         _uint16)
+    return phdr, layout
+
+
+def _group_headers(params, layout):
+    """Build the extension headers out of the group parameter records."""
+    # Decode the group parameters of all groups at once, one column per
+    # PTYPE, and build all extension headers from them in bulk
+    columns = [params[name] for name in params.dtype.names]
+    fmts = []
+    for i in range(1, len(columns)+1):
+        if i in layout.bools:
+            columns[i-1] = columns[i-1] != 0
+        fmts.append('%20.7G' if i in layout.floats else None)
+    return parameter_headers(layout.key, columns, layout.comm, fmts)
+
+
+def _group_hdu(data, header, layout):
+    ext_hdu = fits.ImageHDU(data=data, header=header)
+
+    # deal with bscale/bzero
+    if (layout.bscale != 1 or layout.bzero != 0):
+        ext_hdu.header['BSCALE'] = layout.bscale
+        ext_hdu.header['BZERO'] = layout.bzero
+
+    return ext_hdu
+
+
+def readgeis(input, memmap=False, check=None):
+
+    """Input GEIS files "input" will be read and a HDUList object will
+       be returned.
+
+       The user can use the writeto method to write the HDUList object to
+       a FITS file.
+
+       If ``memmap`` is True, the ``.??d`` data file is memory-mapped
+       (copy-on-write) instead of being read into memory, and the data of
+       each extension is a view into that map.  Pixel pages are then only
+       read from disk once the data of a group is actually used.
+       Unsigned 16-bit data still have their zero point applied in place,
+       which reads those groups.
+
+       ``check`` selects the byte-order sanity check done on the data of
+       each group, 'full', 'sampled' or 'none' (see `byteorder_suspect`).
+       It defaults to 'full', or to 'none' when ``memmap`` is True since
+       checking would read in every mapped page.
+    """
+
+    global dat
+
+    phdr, layout = _read_header(input)
+    data_file = input[:-1]+'d'
+    _code = layout.code
+    gcount = layout.gcount
+
     hdulist = fits.HDUList([fits.PrimaryHDU(header=phdr, data=None)])
 
     # Use copy-on-write for all data types since byteswap may be needed
     # in some platforms.
-    f1 = open(data_file, mode='rb')
-    dat = f1.read()
-#    dat = memmap(data_file, mode='c')
+    if memmap:
+        dat = numpy.memmap(data_file, mode='c')
+    else:
+        # Read the file once into a writable buffer; each group's data
+        # will be a view into it rather than another copy.
+        dat = bytearray(os.path.getsize(data_file))
+        with open(data_file, mode='rb') as f1:
+            f1.readinto(dat)
     hdulist.mmobject = dat
 
+    if check is None:
+        check = 'none' if memmap else 'full'
+
     errormsg = ""
 
-    loc = 0
+    data, params = read_groups(dat, _code, layout.shape, layout.formats,
+                               gcount, layout.data_size, layout.group_size)
+    headers = _group_headers(params, layout)
+
     for k in range(gcount):
-        ext_dat = numpy.fromstring(dat[loc:loc+data_size], dtype=_code)
-        ext_dat = ext_dat.reshape(_shape)
-        if _uint16:
-            ext_dat += _bzero
+        ext_dat = data[k]
+        if layout.uint16:
+            ext_dat += layout.bzero
         # Check to see whether there are any NaN's or infs which might indicate
         # a byte-swapping problem, such as being written out on little-endian
         #   and being read in on big-endian or vice-versa.
-        if _code.find('float') >= 0 and \
-            (numpy.any(numpy.isnan(ext_dat)) or numpy.any(numpy.isinf(ext_dat))):
+        if byteorder_suspect(ext_dat, check):
             errormsg += "===================================\n"
             errormsg += "= WARNING:                        =\n"
             errormsg += "=  Input image:                   =\n"
             errormsg += input+"[%d]\n"%(k+1)
-            errormsg += "=  had floating point data values =\n"
-            errormsg += "=  of NaN and/or Inf.             =\n"
-            errormsg += "===================================\n"
-        elif _code.find('int') >= 0:
-            # Check INT data for max values
-            ext_dat_frac,ext_dat_exp = numpy.frexp(ext_dat)
-            if ext_dat_exp.max() == int(_bitpix) - 1:
+            if _code.find('float') >= 0:
+                errormsg += "=  had floating point data values =\n"
+                errormsg += "=  of NaN and/or Inf.             =\n"
+            else:
                 # Potential problems with byteswapping
-                errormsg += "===================================\n"
-                errormsg += "= WARNING:                        =\n"
-                errormsg += "=  Input image:                   =\n"
-                errormsg += input+"[%d]\n"%(k+1)
                 errormsg += "=  had integer data values        =\n"
                 errormsg += "=  with maximum bitvalues.        =\n"
-                errormsg += "===================================\n"
-
-        ext_hdu = fits.ImageHDU(data=ext_dat)
-
-        rec = numpy.fromstring(dat[loc+data_size:loc+group_size], dtype=formats)
-
-        loc += group_size
-
-        # Create separate PyFITS Card objects for each entry in 'rec'
-        for i in range(1, pcount+1):
-            #val = rec.field(i-1)[0]
-            val = rec[0][i-1]
-            if val.dtype.kind == 'S':
-                val = val.decode('ascii')
-
-            if i in bools:
-                if val:
-                    val = True
-                else:
-                    val = False
-
-            if i in floats:
-                # use fromstring, format in Card is deprecated in pyfits 0.9
-                _str = '%-8s= %20.7G / %s' % (key[i-1], val, comm[i-1])
-                _card = fits.Card.fromstring(_str)
-            else:
-                _card = fits.Card(keyword=key[i-1], value=val, comment=comm[i-1])
-
-            ext_hdu.header.append(_card)
-
-        # deal with bscale/bzero
-        if (_bscale != 1 or _bzero != 0):
-            ext_hdu.header['BSCALE'] = _bscale
-            ext_hdu.header['BZERO'] = _bzero
+            errormsg += "===================================\n"
 
-        hdulist.append(ext_hdu)
+        hdulist.append(_group_hdu(ext_dat, headers[k], layout))
 
     if errormsg != "":
         errormsg += "===================================\n"
@@ -313,10 +458,45 @@ def readgeis(input):
         errormsg += "===================================\n"
         print(errormsg)
 
-    f1.close()
     stsci(hdulist)
     return hdulist
 
+
+def readgeis_headers(input):
+
+    """Return the headers of the HDUs `readgeis` would build for the GEIS
+       file "input", without reading any pixel data.
+
+       Only the ``.??h`` header file and the group parameter blocks of the
+       ``.??d`` data file are read.  The first header in the returned list
+       is the primary header, followed by one header per group.
+    """
+
+    phdr, layout = _read_header(input)
+    data_file = input[:-1]+'d'
+
+    # Read just the group parameter block that follows the data of
+    # each group
+    psize = layout.group_size - layout.data_size
+    gpb = bytearray(psize * layout.gcount)
+    with open(data_file, mode='rb') as f1:
+        for k in range(layout.gcount):
+            f1.seek(k * layout.group_size + layout.data_size)
+            f1.readinto(memoryview(gpb)[k*psize:(k+1)*psize])
+    params = numpy.frombuffer(gpb, dtype=layout.formats)
+
+    # Zero-strided stand-in for the data, only its shape and type end up
+    # in the extension headers
+    blank = numpy.broadcast_to(numpy.zeros((), dtype=layout.code),
+                               layout.shape)
+
+    hdulist = fits.HDUList([fits.PrimaryHDU(header=phdr, data=None)])
+    for header in _group_headers(params, layout):
+        hdulist.append(_group_hdu(blank, header, layout))
+
+    stsci(hdulist)
+    return [hdu.header for hdu in hdulist]
+
 def parse_path(f1, f2):
 
     """Parse two input arguments and return two lists of file names"""
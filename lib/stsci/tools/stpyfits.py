@@ -79,6 +79,42 @@ def with_stpyfits(func):
     return wrapped_with_stpyfits
 
 
+def constant_value_header(header):
+    """
+    Return a copy of the header of a constant value array with the
+    ``NPIXn`` keywords turned into ``NAXISn`` keywords, the way the header
+    reads once the HDU has been opened with stpyfits.
+    """
+    header = header.copy()
+    # Add NAXISn keywords for each NPIXn keyword in the header and
+    # remove the NPIXn keywords
+    naxis = 0
+    for card in reversed(header['NPIX*'].cards):
+        try:
+            idx = int(card.keyword[len('NPIX'):])
+        except ValueError:
+            continue
+        hdrlen = len(header)
+        header.set('NAXIS' + str(idx), card.value,
+                   card.comment, after='NAXIS')
+        del header[card.keyword]
+        if len(header) < hdrlen:
+            # A blank card was used when updating the header; add the
+            # blank back in.
+            # TODO: Fix header.set so that it has an option not to
+            # use a blank card--this is a detail that we really
+            # shouldn't have to worry about otherwise
+            header.append()
+
+        # Presumably the NPIX keywords are in order of their axis, but
+        # just in case somehow they're not...
+        naxis = max(naxis, idx)
+
+    # Update the NAXIS keyword with the correct number of axes
+    header['NAXIS'] = naxis
+    return header
+
+
 class _ConstantValueImageBaseHDU(fits.hdu.image._ImageBaseHDU):
     """
     A class that extends the `astropy.io.fits.hdu.base._BaseHDU` class to extend its
@@ -92,33 +128,7 @@ class _ConstantValueImageBaseHDU(fits.hdu.image._ImageBaseHDU):
     def __init__(self, data=None, header=None, do_not_scale_image_data=False,
                  uint=False, **kwargs):
         if header and 'PIXVALUE' in header and header['NAXIS'] == 0:
-            header = header.copy()
-            # Add NAXISn keywords for each NPIXn keyword in the header and
-            # remove the NPIXn keywords
-            naxis = 0
-            for card in reversed(header['NPIX*'].cards):
-                try:
-                    idx = int(card.keyword[len('NPIX'):])
-                except ValueError:
-                    continue
-                hdrlen = len(header)
-                header.set('NAXIS' + str(idx), card.value,
-                           card.comment, after='NAXIS')
-                del header[card.keyword]
-                if len(header) < hdrlen:
-                    # A blank card was used when updating the header; add the
-                    # blank back in.
-                    # TODO: Fix header.set so that it has an option not to
-                    # use a blank card--this is a detail that we really
-                    # shouldn't have to worry about otherwise
-                    header.append()
-
-                # Presumably the NPIX keywords are in order of their axis, but
-                # just in case somehow they're not...
-                naxis = max(naxis, idx)
-
-            # Update the NAXIS keyword with the correct number of axes
-            header['NAXIS'] = naxis
+            header = constant_value_header(header)
         elif header and 'PIXVALUE' in header:
             pixval = header['PIXVALUE']
             if header['BITPIX'] > 0:
@@ -359,4 +369,4 @@ delval = with_stpyfits(fits.delval)
 
 __all__ = fits.__all__ + ['enable_stpyfits', 'disable_stpyfits',
                           'with_stpyfits', 'ConstantValuePrimaryHDU',
-                          'ConstantValueImageHDU']
+                          'ConstantValueImageHDU', 'constant_value_header']
@@ -182,3 +182,152 @@ def test_bitfield_to_boolean_mask(data, flags, flip, goodval, dtype, ref):
 
     assert(mask.dtype == dtype)
     assert np.all(mask == ref)
+
+
+@pytest.mark.parametrize('flags,flip,goodval', [
+    (0, None, True),
+    (6, None, False),
+    ('~(2+4)', None, True),
+    ([2, 4], True, False),
+    (None, None, True),
+])
+@pytest.mark.parametrize('dtype', [np.bool_, np.uint8])
+@pytest.mark.parametrize('block_size', [None, 1, 3, 100])
+def test_bitfield_to_boolean_mask_out_blocks(flags, flip, goodval, dtype,
+                                             block_size):
+    data = np.random.RandomState(0).randint(0, 32, size=(7, 5))
+    ref = bitmask.bitfield_to_boolean_mask(
+        data, ignore_flags=flags, flip_bits=flip, good_mask_value=goodval,
+        dtype=dtype
+    )
+
+    out = np.empty(data.shape, dtype=dtype)
+    mask = bitmask.bitfield_to_boolean_mask(
+        data, ignore_flags=flags, flip_bits=flip, good_mask_value=goodval,
+        out=out, block_size=block_size
+    )
+
+    assert mask is out
+    assert np.all(mask == ref)
+
+
+@pytest.mark.parametrize('block_size', [-1, 0, 2.5, True, '2'])
+def test_bad_block_size(block_size):
+    with pytest.raises(ValueError):
+        bitmask.bitfield_to_boolean_mask(np.arange(10), 4,
+                                         block_size=block_size)
+    with pytest.raises(ValueError):
+        bitmask.combine_bitfields_to_boolean_mask([np.arange(10)], 4,
+                                                  block_size=block_size)
+
+
+def test_bitfield_to_boolean_mask_out_shape():
+    with pytest.raises(ValueError):
+        bitmask.bitfield_to_boolean_mask(np.zeros((2, 3), dtype=int),
+                                         out=np.empty((3, 2), dtype=bool))
+
+
+def test_bitfield_to_boolean_mask_memmap(tmpdir):
+    data = np.random.RandomState(0).randint(0, 32, size=(9, 4)).astype(np.int16)
+    fname = str(tmpdir.join('dq.dat'))
+    dq = np.memmap(fname, dtype=np.int16, mode='w+', shape=data.shape)
+    dq[:] = data
+    dq.flush()
+    dq = np.memmap(fname, dtype=np.int16, mode='r', shape=data.shape)
+
+    mask = bitmask.bitfield_to_boolean_mask(dq, ignore_flags='4,8',
+                                            block_size=2)
+    assert np.all(mask == bitmask.bitfield_to_boolean_mask(data, '4,8'))
+
+
+@pytest.mark.parametrize('block_size', [None, 2])
+def test_combine_bitfields_to_boolean_mask(block_size):
+    rng = np.random.RandomState(0)
+    dqs = [rng.randint(0, 32, size=(5, 6)).astype(t)
+           for t in (np.int16, np.uint8, np.int32)]
+
+    for goodval in (True, False):
+        ref = np.logical_and.reduce([
+            bitmask.bitfield_to_boolean_mask(dq, ignore_flags=[4, 8])
+            for dq in dqs
+        ])
+        if not goodval:
+            ref = ~ref
+        mask = bitmask.combine_bitfields_to_boolean_mask(
+            dqs, ignore_flags=[4, 8], good_mask_value=goodval, dtype=np.int8,
+            block_size=block_size
+        )
+        assert mask.dtype == np.int8
+        assert np.all(mask == ref)
+
+
+def test_combine_bitfields_shape_mismatch():
+    with pytest.raises(ValueError):
+        bitmask.combine_bitfields_to_boolean_mask(
+            [np.zeros((2, 3), dtype=int), np.zeros((3, 2), dtype=int)]
+        )
+
+
+def test_compile_bit_flags_cached():
+    m1 = bitmask.compile_bit_flags('~(2+4)')
+    m2 = bitmask.compile_bit_flags('~(2+4)')
+    assert m1 is m2
+    assert m1.bitmask == bitmask.interpret_bit_flags('~(2+4)')
+    assert bitmask.compile_bit_flags([2, 4]) is bitmask.compile_bit_flags([2, 4])
+    assert bitmask.compile_bit_flags(1).bitmask == 1
+    assert bitmask.compile_bit_flags(m1) is m1
+
+    # equal but differently typed flags must not share a cache entry
+    with pytest.raises(TypeError):
+        bitmask.compile_bit_flags(True)
+    with pytest.raises(TypeError):
+        bitmask.compile_bit_flags(m1, flip_bits=True)
+    with pytest.raises(TypeError):
+        bitmask.interpret_bit_flags(m1, flip_bits=False)
+
+
+def test_compiled_bit_flags_mask():
+    dq = np.array([[0, 1, 2, 6], [4, 8, 16, 18]], dtype=np.int16)
+    flags = bitmask.compile_bit_flags('2,4')
+    np.testing.assert_array_equal(
+        bitmask.bitfield_to_boolean_mask(dq, ignore_flags=flags),
+        bitmask.bitfield_to_boolean_mask(dq, ignore_flags='2,4')
+    )
+    np.testing.assert_array_equal(
+        bitmask.combine_bitfields_to_boolean_mask([dq, dq], ignore_flags=flags),
+        bitmask.bitfield_to_boolean_mask(dq, ignore_flags='2,4')
+    )
+
+
+@pytest.mark.parametrize('flags,expected', [
+    ('hot,saturated', 16 + 256),
+    ('~(HOT+4)', ~20),
+    (['HOT', 4], 20),
+    ('ANY', 7),
+])
+def test_interpret_bit_flags_names(flags, expected):
+    names = {'HOT': 16, 'Saturated': 256, 'ANY': 7}
+    assert bitmask.interpret_bit_flags(flags, flag_name_map=names) == expected
+    assert bitmask.compile_bit_flags(
+        flags, flag_name_map=names
+    ).bitmask == expected
+
+
+def test_interpret_bit_flags_unknown_name():
+    with pytest.raises(ValueError):
+        bitmask.interpret_bit_flags('HOT,COLD', flag_name_map={'HOT': 16})
+    with pytest.raises(ValueError):
+        bitmask.interpret_bit_flags(['COLD'], flag_name_map={'HOT': 16})
+    # unknown names in strings are reported as such, not as bad integers
+    for flags in ['FOO,8', 'FOO', '~(HOT+FOO)', ['FOO', 8]]:
+        with pytest.raises(ValueError, match="Unknown bit flag name 'FOO'"):
+            bitmask.interpret_bit_flags(flags, flag_name_map={'HOT': 16})
+    with pytest.raises(ValueError):
+        bitmask.interpret_bit_flags('HOT', flag_name_map={'HOT': -1})
+
+
+@pytest.mark.parametrize('flags', ['HOT,8', 'HOT,CR', '(HOT+CR)',
+                                   ['HOT', 'CR'], ['HOT', 8]])
+def test_interpret_bit_flags_overlapping_names(flags):
+    names = {'HOT': 24, 'CR': 8}
+    assert bitmask.interpret_bit_flags(flags, flag_name_map=names) == 24
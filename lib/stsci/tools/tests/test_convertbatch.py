@@ -0,0 +1,49 @@
+from __future__ import absolute_import, division
+
+import os
+import shutil
+
+import numpy as np
+from astropy.io import fits
+
+from .. import convertbatch
+from .test_readgeis import write_geis
+
+data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def test_convert_batch(tmpdir):
+    data = np.arange(2 * 3 * 4, dtype=np.float32).reshape((2, 3, 4))
+    geis1 = write_geis(tmpdir.mkdir('a'), data)
+    geis2 = write_geis(tmpdir.mkdir('b'), data + 1)
+    waivered = str(tmpdir.join('waivered_c0f.fits'))
+    shutil.copyfile(os.path.join(data_dir, 'waivered.fits'), waivered)
+
+    inputs = [geis1, geis2, waivered]
+    results = convertbatch.convert_batch(inputs, num_cores=2, verbose=False)
+
+    assert [r.input for r in results] == inputs
+    assert [r.status for r in results] == ['converted'] * 3
+    assert results[0].output == geis1[:-4] + '_c0h.fits'
+    assert results[2].output == waivered[:-6] + 'h.fits'
+    with fits.open(results[1].output) as hdulist:
+        np.testing.assert_array_equal(hdulist[2].data, data[1] + 1)
+    with fits.open(results[2].output) as hdulist:
+        assert hdulist[0].header['NEXTEND'] == 1
+
+    # outputs newer than their inputs are left alone unless forced
+    results = convertbatch.convert_batch(inputs, num_cores=1)
+    assert [r.status for r in results] == ['skipped'] * 3
+    os.utime(geis2[:-1] + 'd', None)
+    os.utime(results[1].output, (0, 0))
+    results = convertbatch.convert_batch(','.join(inputs), num_cores=1)
+    assert [r.status for r in results] == ['skipped', 'converted', 'skipped']
+    results = convertbatch.convert_batch(inputs, num_cores=1, force=True)
+    assert [r.status for r in results] == ['converted'] * 3
+
+
+def test_convert_batch_failure(tmpdir):
+    bad = str(tmpdir.join('bad.c0h'))
+    open(bad, 'w').close()
+    results = convertbatch.convert_batch([bad], outdir=str(tmpdir))
+    assert results[0].status.startswith('failed')
@@ -0,0 +1,289 @@
+from __future__ import absolute_import, division
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from .. import fileutil
+from .test_readgeis import write_geis
+
+data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def open_header(filename, extn):
+    """getHeader through a fully opened image."""
+    fimg = fileutil.openImage(filename)
+    try:
+        return fileutil.getHeader(filename + extn, handle=fimg)
+    finally:
+        fimg.close()
+
+
+def open_keyword(filename, keyword):
+    """getKeyword through a fully opened image."""
+    fimg = fileutil.openImage(filename)
+    try:
+        return fileutil.getKeyword(filename, keyword, handle=fimg)
+    finally:
+        fimg.close()
+
+
+@pytest.fixture
+def images(tmpdir):
+    for name in ['cdva2.fits', 'o4sp040b0_raw.fits', 'waivered.fits']:
+        shutil.copy(os.path.join(data_dir, name), str(tmpdir))
+    data = np.arange(3 * 4 * 5, dtype=np.float32).reshape((3, 4, 5))
+    write_geis(tmpdir, data)
+    return tmpdir
+
+
+@pytest.mark.parametrize(('name', 'extn'), [
+    ('cdva2.fits', ''), ('cdva2.fits', '[0]'),
+    ('o4sp040b0_raw.fits', '[0]'), ('o4sp040b0_raw.fits', '[1]'),
+    ('o4sp040b0_raw.fits', '[sci,1]'), ('o4sp040b0_raw.fits', '[ERR,1]'),
+    ('o4sp040b0_raw.fits', '[dq]'), ('waivered.fits', '[0]'),
+    ('test.c0h', '[0]'), ('test.c0h', '[2]'), ('test.c0h', '[sci,3]'),
+    ('test.c0h', '[2/3]')])
+def test_getHeader(images, name, extn):
+    filename = str(images.join(name))
+    expected = open_header(filename, extn)
+    hdr = fileutil._readHeader(filename,
+                               fileutil.parseFilename(filename + extn)[1])
+    assert hdr.tostring() == expected.tostring()
+    assert fileutil.getHeader(filename + extn).tostring() == expected.tostring()
+
+
+@pytest.mark.parametrize('name', ['cdva2.fits', 'o4sp040b0_raw.fits',
+                                  'waivered.fits', 'test.c0h'])
+@pytest.mark.parametrize('keyword', ['NAXIS1', 'INSTRUME', 'CRVAL1',
+                                     'EXTNAME', 'FILETYPE', 'NOSUCHKW'])
+def test_getKeyword(images, name, keyword):
+    filename = str(images.join(name))
+    assert fileutil.getKeyword(filename, keyword) == open_keyword(filename,
+                                                                  keyword)
+
+
+def test_header_only(images):
+    # GEIS headers are read without converting the image to FITS
+    filename = str(images.join('test.c0h'))
+    assert fileutil.getKeyword(filename + '[2]', 'CRVAL1') == 101.25
+    assert fileutil.getKeyword(filename, 'DETECTOR') == 'CHIP0'
+    assert not images.join('test_c0h.fits').exists()
+
+    # The primary header of a waivered FITS file is known, its extension
+    # headers are not
+    filename = str(images.join('waivered.fits'))
+    assert fileutil._readKeyword(filename, '0', 'INSTRUME') == 'WFPC2'
+    with pytest.raises(fileutil._NoFastPath):
+        fileutil._readKeyword(filename, '1', 'INSTRUME')
+
+    # Headers past the one holding the keyword are not read
+    filename = str(images.join('o4sp040b0_raw.fits'))
+    headers = fileutil._HeaderList(filename)
+    assert headers[1]['EXTNAME'] == 'SCI'
+    assert len(headers._headers) == 2
+    headers.close()
+
+
+def test_truncated(images):
+    filename = str(images.join('truncated.fits'))
+    with open(str(images.join('o4sp040b0_raw.fits')), 'rb') as f:
+        head = f.read(fileutil.FITS_BLOCK * 7 + 100)
+    with open(filename, 'wb') as f:
+        f.write(head)
+
+    headers = fileutil._HeaderList(filename)
+    assert headers[0]['INSTRUME'] == 'STIS'
+    with pytest.raises(fileutil._NoFastPath):
+        list(headers)
+    headers.close()
+
+    with pytest.raises(KeyError):
+        fileutil.getHeader(str(images.join('o4sp040b0_raw.fits[9]')))
+
+
+@pytest.fixture
+def header_cache(tmpdir):
+    fileutil.enableHeaderCache(str(tmpdir.join('cache', 'headers.db')))
+    yield
+    fileutil.disableHeaderCache()
+
+
+@pytest.mark.parametrize('name', ['cdva2.fits', 'o4sp040b0_raw.fits',
+                                  'waivered.fits', 'test.c0h'])
+def test_header_cache(images, header_cache, name):
+    filename = str(images.join(name))
+    for i in range(2):
+        for keyword in ['NAXIS1', 'INSTRUME', 'CRVAL1', 'EXTNAME', 'HISTORY',
+                        'NOSUCHKW']:
+            expected = open_keyword(filename, keyword)
+            value = fileutil.getKeyword(filename, keyword)
+            if keyword == 'HISTORY':
+                assert str(value) == str(expected)
+            else:
+                assert value == expected
+        assert (fileutil.getHeader(filename + '[0]').tostring() ==
+                open_header(filename, '[0]').tostring())
+
+
+def test_header_cache_stamp(images, header_cache):
+    filename = str(images.join('o4sp040b0_raw.fits'))
+    assert fileutil.getKeyword(filename, 'INSTRUME') == 'STIS'
+
+    # Same size and modification time: the cached header is used
+    stat = os.stat(filename)
+    with open(filename, 'r+b') as f:
+        content = f.read()
+        f.seek(0)
+        f.write(content.replace(b"INSTRUME= 'STIS", b"INSTRUME= 'ACS "))
+    os.utime(filename, (stat.st_atime, stat.st_mtime))
+    assert fileutil.getKeyword(filename, 'INSTRUME') == 'STIS'
+
+    os.utime(filename, (stat.st_atime, stat.st_mtime + 10))
+    assert fileutil.getKeyword(filename, 'INSTRUME') == 'ACS'
+
+    fileutil.clearHeaderCache()
+    fileutil.disableHeaderCache()
+    assert fileutil.getKeyword(filename, 'INSTRUME') == 'ACS'
+
+
+@pytest.mark.parametrize(('name', 'index'), [('cdva2.fits', 0),
+                                             ('o4sp040b0_raw.fits', 1)])
+def test_getExtn_default(name, index):
+    fimg = fileutil.openImage(os.path.join(data_dir, name))
+    try:
+        assert fileutil.getExtn(fimg) is fimg[index]
+        # found out from the headers, no data was read
+        assert all('data' not in hdu.__dict__ for hdu in fimg)
+        assert fileutil.isFits(fimg) == (True, 'simple' if index == 0
+                                         else 'mef')
+        assert all('data' not in hdu.__dict__ for hdu in fimg)
+        headers = fileutil._HeaderList(os.path.join(data_dir, name))
+        assert fileutil._headerIndex(headers, None) == index
+        headers.close()
+    finally:
+        fimg.close()
+
+
+def test_getExtn_default_in_memory():
+    fimg = fileutil.fits.HDUList([fileutil.fits.PrimaryHDU(),
+                                  fileutil.fits.ImageHDU(),
+                                  fileutil.fits.ImageHDU(np.zeros((2, 3)))])
+    assert fileutil.getExtn(fimg) is fimg[2]
+    fimg[1].data = np.ones(4)
+    assert fileutil.getExtn(fimg) is fimg[1]
+    assert fileutil.getExtn(fileutil.fits.HDUList(
+        [fileutil.fits.PrimaryHDU()])) is not None
+
+
+def test_getExtn_default_empty(tmpdir):
+    # an empty table or image counts as data, as its data are not None
+    filename = str(tmpdir.join('empty.fits'))
+    table = fileutil.fits.BinTableHDU.from_columns(
+        [fileutil.fits.Column('a', 'E', array=np.zeros(0))])
+    for hdu in [table, fileutil.fits.ImageHDU(np.zeros((0, 5)))]:
+        hdul = fileutil.fits.HDUList([fileutil.fits.PrimaryHDU(), hdu,
+                                      fileutil.fits.ImageHDU(np.ones(3))])
+        hdul.writeto(filename, overwrite=True)
+        fimg = fileutil.openImage(filename)
+        try:
+            assert fimg[1].data is not None
+            assert fileutil.getExtn(fimg) is fimg[1]
+        finally:
+            fimg.close()
+        headers = fileutil._HeaderList(filename)
+        assert fileutil._headerIndex(headers, None) == 1
+        headers.close()
+        assert (fileutil.getHeader(filename).tostring() ==
+                open_header(filename, '').tostring())
+
+
+def test_buildRootname(tmpdir):
+    for name in ['j8bt06nyq_flt.fits', 'j8bt06o0q_raw.fits', 'u40x010hm.c0h',
+                 'j8bt06o1q.fits']:
+        tmpdir.join(name).write('')
+    path = str(tmpdir)
+    assert (fileutil.buildRootname(os.path.join(path, 'j8bt06nyq')) ==
+            os.path.join(path, 'j8bt06nyq_flt.fits'))
+    # lower-case file names are found for upper-case rootnames
+    assert (fileutil.buildRootname(os.path.join(path, 'J8BT06O0Q')) ==
+            os.path.join(path, 'j8bt06o0q_raw.fits'))
+    assert (fileutil.buildRootname(os.path.join(path, 'u40x010hm')) ==
+            os.path.join(path, 'u40x010hm.c0h'))
+    assert (fileutil.buildRootname(os.path.join(path, 'j8bt06o1q')) ==
+            os.path.join(path, 'j8bt06o1q.fits'))
+    assert (fileutil.buildRootname(os.path.join(path, 'j8bt06o2q_raw.fits'),
+                                   ext=['_dth.fits']) ==
+            os.path.join(path, 'j8bt06o2q_dth.fits'))
+
+    assert fileutil.findFile(os.path.join(path, 'j8bt06o1q.fits'))
+    assert not fileutil.findFile(os.path.join(path, 'j8bt06o1q'))
+
+
+def test_listDirectory(tmpdir):
+    path = str(tmpdir)
+    tmpdir.join('a.fits').write('')
+    names = fileutil.listDirectory(path)
+    assert names == set(['a.fits'])
+
+    # A directory modified just now is listed every time
+    tmpdir.join('b.fits').write('')
+    assert fileutil.listDirectory(path) == set(['a.fits', 'b.fits'])
+
+    # otherwise the listing is kept as long as the directory does not change
+    mtime = os.stat(path).st_mtime - 100
+    os.utime(path, (mtime, mtime))
+    names = fileutil.listDirectory(path)
+    assert fileutil.listDirectory(path) is names
+    tmpdir.join('c.fits').write('')
+    assert fileutil.findFile(os.path.join(path, 'c.fits'))
+
+    os.utime(path, (mtime, mtime))
+    assert not fileutil.findFile(os.path.join(path, 'c.fits'))
+    fileutil.clearDirectoryCache(path)
+    assert fileutil.findFile(os.path.join(path, 'c.fits'))
+
+
+def test_Expand_cache(monkeypatch):
+    monkeypatch.setenv('STSCI_TEST_DIR', '/data/raw/')
+    assert fileutil.Expand('STSCI_TEST_DIR$j8bt06nyq_flt.fits') == \
+        '/data/raw/j8bt06nyq_flt.fits'
+    assert fileutil.Expand('(STSCI_TEST_DIR)a.fits,b.fits') == \
+        '/data/raw/a.fits,b.fits'
+
+    # IRAF variables come before the OS environment
+    fileutil.set(STSCI_TEST_DIR='/iraf/raw/')
+    try:
+        assert fileutil.Expand('STSCI_TEST_DIR$a.fits') == '/iraf/raw/a.fits'
+    finally:
+        fileutil.unset('STSCI_TEST_DIR')
+    assert fileutil.Expand('STSCI_TEST_DIR$a.fits') == '/data/raw/a.fits'
+    assert fileutil.Expand('(STSCI_TEST_DIR)a.fits') == '/data/raw/a.fits'
+
+    monkeypatch.setenv('STSCI_TEST_DIR', '/other/')
+    assert fileutil.Expand('STSCI_TEST_DIR$a.fits') == '/other/a.fits'
+    monkeypatch.delenv('STSCI_TEST_DIR')
+    with pytest.raises(ValueError):
+        fileutil.Expand('STSCI_TEST_DIR$a.fits')
+    assert fileutil.Expand('STSCI_TEST_DIR$a.fits', noerror=1) == \
+        'STSCI_TEST_DIRa.fits'
+
+    monkeypatch.setenv('HOME', '/home/one')
+    assert fileutil.Expand('~/a.fits') == '/home/one/a.fits'
+    monkeypatch.setenv('HOME', '/home/two')
+    assert fileutil.Expand('~/a.fits') == '/home/two/a.fits'
+
+
+def test_osfn_many(tmpdir, monkeypatch):
+    monkeypatch.setenv('STSCI_TEST_DIR', str(tmpdir) + '/')
+    monkeypatch.chdir(str(tmpdir))
+    names = ['a.fits', 'STSCI_TEST_DIR$b.fits', './c.fits', 'sub/../d.fits',
+             'sub/', None]
+    expected = [fileutil.osfn(f) for f in names]
+    assert fileutil.osfn_many(names) == expected
+    assert expected[:4] == ['a.fits', str(tmpdir.join('b.fits')),
+                            str(tmpdir.join('c.fits')),
+                            str(tmpdir.join('d.fits'))]
+    assert expected[4] == str(tmpdir.join('sub')) + os.sep
@@ -0,0 +1,63 @@
+from __future__ import absolute_import, division
+
+import warnings
+
+import numpy as np
+import pytest
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from .. import gfit
+
+
+def _profiles(nfits=6, seed=3):
+    rng = np.random.RandomState(seed)
+    x = np.arange(10, 20, 0.1)
+    amp = rng.uniform(5, 10, nfits)
+    cen = rng.uniform(13, 17, nfits)
+    sig = rng.uniform(0.8, 1.5, nfits)
+    y = amp[:, None] * np.exp(-0.5 * ((x - cen[:, None]) / sig[:, None]) ** 2)
+    y += rng.normal(scale=0.05, size=y.shape)
+    return x, y, np.column_stack([amp, cen, sig])
+
+
+@pytest.mark.parametrize('use_err', [False, True])
+def test_gfit1d_analytic(use_err):
+    x, y, truth = _profiles(1)
+    err = np.full(x.shape, 0.05) if use_err else None
+    numeric = gfit.gfit1d(y[0], x=x, err=err, quiet=1)
+    analytic = gfit.gfit1d(y[0], x=x, err=err, quiet=1, autoderivative=0)
+    assert analytic.status > 0
+    np.testing.assert_allclose(analytic.params, numeric.params, rtol=1e-6)
+    np.testing.assert_allclose(analytic.params, truth[0], rtol=0.05)
+    assert analytic.nfev < numeric.nfev
+
+
+def test_gfit1d_analytic_fixed():
+    x, y, truth = _profiles(1)
+    parinfo = [{}, {}, {'fixed': 1}]
+    m = gfit.gfit1d(y[0], x=x, par=[8., 15., truth[0, 2]], parinfo=parinfo,
+                    quiet=1, autoderivative=0)
+    assert m.status > 0
+    assert m.params[2] == truth[0, 2]
+
+
+@pytest.mark.parametrize('num_cores', [1, 2])
+def test_gfit_many(num_cores):
+    x, y, truth = _profiles()
+    result = gfit.gfit_many(y, x=x, weights=np.ones_like(x),
+                            num_cores=num_cores)
+    assert result.params.shape == (6, 3)
+    assert np.all(result.status > 0)
+    np.testing.assert_allclose(result.params, truth, rtol=0.05)
+    for i in range(len(y)):
+        m = gfit.gfit1d(y[i], x=x, quiet=1)
+        np.testing.assert_allclose(result.params[i], m.params, rtol=1e-6)
+        assert result.niter[i] > 0
+
+
+def test_gfit_many_errors():
+    with pytest.raises(ValueError):
+        gfit.gfit_many(np.zeros(10))
+    with pytest.raises(ValueError):
+        gfit.gfit_many(np.zeros((2, 10)), x=np.arange(5))
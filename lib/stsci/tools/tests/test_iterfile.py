@@ -0,0 +1,160 @@
+from __future__ import absolute_import, division
+
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .. import iterfile
+
+
+@pytest.fixture
+def images(tmpdir):
+    names = []
+    for k in range(4):
+        name = str(tmpdir.join('image%d.fits' % k))
+        data = np.arange(10 * 6, dtype=np.float32).reshape((10, 6)) + k
+        fits.HDUList([fits.PrimaryHDU(),
+                      fits.ImageHDU(data, name='SCI')]).writeto(name)
+        names.append(name)
+    return names
+
+
+@pytest.mark.parametrize('pool', [False, True])
+@pytest.mark.parametrize('readahead', [0, 4])
+def test_rows(images, pool, readahead):
+    expected = fits.getdata(images[1], 1)
+    image = iterfile.IterFitsFile(images[1] + '[sci,1]', pool=pool,
+                                  readahead=readahead)
+    assert image.shape == (10, 6)
+    assert image.type() == 'float32'
+    np.testing.assert_array_equal(image.data, expected)
+    for i in range(10):
+        np.testing.assert_array_equal(image[i], expected[i])
+    for i in range(0, 10, 3):
+        np.testing.assert_array_equal(image[i:i + 3], expected[i:i + 3])
+    np.testing.assert_array_equal(image[-1], expected[-1])
+    np.testing.assert_array_equal(image[::2], expected[::2])
+    assert image.handle is None
+
+
+def test_readahead(images):
+    image = iterfile.IterFitsFile(images[0] + '[1]', pool=False, readahead=4)
+    image[0]
+    assert image._block[0] == 0 and len(image._block[1]) == 4
+    block = image._block
+    row = image[3]
+    assert image._block is block
+    # rows handed out do not share memory with the block read ahead
+    row[:] = -1
+    assert image[3][0] != -1
+    image[8:10]
+    assert image._block[0] == 8 and len(image._block[1]) == 2
+
+
+def test_handle_pool(images):
+    pool = iterfile.HandlePool(maxsize=2)
+    files = [iterfile.IterFitsFile(name + '[1]', pool=pool)
+             for name in images]
+    for i in range(3):
+        for f in files:
+            f[i]
+            assert len(pool) <= 2
+    assert images[3] in pool and images[2] in pool
+
+    # files shared by several objects are opened once
+    other = iterfile.IterFitsFile(images[3] + '[0]', pool=pool)
+    handle = pool._handles[images[3]]
+    assert other.shape == ()
+    assert pool._handles[images[3]] is handle
+
+    # files in use are not closed
+    for f in files[:2]:
+        f.set_inmemory(True)
+        f[0]
+    files[2][0]
+    assert len(pool) == 2
+    assert images[0] in pool and images[1] in pool
+    files[0].close()
+    files[2][0]
+    assert len(pool) == 2 and images[0] not in pool
+    files[1].close()
+
+    # the whole data array is not kept in the pool
+    files[2].data
+    assert 'data' not in pool._handles[images[2]][1].__dict__
+
+    pool.close()
+    assert len(pool) == 0
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+@pytest.mark.parametrize('rows', [None, 1, 3, 10])
+def test_iterStack(images, prefetch, rows):
+    expected = np.array([fits.getdata(name, 1) for name in images])
+    names = [name + '[sci,1]' for name in images]
+    blocks = list(iterfile.iterStack(names, rows=rows, prefetch=prefetch))
+    assert blocks[0][0].start == 0 and blocks[-1][0].stop == 10
+    if rows is not None:
+        assert len(blocks) == -(-10 // rows)
+    for (block_rows, block), (next_rows, _) in zip(blocks, blocks[1:]):
+        assert block_rows.stop == next_rows.start
+
+    for block_rows, block in iterfile.iterStack(names, rows=rows,
+                                                prefetch=prefetch):
+        assert block.shape == (4, block_rows.stop - block_rows.start, 6)
+        np.testing.assert_array_equal(block, expected[:, block_rows])
+
+
+def test_iterStack_memory(images):
+    # 4 images of 6 float32 values per row, with two blocks
+    names = [name + '[1]' for name in images]
+    blocks = list(iterfile.iterStack(names, memory=4 * 6 * 4 * 2 * 3))
+    assert [rows.stop - rows.start for rows, block in blocks] == [3, 3, 3, 1]
+    blocks = list(iterfile.iterStack(names, memory=0, prefetch=False))
+    assert len(blocks) == 10
+
+
+def test_iterStack_scaled(tmpdir, images):
+    # scaled and compressed data are read through sections
+    data = np.arange(60, dtype=np.int16).reshape((10, 6))
+    scaled = fits.ImageHDU(data.copy())
+    scaled.scale('int16', bzero=1000, bscale=0.5)
+    fits.HDUList([fits.PrimaryHDU(), scaled]).writeto(
+        str(tmpdir.join('scaled.fits')))
+    fits.HDUList([fits.PrimaryHDU(),
+                  fits.CompImageHDU(data.astype(np.float32))]).writeto(
+        str(tmpdir.join('comp.fits')))
+    names = [images[0] + '[1]', str(tmpdir.join('scaled.fits[1]')),
+             str(tmpdir.join('comp.fits[1]'))]
+
+    inputs = [iterfile._StackInput(iterfile.IterFitsFile(name))
+              for name in names]
+    assert inputs[0].offset is not None
+    assert inputs[1].offset is None and inputs[2].offset is None
+
+    for rows, block in iterfile.iterStack(names, rows=4):
+        assert block.dtype == np.float32
+        np.testing.assert_array_equal(block[0],
+                                      fits.getdata(images[0], 1)[rows])
+        np.testing.assert_allclose(block[1], data[rows])
+        np.testing.assert_array_equal(block[2], data[rows])
+
+
+def test_iterStack_errors(tmpdir, images):
+    name = str(tmpdir.join('small.fits'))
+    fits.PrimaryHDU(np.zeros((5, 6))).writeto(name)
+    with pytest.raises(ValueError):
+        list(iterfile.iterStack([images[0] + '[1]', name]))
+    with pytest.raises(ValueError):
+        list(iterfile.iterStack(images))
+    assert list(iterfile.iterStack([])) == []
+
+    # errors of the background reads are raised to the caller
+    stack = iterfile.iterStack([images[0] + '[1]'], rows=2)
+    next(stack)
+    iterfile.handle_pool.close()
+    os.remove(images[0])
+    with pytest.raises(IOError):
+        list(stack)
@@ -0,0 +1,66 @@
+from __future__ import absolute_import, division
+
+import numpy as np
+import pytest
+
+from ..linefit import linefit, linefit_many
+
+
+def _dense_linefit(x, y, w):
+    # reference solution with an explicit diagonal weight matrix
+    w = np.diag(w)
+    xavg = np.sum(np.dot(w, x)) / np.sum(w.diagonal())
+    yavg = np.sum(np.dot(w, y)) / np.sum(w.diagonal())
+    xm = x - xavg
+    ym = y - yavg
+    b1 = np.dot(xm, np.dot(w, ym)) / np.dot(xm, np.dot(w, xm))
+    return yavg - b1 * xavg, b1
+
+
+def test_linefit_weights():
+    rng = np.random.RandomState(1)
+    x = rng.uniform(-10, 10, 50)
+    y = 3. - 0.5 * x + rng.normal(size=50)
+    w = rng.uniform(0.1, 2., 50)
+    np.testing.assert_allclose(linefit(x, y, w), _dense_linefit(x, y, w))
+    np.testing.assert_allclose(linefit(x, y),
+                               _dense_linefit(x, y, np.ones(50)))
+
+
+def test_linefit_large():
+    x = np.arange(200000)
+    b0, b1 = linefit(x, 7. + 2. * x)
+    assert b0 == pytest.approx(7.)
+    assert b1 == pytest.approx(2.)
+
+
+@pytest.mark.parametrize('axis', [0, 1])
+@pytest.mark.parametrize('shared', [True, False])
+def test_linefit_many(axis, shared):
+    rng = np.random.RandomState(2)
+    n, m = 40, 7
+    x = np.arange(n, dtype=float) if shared else rng.uniform(0, 5, (n, m))
+    y = rng.normal(size=(n, m))
+    w = rng.uniform(0.1, 2., n) if shared else rng.uniform(0.1, 2., (n, m))
+
+    if axis == 1:
+        b0, b1 = linefit_many(x if shared else x.T, y.T,
+                              w if shared else w.T, axis=1)
+    else:
+        b0, b1 = linefit_many(x, y, w)
+
+    for j in range(m):
+        xj = x if shared else x[:, j]
+        wj = w if shared else w[:, j]
+        ref = linefit(xj, y[:, j], wj)
+        assert b0[j] == pytest.approx(ref[0])
+        assert b1[j] == pytest.approx(ref[1])
+
+
+def test_linefit_many_errors():
+    with pytest.raises(ValueError):
+        linefit_many(np.arange(3), np.zeros(3))
+    with pytest.raises(ValueError):
+        linefit_many(np.arange(4), np.zeros((3, 2)))
+    with pytest.raises(ValueError):
+        linefit_many(np.arange(3), np.zeros((3, 2)), weights=np.ones(2))
@@ -1,9 +1,16 @@
 from __future__ import absolute_import, print_function, division
 
 import multiprocessing
+import pickle
+import sys
 import time
 
-from ..mputil import launch_and_wait, best_tile_layout
+import numpy as np
+import pytest
+
+from ..mputil import (launch_and_wait, best_tile_layout, shared_memory,
+                      SharedArray, TaskExecutor, SHARED_RESULT_SIZE,
+                      tile_slices, run_tiled)
 
 
 def takes_time(x):
@@ -30,6 +37,35 @@ def test_launch_and_wait():
     # print("All subprocs should be finished and joined.")
 
 
+def test_launch_and_wait_results():
+    """Results come back in order, without waiting for a polling loop."""
+    subprocs = [multiprocessing.Process(target=time.sleep, args=(0.2 * i,),
+                                        name='sleep%d' % i)
+                for i in range(4)]
+    start = time.time()
+    results = launch_and_wait(subprocs, 2)
+    assert time.time() - start < 1.5
+    assert [r.name for r in results] == ['sleep0', 'sleep1', 'sleep2',
+                                         'sleep3']
+    assert all(r.exitcode == 0 for r in results)
+    assert results[3].seconds >= 0.6
+    assert results[0].seconds < 0.6
+
+    assert launch_and_wait([], 2) == []
+
+
+def test_launch_and_wait_exitcode():
+    subprocs = [multiprocessing.Process(target=sys.exit, args=(i,))
+                for i in range(3)]
+    results = launch_and_wait(subprocs, 1, check=False)
+    assert [r.exitcode for r in results] == [0, 1, 2]
+
+    subprocs = [multiprocessing.Process(target=sys.exit, args=(i,))
+                for i in range(3)]
+    with pytest.raises(RuntimeError):
+        launch_and_wait(subprocs, 2)
+
+
 def test_best_tile_layout():
     """Loop though some numbers and make sure we get expected results."""
     for i in range(257):
@@ -43,3 +79,121 @@ def test_best_tile_layout():
         else:
             percent_unused = 100. * ((unused_cores * 1.) / i)
             assert percent_unused < 14., "Too many idles cores at i: " + str(i)
+
+
+def scaled_rows(image, out, start, stop, factor):
+    """Example task writing to a shared output and returning a value."""
+    out.array[start:stop] = image.array[start:stop] * factor
+    return image.array[start:stop].sum()
+
+
+def big_result(n):
+    return np.arange(n, dtype=np.float64)
+
+
+def fails(x):
+    raise ValueError("bad value %s" % x)
+
+
+@pytest.mark.skipif(shared_memory is None,
+                    reason="requires multiprocessing.shared_memory")
+def test_task_executor():
+    data = np.arange(60.).reshape((10, 6))
+    with TaskExecutor(3) as ex:
+        image = ex.share(data)
+        out = ex.empty(data.shape)
+        for start in range(0, 10, 2):
+            ex.submit(scaled_rows, image, out, start, start + 2, factor=2.)
+        ex.submit(big_result, SHARED_RESULT_SIZE // 8 + 10)
+        results = ex.run()
+
+        np.testing.assert_array_equal(out.array, 2 * data)
+        assert results[:5] == [data[i:i + 2].sum() for i in range(0, 10, 2)]
+        np.testing.assert_array_equal(
+            results[5], np.arange(SHARED_RESULT_SIZE // 8 + 10))
+        assert len(ex.process_results) == 6
+        assert all(r.exitcode == 0 for r in ex.process_results)
+
+        ex.submit(fails, 1)
+        ex.submit(big_result, 3)
+        with pytest.raises(RuntimeError) as e:
+            ex.run()
+        assert 'bad value 1' in str(e.value)
+        assert ex.run() == []
+    assert out._shm is None
+
+
+@pytest.mark.skipif(shared_memory is None,
+                    reason="requires multiprocessing.shared_memory")
+def test_shared_array():
+    data = np.arange(12, dtype=np.int16).reshape((3, 4))
+    with SharedArray.copy(data) as shared:
+        other = pickle.loads(pickle.dumps(shared))
+        other.array[1, 1] = -1
+        assert shared.array[1, 1] == -1
+        other.close()
+        assert shared.array.dtype == np.int16
+    with pytest.raises(ValueError):
+        SharedArray((2,), dtype=object)
+
+
+def test_best_tile_layout_shape():
+    # the same as without a shape for square images
+    assert best_tile_layout(4, shape=(1000, 1000)) == (2, 2)
+    assert best_tile_layout(6, shape=(1000, 1000)) == (2, 3)
+    assert best_tile_layout(5, shape=(1000, 1000)) == (1, 5)
+    # elongated images are cut across their long side
+    assert best_tile_layout(4, shape=(100, 4000)) == (4, 1)
+    assert best_tile_layout(8, shape=(4000, 100)) == (1, 8)
+    # not more tiles than pixels
+    assert best_tile_layout(16, shape=(2, 3)) == (3, 2)
+    # halos count in the tile sizes, and are clipped at the image edges
+    assert best_tile_layout(4, shape=(400, 400), halo=0) == (2, 2)
+    assert best_tile_layout(4, shape=(400, 400), halo=50) == (1, 4)
+    with pytest.raises(ValueError):
+        best_tile_layout(4, shape=(3, 4, 5))
+
+
+@pytest.mark.parametrize('halo', [0, 2])
+@pytest.mark.parametrize('layout', [(1, 1), (3, 2), (5, 7)])
+def test_tile_slices(halo, layout):
+    shape = (23, 17)
+    covered = np.zeros(shape, dtype=int)
+    tiles = tile_slices(shape, layout=layout, halo=halo)
+    assert len(tiles) == layout[0] * layout[1]
+    image = np.arange(23 * 17).reshape(shape)
+    for tile in tiles:
+        covered[tile.slices] += 1
+        np.testing.assert_array_equal(image[tile.halo_slices][tile.trim],
+                                      image[tile.slices])
+        for s, h in zip(tile.slices, tile.halo_slices):
+            assert s.start - h.start <= halo and h.stop - s.stop <= halo
+    assert (covered == 1).all()
+
+
+def box_mean(a):
+    """Example kernel: 3x3 mean, keeping the edges."""
+    out = a.astype(np.float64)
+    out[1:-1, 1:-1] = sum(a[1 + dy:a.shape[0] - 1 + dy,
+                            1 + dx:a.shape[1] - 1 + dx]
+                          for dy in (-1, 0, 1) for dx in (-1, 0, 1)) / 9.
+    return out
+
+
+@pytest.mark.parametrize('pool_size', [1, 4])
+def test_run_tiled(pool_size):
+    if pool_size > 1 and shared_memory is None:
+        pytest.skip("requires multiprocessing.shared_memory")
+    image = np.random.RandomState(42).uniform(size=(61, 47))
+    expected = box_mean(image)
+    out = run_tiled(box_mean, image, halo=1, pool_size=pool_size)
+    np.testing.assert_allclose(out, expected)
+    # without halos the tile edges are wrong
+    out = run_tiled(box_mean, image, halo=0, pool_size=pool_size,
+                    layout=(2, 2))
+    assert not np.allclose(out, expected)
+
+    out = run_tiled(np.negative, image.astype(np.float32), layout=(3, 3),
+                    pool_size=pool_size, dtype=np.float64)
+    assert out.dtype == np.float64
+    np.testing.assert_allclose(out, -image.astype(np.float32))
@@ -0,0 +1,338 @@
+from __future__ import absolute_import, division
+
+import warnings
+
+import numpy as np
+import pytest
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from .. import nmpfit
+
+
+def gaussians(p, fjac=None, x=None, y=None, err=None):
+    model = np.zeros_like(x)
+    for k in range(len(p) // 3):
+        amp, cen, sig = p[3 * k:3 * k + 3]
+        model += amp * np.exp(-0.5 * ((x - cen) / sig) ** 2)
+    return [0, (y - model) / err]
+
+
+def make_data(ngauss=3, npts=500, seed=0):
+    rng = np.random.RandomState(seed)
+    x = np.linspace(0, 100, npts)
+    truth = []
+    for k in range(ngauss):
+        truth += [rng.uniform(5, 10), 100 * (k + 0.5) / ngauss,
+                  rng.uniform(2, 4)]
+    truth = np.array(truth)
+    y = -gaussians(truth, x=x, y=np.zeros(npts), err=1.)[1]
+    y += rng.normal(scale=0.1, size=npts)
+    p0 = truth * rng.uniform(0.9, 1.1, len(truth))
+    fa = {'x': x, 'y': y, 'err': np.full(npts, 0.1)}
+    return truth, p0, fa
+
+
+@pytest.mark.parametrize('parinfo', [
+    None,
+    [{}, {'fixed': 1}, {}, {}, {}, {}, {}, {}, {'limited': [1, 1],
+                                                'limits': [1., 2.5]}],
+])
+def test_lapack_backend(parinfo):
+    truth, p0, fa = make_data()
+    if parinfo is not None:
+        p0[8] = 2.
+    ref = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, parinfo=parinfo,
+                       quiet=1)
+    lap = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, parinfo=parinfo,
+                       quiet=1, linalg='lapack')
+    assert ref.status > 0
+    assert lap.status == ref.status
+    assert lap.niter == ref.niter
+    np.testing.assert_allclose(lap.params, ref.params, rtol=1e-8)
+    np.testing.assert_allclose(lap.covar, ref.covar, rtol=1e-6, atol=1e-10)
+    if parinfo is not None:
+        assert lap.params[1] == p0[1]
+        assert lap.params[8] <= 2.5
+
+
+def test_linalg_error():
+    truth, p0, fa = make_data(1)
+    m = nmpfit.mpfit(gaussians, p0, functkw=fa, quiet=1, linalg='blas')
+    assert m.status == 0
+    assert 'LINALG' in m.errmsg
+
+
+def gaussians_block(p, fjac=None, x=None, y=None, err=None):
+    # accepts one parameter set or a (k, npar) block of them
+    p = np.asarray(p)
+    pp = np.atleast_2d(p)[:, :, np.newaxis]
+    model = np.zeros((len(pp), len(x)))
+    for k in range(pp.shape[1] // 3):
+        amp, cen, sig = pp[:, 3 * k], pp[:, 3 * k + 1], pp[:, 3 * k + 2]
+        model += amp * np.exp(-0.5 * ((x - cen) / sig) ** 2)
+    deviates = (y - model) / err
+    if p.ndim == 1:
+        deviates = deviates[0]
+    return [0, deviates]
+
+
+@pytest.mark.parametrize('mpside', [0, 2])
+def test_vectorized_jacobian(mpside):
+    truth, p0, fa = make_data()
+    parinfo = [{'mpside': mpside} for p in p0]
+    parinfo[4]['fixed'] = 1
+    ref = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, parinfo=parinfo,
+                       quiet=1)
+    vec = nmpfit.mpfit(gaussians_block, p0.copy(), functkw=fa,
+                       parinfo=parinfo, quiet=1, vectorized=1)
+    assert vec.status == ref.status
+    assert vec.nfev == ref.nfev
+    np.testing.assert_allclose(vec.params, ref.params, rtol=1e-10)
+    np.testing.assert_allclose(vec.perror, ref.perror, rtol=1e-8)
+
+
+def test_pool_jacobian():
+    from multiprocessing.pool import ThreadPool
+
+    truth, p0, fa = make_data()
+    ref = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1)
+    pool = ThreadPool(3)
+    try:
+        m = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1,
+                         pool=pool)
+    finally:
+        pool.close()
+        pool.join()
+    assert m.status == ref.status
+    assert m.nfev == ref.nfev
+    np.testing.assert_allclose(m.params, ref.params, rtol=1e-10)
+
+
+def gaussian_rows(p, fjac=None, x=None, y=None, err=None):
+    # one problem per row of p, y and err
+    model = p[:, 0:1] * np.exp(-0.5 * ((x - p[:, 1:2]) / p[:, 2:3]) ** 2)
+    return [0, (y - model) / err]
+
+
+def make_batch(nprob=50, npts=40, seed=1):
+    rng = np.random.RandomState(seed)
+    x = np.linspace(-5, 5, npts)
+    truth = np.column_stack([rng.uniform(5, 10, nprob),
+                             rng.uniform(-1, 1, nprob),
+                             rng.uniform(0.7, 1.5, nprob)])
+    y = -gaussian_rows(truth, x=x, y=0., err=1.)[1]
+    y += rng.normal(scale=0.1, size=y.shape)
+    p0 = truth * rng.uniform(0.8, 1.2, truth.shape)
+    return x, y, np.full(y.shape, 0.1), p0
+
+
+@pytest.mark.parametrize('parinfo', [
+    None,
+    [{}, {'fixed': 1}, {'limited': [1, 1], 'limits': [0.5, 1.2]}],
+])
+def test_mpfit_batch(parinfo):
+    x, y, err, p0 = make_batch()
+    if parinfo is not None:
+        p0[:, 2] = np.clip(p0[:, 2], 0.5, 1.2)
+    b = nmpfit.mpfit_batch(gaussian_rows, p0, functkw={'x': x},
+                           batchkw={'y': y, 'err': err}, parinfo=parinfo)
+    assert b.errmsg == ''
+    assert np.all(b.status > 0)
+    assert b.params.shape == b.perror.shape == p0.shape
+    assert np.all(b.niter > 1)
+
+    for i in range(0, len(y), 10):
+        m = nmpfit.mpfit(lambda p, fjac=None: [0, gaussian_rows(
+                             p[np.newaxis], x=x, y=y[i], err=err[i])[1][0]],
+                         p0[i].copy(), parinfo=parinfo, quiet=1)
+        np.testing.assert_allclose(b.params[i], m.params, rtol=1e-5)
+        np.testing.assert_allclose(b.perror[i], m.perror, rtol=1e-3,
+                                   atol=1e-12)
+        assert b.fnorm[i] == pytest.approx(m.fnorm, rel=1e-8)
+
+    if parinfo is not None:
+        assert np.all(b.params[:, 1] == p0[:, 1])
+        assert np.all(b.perror[:, 1] == 0)
+        assert np.all((b.params[:, 2] >= 0.5) & (b.params[:, 2] <= 1.2))
+
+
+def test_mpfit_batch_status():
+    x, y, err, p0 = make_batch(nprob=4)
+
+    def fcn(p, fjac=None, x=None, y=None, err=None, bad=None):
+        status, f = gaussian_rows(p, x=x, y=y, err=err)
+        return [np.where(bad, -3, 0), f]
+
+    b = nmpfit.mpfit_batch(fcn, p0, functkw={'x': x},
+                           batchkw={'y': y, 'err': err,
+                                    'bad': np.array([0, 1, 0, 0])})
+    assert list(b.status < 0) == [False, True, False, False]
+    assert b.status[1] == -3
+
+    b = nmpfit.mpfit_batch(gaussian_rows, p0, functkw={'x': x},
+                           batchkw={'y': y, 'err': err[:2]})
+    assert np.all(b.status == 0)
+    assert 'BATCHKW' in b.errmsg
+
+
+def test_mpfit_batch_no_reduction():
+    # a kink at the minimum: no step reduces the sum of squares
+    def fcn(p, fjac=None, y=None):
+        return [0, np.abs(p) + y]
+
+    b = nmpfit.mpfit_batch(fcn, np.zeros((2, 1)),
+                           batchkw={'y': np.ones((2, 3))})
+    assert list(b.status) == [9, 9]
+    assert np.all(b.params == 0)
+
+
+def test_mpfit_batch_failure_midway():
+    # problem 1 fails computing its second jacobian while the first step of
+    # problem 0 was rejected; problem 0 must go on to convergence
+    x = np.linspace(0., 1., 20)
+    y = np.array([1. + 2. * x, 3. - x])
+    calls = [0, 0]
+
+    def fcn(p, fjac=None, y=None, which=None):
+        status = np.zeros(len(p), dtype=int)
+        f = y - (p[:, :1] + p[:, 1:] * x)
+        for k, w in enumerate(which):
+            calls[w] += 1
+            if w == 0 and calls[w] == 4:
+                # initial call, jacobian, then a step made to fail
+                f[k] = 1.e10
+            if w == 1 and calls[w] == 5:
+                status[k] = -3
+        return [status, f]
+
+    b = nmpfit.mpfit_batch(fcn, np.array([[0., 0.], [0., 0.]]),
+                           batchkw={'y': y, 'which': np.array([0, 1])})
+    assert b.status[1] == -3
+    assert b.status[0] > 0
+    np.testing.assert_allclose(b.params[0], [1., 2.], rtol=1e-6)
+
+
+def test_fit_stats():
+    truth, p0, fa = make_data()
+    calls = []
+
+    def statfunct(stats):
+        calls.append((stats['niter'], stats['done']))
+
+    m = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1,
+                     statfunct=statfunct)
+    stats = m.stats
+    assert m.status > 0
+    assert stats['done'] and stats['status'] == m.status
+    assert sum(stats['nfev'].values()) == m.nfev
+    assert stats['nfev']['initial'] == 1
+    # one evaluation per free parameter and jacobian
+    assert stats['nfev']['jacobian'] > 0
+    assert stats['nfev']['jacobian'] % len(p0) == 0
+    assert stats['nfev']['step'] == stats['nsteps']
+    assert stats['naccepted'] == m.niter - 1
+    assert 0 < stats['acceptance'] <= 1
+    for key in ['time_fcn', 'time_fdjac2', 'time_qrfac', 'time_lmpar']:
+        assert 0 < stats[key] <= stats['time_total']
+    assert calls[-1] == (m.niter, True)
+    assert len(calls) >= 2
+
+
+def test_fit_stats_error():
+    # an error of the fit is not hidden by one of the hook
+    truth, p0, fa = make_data()
+    calls = []
+
+    def fcn(p, fjac=None, **kw):
+        if len(calls) > 1:
+            raise ValueError('model failed')
+        return gaussians(p, **kw)
+
+    def statfunct(stats):
+        calls.append(stats['done'])
+        if stats['done']:
+            raise RuntimeError('hook failed')
+
+    with pytest.raises(ValueError, match='model failed'):
+        nmpfit.mpfit(fcn, p0.copy(), functkw=fa, quiet=1,
+                     statfunct=statfunct)
+    assert calls[-1] is True
+
+
+def test_warmstart():
+    truth, p0, fa = make_data()
+    first = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1,
+                         keepjac=1)
+    assert first.fjac.shape == (len(fa['x']), len(p0))
+    assert first.diag is not None
+
+    fa2 = dict(fa)
+    fa2['y'] = fa['y'] + np.random.RandomState(5).normal(scale=0.02,
+                                                          size=len(fa['y']))
+    cold = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa2, quiet=1)
+    warm = nmpfit.mpfit(gaussians, None, functkw=fa2, quiet=1,
+                        warmstart=first)
+    assert warm.status > 0
+    assert warm.nfev < cold.nfev
+    assert warm.stats['nfev']['jacobian'] < cold.stats['nfev']['jacobian']
+    np.testing.assert_allclose(warm.params, cold.params, rtol=1e-7)
+    # the previous result is left untouched
+    assert first.params is not warm.params
+
+    parinfo = [{} for p in p0]
+    parinfo[0]['fixed'] = 1
+    bad = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa2, quiet=1,
+                       parinfo=parinfo, warmstart=first)
+    assert bad.status == 0
+    assert 'WARMSTART' in bad.errmsg
+
+    # same number of free parameters, but not the same ones
+    parinfo[1]['fixed'] = 1
+    first = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1,
+                         parinfo=parinfo, keepjac=1)
+    parinfo = [{} for p in p0]
+    parinfo[2]['fixed'] = 1
+    parinfo[3]['fixed'] = 1
+    bad = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa2, quiet=1,
+                       parinfo=parinfo, warmstart=first)
+    assert bad.status == 0
+    assert 'WARMSTART' in bad.errmsg
+
+
+def test_warmstart_identical_data():
+    # refitting the same data from the previous solution must not stop on
+    # the gradient of the stale jacobian, and must give the errors
+    truth, p0, fa = make_data()
+    first = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1,
+                         keepjac=1)
+    cold = nmpfit.mpfit(gaussians, first.params.copy(), functkw=fa, quiet=1)
+    warm = nmpfit.mpfit(gaussians, None, functkw=fa, quiet=1,
+                        keepjac=1, warmstart=first)
+    assert warm.status > 0
+    assert warm.stats['njacobian'] >= 1
+    assert warm.perror is not None and warm.covar is not None
+    np.testing.assert_allclose(warm.perror, cold.perror, rtol=1e-5)
+    np.testing.assert_allclose(warm.params, first.params, rtol=1e-7)
+    assert warm.diag is not None and warm.par is not None
+    np.testing.assert_array_equal(warm.ifree, np.arange(len(p0)))
+
+
+def test_gtol_covariance():
+    # convergence on the gradient norm also gives the errors
+    truth, p0, fa = make_data()
+    m = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1, gtol=1.)
+    assert m.status == 4
+    assert m.perror is not None and m.diag is not None
+
+
+def test_broyden():
+    truth, p0, fa = make_data()
+    ref = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1)
+    m = nmpfit.mpfit(gaussians, p0.copy(), functkw=fa, quiet=1, broyden=3)
+    assert m.status > 0
+    assert m.stats['nbroyden'] > 0
+    assert m.stats['njacobian'] < ref.stats['njacobian']
+    assert m.stats['nfev']['jacobian'] < ref.stats['nfev']['jacobian']
+    np.testing.assert_allclose(m.params, ref.params, rtol=1e-6)
+    np.testing.assert_allclose(m.perror, ref.perror, rtol=1e-5)
@@ -0,0 +1,147 @@
+from __future__ import absolute_import, division
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .. import readgeis
+
+# (PTYPE, PDTYPE, numpy format) for the group parameter block
+GPB = [('CRVAL1', 'REAL*8', 'f8'),
+       ('CRPIX1', 'REAL*4', 'f4'),
+       ('FILLCNT', 'INTEGER*4', 'i4'),
+       ('BADINPDQ', 'LOGICAL*4', 'i4'),
+       ('DETECTOR', 'CHARACTER*8', 'S8')]
+
+
+def write_geis(path, data, datatype='REAL*4'):
+    """Write a minimal GEIS image (``.??h``/``.??d`` pair) to ``path``.
+
+    ``data`` is a (gcount, ny, nx) array written in native byte order.
+    Returns the name of the header file.
+    """
+    gcount, ny, nx = data.shape
+    gpb_dtype = np.dtype([(p[0], p[2]) for p in GPB])
+    cards = [('SIMPLE', False), ('BITPIX', data.dtype.itemsize * 8),
+             ('DATATYPE', datatype), ('NAXIS', 2), ('NAXIS1', nx),
+             ('NAXIS2', ny), ('GROUPS', True), ('GCOUNT', gcount),
+             ('PCOUNT', len(GPB)), ('PSIZE', gpb_dtype.itemsize * 8)]
+    for i, (ptype, pdtype, fmt) in enumerate(GPB, 1):
+        cards += [('PTYPE%d' % i, ptype, 'param %d' % i),
+                  ('PDTYPE%d' % i, pdtype),
+                  ('PSIZE%d' % i, np.dtype(fmt).itemsize * 8)]
+    cards += [('INSTRUME', 'WFPC2'), ('ROOTNAME', 'U40X010HM'),
+              ('FILETYPE', 'SCI')]
+
+    hname = str(path.join('test.c0h'))
+    with open(hname, 'w') as hfile:
+        for card in cards:
+            hfile.write(fits.Card(*card).image + '\n')
+        hfile.write('END'.ljust(80) + '\n')
+
+    with open(hname[:-1] + 'd', 'wb') as dfile:
+        for k in range(gcount):
+            gpb = np.zeros(1, dtype=gpb_dtype)
+            gpb['CRVAL1'] = 100.25 + k
+            gpb['CRPIX1'] = 0.5 * k
+            gpb['FILLCNT'] = k
+            gpb['BADINPDQ'] = k % 2
+            gpb['DETECTOR'] = 'CHIP%d' % k
+            dfile.write(data[k].tobytes())
+            dfile.write(gpb.tobytes())
+
+    return hname
+
+
+@pytest.mark.parametrize('memmap', [False, True])
+def test_readgeis(tmpdir, memmap):
+    data = np.arange(4 * 6 * 5, dtype=np.float32).reshape((4, 6, 5))
+    hname = write_geis(tmpdir, data)
+
+    hdulist = readgeis.readgeis(hname, memmap=memmap)
+    assert len(hdulist) == 5
+    assert hdulist[0].header['NEXTEND'] == 4
+    for k in range(4):
+        hdr = hdulist[k + 1].header
+        np.testing.assert_array_equal(hdulist[k + 1].data, data[k])
+        assert hdr['EXTNAME'] == 'SCI'
+        assert hdr['EXTVER'] == k + 1
+        assert hdr['CRVAL1'] == 100.25 + k
+        assert hdr['CRPIX1'] == 0.5 * k
+        assert hdr['FILLCNT'] == k
+        assert hdr['BADINPDQ'] is bool(k % 2)
+        assert hdr['DETECTOR'] == 'CHIP%d' % k
+
+
+def test_readgeis_memmap_views(tmpdir):
+    data = np.ones((2, 3, 4), dtype=np.float32)
+    hname = write_geis(tmpdir, data)
+    hdulist = readgeis.readgeis(hname, memmap=True)
+
+    assert isinstance(hdulist.mmobject, np.memmap)
+    for hdu in hdulist[1:]:
+        assert np.shares_memory(hdu.data, hdulist.mmobject)
+
+    # copy-on-write: changes must not reach the file on disk
+    hdulist[1].data[:] = 0
+    hdulist = readgeis.readgeis(hname, memmap=True)
+    assert hdulist[1].data.sum() == 12
+
+
+def test_parameter_headers():
+    columns = [np.array([0.1, 2.0]), np.array([0.1, 2.0], dtype=np.float32),
+               np.array([True, False]), np.array([3, -4]),
+               np.array([b'A', b"B'C"])]
+    headers = readgeis.parameter_headers(
+        ['DBL', 'FLT', 'BOOL', 'INT', 'STR'], columns,
+        ['double', 'single', '', 'integer', 'string'],
+        [None, '%20.7G', None, None, None])
+
+    assert len(headers) == 2
+    assert headers[0]['DBL'] == 0.1
+    assert headers[1]['DBL'] == 2.0
+    assert isinstance(headers[1]['DBL'], float)
+    assert headers[0]['FLT'] == 0.1
+    assert headers[0]['BOOL'] is True
+    assert headers[1]['INT'] == -4
+    assert headers[1]['STR'] == "B'C"
+    assert headers[0].comments['INT'] == 'integer'
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.int32])
+def test_byteorder_suspect_int(dtype):
+    rng = np.random.RandomState(42)
+    bits = np.iinfo(dtype).bits
+    for hi in [10, 2 ** (bits - 3), 2 ** (bits - 2) + 1, 2 ** (bits - 1) - 1]:
+        data = rng.randint(-hi, hi, size=(50, 40)).astype(dtype)
+        expected = np.frexp(data)[1].max() == bits - 1
+        assert readgeis.byteorder_suspect(data) == expected
+        assert not readgeis.byteorder_suspect(data, check='none')
+
+
+def test_byteorder_suspect_bzero():
+    unsigned = np.arange(32600, 32760).astype(np.uint16).view(np.int16)
+    assert readgeis.byteorder_suspect(unsigned)
+    assert not readgeis.byteorder_suspect(unsigned, bzero=32768)
+    assert not readgeis.byteorder_suspect(unsigned, check='sampled',
+                                          bzero=32768)
+    assert readgeis.byteorder_suspect(np.full(10, 100, dtype=np.int16),
+                                      bzero=32768)
+
+
+def test_byteorder_suspect_float():
+    rng = np.random.RandomState(42)
+    data = rng.uniform(0, 1000, size=(600, 700)).astype(np.float32)
+    assert not readgeis.byteorder_suspect(data)
+    assert not readgeis.byteorder_suspect(data, check='sampled')
+
+    swapped = data.byteswap()
+    assert readgeis.byteorder_suspect(swapped)
+    assert readgeis.byteorder_suspect(swapped, check='sampled')
+
+    data[3, 5] = np.inf
+    assert readgeis.byteorder_suspect(data)
+    assert not readgeis.byteorder_suspect(data, check='none')
+
+    with pytest.raises(ValueError):
+        readgeis.byteorder_suspect(data, check='partial')
@@ -0,0 +1,61 @@
+from __future__ import absolute_import, division
+
+import numpy as np
+import pytest
+
+from .. import swapgeis
+from .test_readgeis import write_geis
+
+
+def test_byteswap(tmpdir):
+    data = np.arange(3 * 4 * 5, dtype=np.float32).reshape((3, 4, 5))
+    hname = write_geis(tmpdir, data)
+    output = str(tmpdir.join('swapped.c0h'))
+
+    swapgeis.byteswap(hname, output)
+
+    with open(hname[:-1] + 'd', 'rb') as f:
+        orig = f.read()
+    with open(output[:-1] + 'd', 'rb') as f:
+        swapped = f.read()
+    assert len(swapped) == len(orig)
+
+    # every group, data and parameters alike, is swapped field by field
+    group_size = len(orig) // 3
+    data_size = data[0].nbytes
+    for k in range(3):
+        loc = k * group_size
+        grp = np.frombuffer(swapped, dtype=np.float32, count=20, offset=loc)
+        np.testing.assert_array_equal(grp.byteswap(), data[k].ravel())
+        crval1 = np.frombuffer(swapped, dtype='f8', count=1,
+                               offset=loc + data_size)
+        assert crval1.byteswap()[0] == 100.25 + k
+        detector = swapped[loc + group_size - 8:loc + group_size]
+        assert detector.rstrip(b'\0') == ('CHIP%d' % k).encode('ascii')
+
+    # swapping twice gives back the original
+    swapgeis.byteswap(output, str(tmpdir.join('back.c0h')))
+    with open(str(tmpdir.join('back.c0d')), 'rb') as f:
+        assert f.read() == orig
+
+
+@pytest.mark.parametrize('check', ['full', 'sampled'])
+def test_byteswap_unsigned(tmpdir, capsys, check):
+    # unsigned values just below 32768 look like byte-swapped signed
+    # integers; with the offset applied, as readgeis does, they are fine
+    unsigned = 32700 + np.arange(60, dtype=np.int32).reshape((1, 6, 10))
+    raw = unsigned.astype(np.uint16).view(np.int16)
+    hname = write_geis(tmpdir, raw.byteswap(), datatype='UNSIGNED*2')
+    output = str(tmpdir.join('swapped.c0h'))
+
+    swapgeis.byteswap(hname, output, check=check)
+    assert 'WARNING' not in capsys.readouterr().out
+    with open(output[:-1] + 'd', 'rb') as f:
+        swapped = np.frombuffer(f.read(), dtype=np.int16, count=60)
+    np.testing.assert_array_equal(swapped, raw.ravel())
+
+    # small unsigned values are the suspect ones
+    raw = np.full((1, 6, 10), 100, dtype=np.int16)
+    hname = write_geis(tmpdir, raw.byteswap(), datatype='UNSIGNED*2')
+    swapgeis.byteswap(hname, output, check=check)
+    assert 'WARNING' in capsys.readouterr().out
@@ -34,3 +34,43 @@ def test_diff_arr():
 def test_diff_arr_err(x, y):
     with pytest.raises(ValueError):
         xyinterp(x, y, 2)
+
+
+def test_array_xval():
+    x = np.array([1, 3, 7, 9, 12])
+    y = np.array([5, 10, 15, 20, 25])
+    xval = np.array([[1, 2, 8], [12, 9, 10.5]])
+    result = xyinterp(x, y, xval)
+    assert result.shape == xval.shape
+    np.testing.assert_allclose(result, np.interp(xval, x, y))
+
+
+def test_duplicate_x():
+    x = np.array([1., 2., 2., 3.])
+    y = np.array([0., 1., 5., 6.])
+    assert xyinterp(x, y, 2) == 1
+    assert xyinterp(x, y, 2.5) == 5.5
+
+
+def test_unsorted_in_range():
+    x = np.array([1, 4, 3, 6])
+    with pytest.raises(ValueError):
+        xyinterp(x, x, 2)
+    # the check is skipped on request
+    assert xyinterp(x, x, 2, assume_sorted=True) == 2
+
+
+@pytest.mark.parametrize(('extrapolate', 'expected'),
+                         [('nearest', [5, 25]), ('linear', [0, 30]),
+                          ('nan', [np.nan, np.nan])])
+def test_extrapolate(extrapolate, expected):
+    x = np.array([1, 3, 7, 9, 12])
+    y = np.array([5, 10, 15, 20, 25])
+    result = xyinterp(x, y, [-1, 15], extrapolate=extrapolate)
+    np.testing.assert_allclose(result, expected)
+    assert xyinterp(x, y, 8, extrapolate=extrapolate) == 17.5
+
+
+def test_extrapolate_err():
+    with pytest.raises(ValueError):
+        xyinterp(np.arange(3), np.arange(3), 1, extrapolate='cubic')
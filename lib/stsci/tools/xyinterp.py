@@ -5,7 +5,7 @@ Interpolates y based on the given xval.
 
 `x` and `y` are a pair of independent/dependent variable arrays that must
 be the same length. The x array must also be sorted.
-`xval` is a user-specified value. This routine looks
+`xval` is a user-specified value or array of values. This routine looks
 up `xval` in the x array and uses that information to properly interpolate
 the value in the y array. 
 
@@ -20,27 +20,30 @@ from __future__ import division # confidence high
 import numpy as N 
 
 #This section for standalone imports only-------------------------------------
-__version__ = '0.1'          #Release version number only
-__vdate__ = '2006-07-06'     #Date of this version, in this (FITS-style) format
+__version__ = '0.2'          #Release version number only
+__vdate__ = '2026-10-18'     #Date of this version, in this (FITS-style) format
 #-----------------------------------------------------------------------------
 
 
-def xyinterp(x,y,xval):
+_EXTRAPOLATE = (None, 'nearest', 'linear', 'nan')
+
+
+def xyinterp(x,y,xval,assume_sorted=False,extrapolate=None):
     """ 
     
     :Purpose: Interpolates y based on the given xval.
 
     x and y are a pair of independent/dependent variable arrays that must
     be the same length. The x array must also be sorted.
-    xval is a user-specified value. This routine looks
+    xval is a user-specified value or array of values. This routine looks
     up xval in the x array and uses that information to properly interpolate
     the value in the y array.  
 
     Notes
     =====
-    Use the searchsorted method on the X array to determine the bin in
-    which xval falls; then use that information to compute the corresponding
-    y value.
+    Use a single call to the searchsorted method on the X array to determine
+    the bins in which all the xval fall; then use that information to compute
+    the corresponding y values.
     
 
     See Also 
@@ -51,26 +54,36 @@ def xyinterp(x,y,xval):
     ==========
 
     x: 1D numpy array  
-        independent variable array: MUST BE SORTED
+        independent variable array: MUST BE SORTED (non-decreasing)
 
     y: 1D numpy array
         dependent variable array
 
-    xval: float 
-        the x value at which you want to know the value of y
+    xval: float or numpy array
+        the x value(s) at which you want to know the value of y
+
+    assume_sorted: bool
+        skip the (O(n)) check that x is sorted; use when the caller
+        already knows that it is
+
+    extrapolate: None, 'nearest', 'linear' or 'nan'
+        what to do with xval outside the bounds of x: None raises a
+        ValueError, 'nearest' returns the y value at the nearest end of x,
+        'linear' extends the first/last segment and 'nan' returns NaN
 
     Returns
     =======
-    y: float 
-        the value of y corresponding to xval
+    y: float or numpy array
+        the value(s) of y corresponding to xval, with the shape of xval
 
     Raises
     ======
     ValueError: 
         If arrays are unequal length; or x array is unsorted;
-        or if xval falls outside the bounds of x (extrapolation is unsupported
+        or if xval falls outside the bounds of x and extrapolation
+        was not requested
 
-    :version: 0.1 last modified 2006-07-06
+    :version: 0.2 last modified 2026-10-18
 
 """
 
@@ -78,25 +91,39 @@ def xyinterp(x,y,xval):
     #x and y must correspond
     if len(x) != len(y):
         raise ValueError("Input arrays must be equal lengths")
+    if extrapolate not in _EXTRAPOLATE:
+        raise ValueError("extrapolate must be one of %s" % (_EXTRAPOLATE,))
 
-    #Extrapolation not supported
-    if xval < x[0]:
-        raise ValueError("Value %f < min(x) %f: Extrapolation unsupported"%(xval,x[0]))
-    if xval > x[-1]:
-        raise ValueError("Value > max(x): Extrapolation unsupported")
+    x = N.asarray(x)
+    y = N.asarray(y)
+    xval = N.asarray(xval, dtype=N.float64)
 
     #This algorithm only works on sorted data
-    if x.argsort().all() != N.arange(len(x)).all():
+    if not assume_sorted and N.any(x[1:] < x[:-1]):
         raise ValueError("Input array x must be sorted")
-    
+
+    #Extrapolation only on request
+    below = xval < x[0]
+    above = xval > x[-1]
+    if extrapolate is None:
+        if below.any():
+            raise ValueError("Value %f < min(x) %f: Extrapolation unsupported"
+                             % (xval.min(), x[0]))
+        if above.any():
+            raise ValueError("Value > max(x): Extrapolation unsupported")
+    elif extrapolate == 'nearest':
+        xval = N.clip(xval, x[0], x[-1])
+
     # Now do the real work.
-    hi = x.searchsorted(xval)
-    lo = hi - 1
-    
-    try:
-        seg = (float(xval)-x[lo]) / (x[hi] - x[lo])
-    except ZeroDivisionError:
-        seg = 0.0
+    n = len(x)
+    lo = N.clip(x.searchsorted(xval) - 1, 0, max(n - 2, 0))
+    hi = N.minimum(lo + 1, n - 1)
+
+    dx = x[hi] - x[lo]
+    nonzero = dx != 0
+    seg = N.where(nonzero, (xval - x[lo]) / N.where(nonzero, dx, 1), 0.0)
 
     yval = y[lo] + seg*(y[hi] - y[lo])
-    return yval
+    if extrapolate == 'nan':
+        yval = N.where(below | above, N.nan, yval)
+    return yval[()]